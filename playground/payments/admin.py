@@ -1,7 +1,15 @@
 from django.contrib import admin
 
 from .enums import CustomerType, DocumentType
-from .models import Balance, Customer, Payable, Transaction
+from .models import (
+    Balance,
+    BalanceEntry,
+    Customer,
+    Payable,
+    SettlementRun,
+    SettlementRunError,
+    Transaction,
+)
 
 
 @admin.register(Customer)
@@ -19,7 +27,11 @@ class CustomerAdmin(admin.ModelAdmin):
 @admin.register(Balance)
 class BalanceAdmin(admin.ModelAdmin):
     list_per_page = 10
-    list_display = ["id", "customer__name", "customer__active", "available", "has_waiting_funds"]
+    list_display = [
+        "id", "customer__name", "customer__active", "slot", "available", "has_waiting_funds"
+    ]
+    list_select_related = ["customer"]
+    show_full_result_count = False
     search_fields = ["id", "customer__name"]
     list_filter = ["customer__active"]
 
@@ -48,6 +60,8 @@ class PayableAdmin(admin.ModelAdmin):
     list_display = [
         "id", "customer__name", "transaction_details", "status", "created_at", "payment_date"
     ]
+    list_select_related = ["customer", "transaction"]
+    show_full_result_count = False
     ordering = ["-created_at"]
 
     @admin.display()
@@ -57,3 +71,47 @@ class PayableAdmin(admin.ModelAdmin):
             f"{obj.transaction.value} {obj.transaction.currency} | "
             f"{obj.transaction.method}"
         )
+
+
+@admin.register(BalanceEntry)
+class BalanceEntryAdmin(admin.ModelAdmin):
+    list_per_page = 100
+    list_display = ["id", "balance", "version", "bucket", "amount", "payable", "created_at"]
+    list_select_related = ["balance", "payable"]
+    show_full_result_count = False
+    search_fields = ["balance__id", "payable__id", "transaction__id"]
+    list_filter = ["bucket"]
+    ordering = ["-created_at"]
+
+    def has_add_permission(self, request):
+        # Entries are only posted by BalancePostingService, with the balance and checkpoints
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class SettlementRunErrorInline(admin.TabularInline):
+    model = SettlementRunError
+    fields = ["payable", "message", "created_at"]
+    readonly_fields = fields
+    extra = 0
+
+
+@admin.register(SettlementRun)
+class SettlementRunAdmin(admin.ModelAdmin):
+    list_per_page = 50
+    list_display = [
+        "id", "slot", "shard", "shards", "status", "total_count", "settled_count", "failed_count",
+        "duration", "throughput", "chunk_size", "latency", "created_at", "finished_at"
+    ]
+    list_filter = ["status", "slot"]
+    ordering = ["-created_at"]
+    inlines = [SettlementRunErrorInline]
+
+    @admin.display()
+    def throughput(self, obj):
+        return f"{obj.throughput:.2f}/s"
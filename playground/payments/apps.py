@@ -6,4 +6,8 @@ class PaymentsConfig(AppConfig):
     name = "payments"
 
     def ready(self):
-        pass
+        from . import cache, queries, tracing  # noqa: PLC0415
+
+        cache.install()
+        queries.install()
+        tracing.install()
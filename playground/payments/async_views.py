@@ -0,0 +1,179 @@
+import orjson
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.exceptions import APIException, ParseError
+from rest_framework.request import Request
+from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND
+
+from .cache import get_balance_cache
+from .conditional import (
+    is_conditional,
+    not_modified,
+    object_validators,
+    page_etag,
+    set_validators,
+)
+from .fastpath import FastJSONRenderer, FastSerializer
+from .models import Customer
+from .pagination import KeysetCursorPagination
+from .queries import query_budget
+from .serializers import CustomerSerializer, TransactionProcessRequestSerializer
+from .striping import customer_balances, sum_slot_balances
+from .views import (
+    CustomerDetailAPIView,
+    CustomerListCreateAPIView,
+    TransactionListAPIView,
+    TransactionProcessAPIView,
+    balance_cache_entry,
+    process_transaction,
+)
+
+
+def json_response(data, status: int = HTTP_200_OK) -> HttpResponse:
+    """Response with the same body and content type as a DRF Response rendered as JSON."""
+    return HttpResponse(
+        FastJSONRenderer().render(data), status=status, content_type="application/json"
+    )
+
+
+def error_response(exc: APIException) -> HttpResponse:
+    """Same body as the DRF exception handler."""
+    data = exc.detail if isinstance(exc.detail, list | dict) else {"detail": exc.detail}
+    return json_response(data, exc.status_code)
+
+
+class AsyncView(View):
+    """
+    Async views of the payments endpoints, served under ASGI (PAYMENTS_ASYNC_VIEWS).
+    Handlers without an async implementation run the DRF view (sync_view) on a thread.
+    """
+    sync_view = None
+
+    async def run_sync(self, request, *args, **kwargs):
+        return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+
+
+class AsyncListView(AsyncView):
+    """
+    Cursor pages of a DRF list view read with the async ORM, with the same filters,
+    ordering, ETag and body. Offset pages (?page=N) and writes run the DRF view.
+    """
+    list_view: type[TransactionListAPIView | CustomerListCreateAPIView]
+
+    @query_budget(3)
+    async def get(self, request):
+        drf_request = Request(request)
+        view = self.list_view(request=drf_request, args=(), kwargs={}, format_kwarg=None)
+        paginator = view.paginator
+        if (
+            not isinstance(paginator, KeysetCursorPagination)
+            or not settings.PAYMENTS_FAST_SERIALIZERS
+        ):
+            return await self.run_sync(request)
+
+        try:
+            fast, queryset = view.fast_queryset()
+            if is_conditional(request):
+                rows = await paginator.apage_validators(queryset, drf_request, view)
+                if response := not_modified(request, page_etag(request, rows)):
+                    return response
+            page = await paginator.apaginate_queryset(queryset, drf_request, view)
+        except APIException as exc:
+            return error_response(exc)
+
+        data = paginator.get_paginated_response(fast.serialize(page)).data
+        return set_validators(json_response(data), page_etag(request, paginator.validator_rows))
+
+
+class AsyncCustomerListCreateView(AsyncListView):
+    list_view = CustomerListCreateAPIView
+    sync_view = staticmethod(CustomerListCreateAPIView.as_view())
+
+    async def post(self, request):
+        return await self.run_sync(request)
+
+
+class AsyncTransactionListView(AsyncListView):
+    list_view = TransactionListAPIView
+    sync_view = staticmethod(TransactionListAPIView.as_view())
+
+
+class AsyncCustomerDetailView(AsyncView):
+    """Async GET of CustomerDetailAPIView, with the same validators. DELETE runs it."""
+    sync_view = staticmethod(CustomerDetailAPIView.as_view())
+
+    @query_budget(2)
+    async def get(self, request, id):
+        if is_conditional(request):
+            updated_at = await (
+                Customer.objects.filter(id=id).values_list("updated_at", flat=True).afirst()
+            )
+            validators = updated_at and object_validators("customer", id, updated_at)
+            if validators and (response := not_modified(request, *validators)):
+                return response
+
+        fast = FastSerializer(CustomerSerializer)
+        row = await Customer.objects.filter(id=id).values_list(*fast.columns, named=True).afirst()
+        if row is None:
+            return json_response(
+                {"detail": "No Customer matches the given query."}, HTTP_404_NOT_FOUND
+            )
+
+        [data] = fast.serialize([row])
+        return set_validators(
+            json_response(data), *object_validators("customer", id, row.updated_at)
+        )
+
+    async def delete(self, request, id):
+        return await self.run_sync(request, id=id)
+
+
+class AsyncCustomerBalanceView(AsyncView):
+    """Async GET of CustomerBalanceAPIView, on the same balance cache entries."""
+
+    @query_budget(1)
+    async def get(self, request, id):
+        cached = await get_balance_cache().aget_or_load(id, lambda: self._load(id))
+        if cached is None:
+            return json_response(
+                {"detail": "Balance not found for this customer."}, HTTP_404_NOT_FOUND
+            )
+
+        if response := not_modified(request, cached["etag"], cached["last_modified"]):
+            return response
+        return set_validators(
+            json_response(cached["data"]), cached["etag"], cached["last_modified"]
+        )
+
+    async def _load(self, id) -> dict | None:
+        balances = [balance async for balance in customer_balances(id)]
+        return balance_cache_entry(id, sum_slot_balances(balances))
+
+
+class AsyncTransactionProcessView(AsyncView):
+    """
+    Async POST of TransactionProcessAPIView, for JSON bodies. Parsing, validation and the
+    response stay on the event loop. Processing locks and updates the balance in one
+    database transaction, which the async ORM does not support, so it runs on a thread.
+    """
+    sync_view = staticmethod(TransactionProcessAPIView.as_view())
+
+    @query_budget(9)
+    async def post(self, request):
+        if request.content_type != "application/json":
+            return await self.run_sync(request)
+        try:
+            body = orjson.loads(request.body)
+        except orjson.JSONDecodeError as err:
+            return error_response(ParseError(f"JSON parse error - {err}"))
+
+        serializer = TransactionProcessRequestSerializer(data=body)
+        if not serializer.is_valid():
+            return json_response(serializer.errors, HTTP_400_BAD_REQUEST)
+
+        data, status = await sync_to_async(process_transaction)(
+            body.get("customer_id"), serializer.validated_data
+        )
+        return json_response(data, status)
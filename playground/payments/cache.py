@@ -0,0 +1,348 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterable
+
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.signals import post_delete, post_save
+from django.db.transaction import on_commit
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: dict | None = None
+        self.error: BaseException | None = None
+
+
+class BalanceCache(ABC):
+    """
+    Read-through cache of serialized customer balances.
+    Entries are versioned by customer: invalidate() bumps the customer version after the
+    posting transaction commits, so a value loaded before the commit is stored under the
+    old version and never read again. Concurrent misses of a key on the same process are
+    coalesced (singleflight): one caller loads it and the others wait for its result (or
+    error) up to wait_timeout seconds, then load it themselves.
+    """
+    ttl: int
+    wait_timeout: float
+    # Backends doing network I/O, which async views call from a worker thread
+    blocking = True
+    # Backend errors on which balances are loaded without the cache
+    errors: tuple[type[Exception], ...] = ()
+
+    def __init__(self, ttl: int | None = None, wait_timeout: float | None = None):
+        self.ttl = ttl or settings.PAYMENTS_BALANCE_CACHE_TTL
+        self.wait_timeout = wait_timeout or settings.PAYMENTS_BALANCE_CACHE_WAIT_TIMEOUT
+        self._flights: dict[str, _Flight] = {}
+        self._flights_lock = threading.Lock()
+        # Futures belong to their event loop, so async flights are per loop
+        self._async_flights: dict[tuple[asyncio.AbstractEventLoop, str], asyncio.Future] = {}
+
+    @abstractmethod
+    def get(self, key: str) -> dict | None:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: dict) -> None:
+        pass
+
+    @abstractmethod
+    def version(self, customer_id: str) -> int:
+        pass
+
+    @abstractmethod
+    def bump(self, customer_ids: list[str]) -> None:
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
+
+    def get_or_load(self, customer_id, loader: Callable[[], dict | None]) -> dict | None:
+        """Cached balance of the customer, loaded once per version. None is not cached."""
+        try:
+            key = f"{customer_id}:{self.version(str(customer_id))}"
+            value = self.get(key)
+        except self.errors as err:
+            logger.warning("[payments.cache] balance cache unavailable: %s", err)
+            return loader()
+        if value is not None:
+            return value
+
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if not flight.done.wait(self.wait_timeout):
+                logger.warning(
+                    "[payments.cache] balance of %s still loading after %ss, loading it again",
+                    customer_id, self.wait_timeout,
+                )
+                return loader()
+            if flight.error:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+        except BaseException as err:
+            flight.error = err
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[key]
+            flight.done.set()
+
+        if flight.value is not None:
+            self._store(key, flight.value)
+        return flight.value
+
+    def _store(self, key: str, value: dict) -> None:
+        try:
+            self.set(key, value)
+        except self.errors as err:
+            logger.warning("[payments.cache] balance cache unavailable: %s", err)
+
+    async def aget_or_load(
+        self, customer_id, loader: Callable[[], Awaitable[dict | None]]
+    ) -> dict | None:
+        """
+        get_or_load for async views, with an async loader. Concurrent misses of a key on the
+        event loop are coalesced on a future, with the same error and timeout handling.
+        """
+        try:
+            key = f"{customer_id}:{await self._run(self.version, str(customer_id))}"
+            value = await self._run(self.get, key)
+        except self.errors as err:
+            logger.warning("[payments.cache] balance cache unavailable: %s", err)
+            return await loader()
+        if value is not None:
+            return value
+
+        loop = asyncio.get_running_loop()
+        flight = self._async_flights.get((loop, key))
+        if flight is not None:
+            return await self._await_flight(flight, customer_id, loader)
+
+        value = await self._lead_flight(loop, key, loader)
+        if value is not None:
+            await self._run(self._store, key, value)
+        return value
+
+    async def _await_flight(self, flight: asyncio.Future, customer_id, loader) -> dict | None:
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight), self.wait_timeout)
+        except TimeoutError:
+            logger.warning(
+                "[payments.cache] balance of %s still loading after %ss, loading it again",
+                customer_id, self.wait_timeout,
+            )
+            return await loader()
+        except asyncio.CancelledError:
+            # The leader was cancelled, unless this request was
+            if not flight.cancelled() or asyncio.current_task().cancelling():
+                raise
+            return await loader()
+
+    async def _lead_flight(self, loop: asyncio.AbstractEventLoop, key: str, loader) -> dict | None:
+        flight = self._async_flights[(loop, key)] = loop.create_future()
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as err:
+            flight.set_exception(err)
+            # Retrieved, so a flight without waiters doesn't log it again
+            flight.exception()
+            raise
+        else:
+            flight.set_result(value)
+        finally:
+            del self._async_flights[(loop, key)]
+        return value
+
+    async def _run(self, method, *args):
+        if not self.blocking:
+            return method(*args)
+        return await sync_to_async(method, thread_sensitive=False)(*args)
+
+    def invalidate(self, customer_ids: Iterable) -> None:
+        """Bumps the customers versions once the current transaction commits."""
+        customer_ids = sorted({str(customer_id) for customer_id in customer_ids})
+        on_commit(lambda: self._bump(customer_ids))
+
+    def _bump(self, customer_ids: list[str]) -> None:
+        # The posting is already committed: a lost bump only serves the old balance up to the ttl
+        try:
+            self.bump(customer_ids)
+        except self.errors as err:
+            logger.warning(
+                "[payments.cache] balance versions of %s not bumped: %s",
+                ", ".join(customer_ids), err,
+            )
+
+
+class LocalBalanceCache(BalanceCache):
+    """
+    Per process LRU cache with TTL, up to PAYMENTS_BALANCE_CACHE_SIZE entries.
+    Versions are only bumped on the process that posted, so other processes (gunicorn
+    workers, Celery settlement) may serve a balance up to the ttl old: it is the default
+    only without Redis, for development and tests.
+
+    Versions come from a process clock and up to maxsize customers keep theirs. Over that,
+    the least recently bumped half is dropped and the version of unknown customers (the
+    floor) moves past every version given, so a customer version never goes back to one
+    of its old entries.
+    """
+    blocking = False
+
+    def __init__(self, ttl: int | None = None, maxsize: int | None = None):
+        super().__init__(ttl)
+        self.maxsize = maxsize or settings.PAYMENTS_BALANCE_CACHE_SIZE
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._versions: OrderedDict[str, int] = OrderedDict()
+        self._clock = 0
+        self._floor = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: dict) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def version(self, customer_id: str) -> int:
+        return self._versions.get(customer_id, self._floor)
+
+    def bump(self, customer_ids: list[str]) -> None:
+        with self._lock:
+            for customer_id in customer_ids:
+                # Entries of older versions are unreachable and leave on LRU eviction or ttl
+                self._clock += 1
+                self._versions[customer_id] = self._clock
+                self._versions.move_to_end(customer_id)
+
+            if len(self._versions) > self.maxsize:
+                while len(self._versions) > self.maxsize // 2:
+                    self._versions.popitem(last=False)
+                self._clock += 1
+                self._floor = self._clock
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._clock = self._floor = 0
+
+
+class RedisBalanceCache(BalanceCache):
+    """
+    Cache shared by every process on Redis. Versions are kept without expiration,
+    so a bump is never lost, and entries expire after the ttl.
+    """
+    key_prefix = "payments:balance:"
+    errors = (redis.RedisError,)
+
+    def __init__(self, ttl: int | None = None, client=None):
+        super().__init__(ttl)
+        self.client = client or redis.Redis.from_url(settings.PAYMENTS_BALANCE_CACHE_REDIS_URL)
+
+    def get(self, key: str) -> dict | None:
+        value = self.client.get(f"{self.key_prefix}{key}")
+        return json.loads(value) if value else None
+
+    def set(self, key: str, value: dict) -> None:
+        self.client.set(
+            f"{self.key_prefix}{key}", json.dumps(value, cls=DjangoJSONEncoder), ex=self.ttl
+        )
+
+    def version(self, customer_id: str) -> int:
+        return int(self.client.get(f"{self.key_prefix}version:{customer_id}") or 0)
+
+    def bump(self, customer_ids: list[str]) -> None:
+        pipeline = self.client.pipeline(transaction=False)
+        for customer_id in customer_ids:
+            pipeline.incr(f"{self.key_prefix}version:{customer_id}")
+        pipeline.execute()
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(f"{self.key_prefix}*"):
+            self.client.delete(key)
+
+
+class NoBalanceCache(BalanceCache):
+    """Disabled cache: every read loads the balance, misses are still coalesced."""
+    blocking = False
+
+    def get(self, key: str) -> dict | None:
+        return None
+
+    def set(self, key: str, value: dict) -> None:
+        pass
+
+    def version(self, customer_id: str) -> int:
+        return 0
+
+    def bump(self, customer_ids: list[str]) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+BACKENDS = {"local": LocalBalanceCache, "redis": RedisBalanceCache, "off": NoBalanceCache}
+_caches: dict[str, BalanceCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_balance_cache() -> BalanceCache:
+    """Returns the balance cache of the process, on PAYMENTS_BALANCE_CACHE_BACKEND."""
+    backend = settings.PAYMENTS_BALANCE_CACHE_BACKEND
+    if backend not in BACKENDS:
+        logger.error("[payments.cache] invalid balance cache backend: %s", backend)
+        raise ValueError(f"Invalid balance cache backend: {backend}")
+
+    with _caches_lock:
+        if backend not in _caches:
+            _caches[backend] = BACKENDS[backend]()
+        return _caches[backend]
+
+
+def _invalidate_customer(sender, instance, created=False, **kwargs) -> None:
+    # Cached balances nest the customer, so they are stale once it changes
+    if not created:
+        get_balance_cache().invalidate([instance.id])
+
+
+def install() -> None:
+    """Invalidates the cached balances of customers when they are updated or deleted."""
+    for signal in (post_save, post_delete):
+        signal.connect(
+            _invalidate_customer, sender="payments.Customer", dispatch_uid="payments.cache"
+        )
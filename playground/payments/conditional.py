@@ -0,0 +1,70 @@
+from datetime import datetime
+from hashlib import sha1
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .pagination import KeysetCursorPagination
+
+CONDITIONAL_HEADERS = ("HTTP_IF_NONE_MATCH", "HTTP_IF_MODIFIED_SINCE")
+
+
+def make_etag(*parts) -> str:
+    """Strong validator built from the values the representation depends on."""
+    return f'"{sha1("|".join(str(part) for part in parts).encode()).hexdigest()}"'  # noqa: S324
+
+
+def object_validators(name: str, id, *updated_at: datetime) -> tuple[str, float]:
+    """ETag and Last-Modified of an object representation depending on these updated_at."""
+    etag = make_etag(name, id, *(value.isoformat() for value in updated_at))
+    return etag, max(updated_at).timestamp()
+
+
+def is_conditional(request) -> bool:
+    return any(header in request.META for header in CONDITIONAL_HEADERS)
+
+
+def not_modified(request, etag: str, last_modified: float | None = None):
+    """304 Not Modified response when the client validators still match, else None."""
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified) if last_modified else None
+    )
+    return set_validators(response, etag, last_modified) if response else None
+
+
+def set_validators(response, etag: str, last_modified: float | None = None):
+    """Adds the validators, and asks clients to revalidate them instead of guessing freshness."""
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def page_etag(request, rows: list[tuple]) -> str:
+    return make_etag(request.get_full_path(), *(f"{id}@{updated_at}" for id, updated_at in rows))
+
+
+class ConditionalListMixin:
+    """
+    Conditional GET for keyset paginated lists. The ETag covers the request path and the
+    id and updated_at of the page rows (plus the row telling if there is a next page), so
+    it changes when any row of the page is updated, added or removed. A conditional request
+    reads only those two columns of the page, and answers 304 without serializing anything.
+    Lists have no Last-Modified: removed rows would not move it.
+    Offset pagination (?page=N) is not conditional.
+    """
+
+    def list(self, request, *args, **kwargs):
+        paginator = self.paginator
+        if not isinstance(paginator, KeysetCursorPagination):
+            return super().list(request, *args, **kwargs)
+
+        if is_conditional(request):
+            queryset = self.filter_queryset(self.get_queryset())
+            rows = paginator.page_validators(queryset, request, self)
+            if response := not_modified(request, page_etag(request, rows)):
+                return response
+
+        response = super().list(request, *args, **kwargs)
+        return set_validators(response, page_etag(request, paginator.validator_rows))
@@ -33,6 +33,11 @@ class PayableStatus(TextChoices):
     WAITING_FUNDS = "waiting_funds"
 
 
+class BalanceBucket(TextChoices):
+    AVAILABLE = "available"
+    WAITING_FUNDS = "waiting_funds"
+
+
 class CustomerType(TextChoices):
     INDIVIDUAL = "individual"
     CORPORATE = "corporate"
@@ -43,6 +48,21 @@ class DocumentType(StrEnum):
     CNPJ = "CNPJ"
 
 
+class SettlementRunStatus(TextChoices):
+    RUNNING = "running"
+    FAILED = "failed"
+    FINISHED = "finished"
+
+
+# Runs resumed by the next settlement
+UNFINISHED_RUN_STATUSES = [SettlementRunStatus.RUNNING, SettlementRunStatus.FAILED]
+
+
+class SettlementMode(StrEnum):
+    ROW = "row"
+    SET = "set"
+
+
 class ExpectedFees(float, Enum):
     CREDIT_CARD = 0.05
     DEBIT_CARD = 0.03
@@ -16,3 +16,18 @@ class TransactionFailedError(Exception):
 class PayableScheduledError(Exception):
     """Exception raised for error on scheduled payables."""
     pass
+
+
+class BalanceEntryImmutableError(Exception):
+    """Exception raised when changing or deleting append-only balance entries."""
+    pass
+
+
+class LeaseLostError(Exception):
+    """Exception raised when a lease lock expired and was taken over by another owner."""
+    pass
+
+
+class QueryBudgetExceededError(Exception):
+    """Exception raised when a view or service runs more SQL queries than its budget."""
+    pass
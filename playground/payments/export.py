@@ -0,0 +1,102 @@
+import csv
+import io
+import logging
+import re
+from collections.abc import Iterable, Iterator
+from itertools import islice
+
+import orjson
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+from rest_framework import serializers
+from rest_framework.negotiation import DefaultContentNegotiation
+
+from .fastpath import FastSerializer
+
+logger = logging.getLogger(__name__)
+
+ACCEPTS_GZIP = re.compile(r"\bgzip\b")
+
+
+async def _chunks_on_thread(chunks: Iterator[bytes]):
+    """
+    Async iterator over the chunks for ASGI, which would read a sync iterator to the end
+    before sending it. Each chunk is read on the request thread, where the cursor lives.
+    """
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close, thread_sensitive=True)()
+
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    """Exports are not rendered, any Accept header gets them (and errors as JSON)."""
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class ExportService:
+    """
+    Streams a queryset as NDJSON (one JSON object per line) or CSV.
+    Rows are read from a server-side cursor, PAYMENTS_EXPORT_CHUNK_SIZE at a time, as
+    values_list() tuples serialized by FastSerializer, so memory does not grow with the
+    export size. Each chunk is written (and compressed) as soon as it is read.
+    """
+    content_types = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+    def __init__(self, serializer_class: type[serializers.ModelSerializer], output: str):
+        if output not in self.content_types:
+            raise ValueError(f"Invalid export output: {output}")
+        self.serializer = FastSerializer(serializer_class)
+        self.output = output
+        self.chunk_size = settings.PAYMENTS_EXPORT_CHUNK_SIZE
+
+    def chunks(self, queryset) -> Iterator[bytes]:
+        name = queryset.model._meta.verbose_name_plural
+        rows = queryset.values_list(*self.serializer.columns).iterator(chunk_size=self.chunk_size)
+        exported = 0
+
+        logger.info("[payments.export] export started: %s | output - %s", name, self.output)
+        if self.output == "csv":
+            yield self._csv([[field for field, _ in self.serializer.fields()]])
+        try:
+            while chunk := list(islice(rows, self.chunk_size)):
+                items = self.serializer.serialize(chunk)
+                yield (
+                    self._csv(item.values() for item in items) if self.output == "csv"
+                    else self._ndjson(items)
+                )
+                exported += len(chunk)
+        finally:
+            logger.info("[payments.export] export finished: %s | rows - %s", name, exported)
+
+    def response(self, request, queryset, filename: str) -> StreamingHttpResponse:
+        """Streaming response, gzipped on the fly when the client accepts it."""
+        content = self.chunks(queryset)
+        gzip = bool(ACCEPTS_GZIP.search(request.headers.get("Accept-Encoding", "")))
+        if gzip:
+            content = compress_sequence(content)
+        if isinstance(getattr(request, "_request", request), ASGIRequest):
+            content = _chunks_on_thread(content)
+
+        response = StreamingHttpResponse(content, content_type=self.content_types[self.output])
+        response["Content-Disposition"] = f'attachment; filename="{filename}.{self.output}"'
+        if gzip:
+            response["Content-Encoding"] = "gzip"
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
+    def _ndjson(self, items: list[dict]) -> bytes:
+        return b"".join(orjson.dumps(item) + b"\n" for item in items)
+
+    def _csv(self, rows: Iterable[Iterable]) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode()
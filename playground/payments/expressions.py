@@ -0,0 +1,11 @@
+from django.db.models import Func, IntegerField
+
+
+class StableHash(Func):
+    """
+    Non-negative hash of a column (PostgreSQL hashtext), stable across processes.
+    Used to split customers in shards and settlement slots.
+    """
+    function = "hashtext"
+    template = "(%(function)s(%(expressions)s::text) & 2147483647)"
+    output_field = IntegerField()
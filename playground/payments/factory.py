@@ -1,17 +1,30 @@
 import logging
 from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
-from decimal import Decimal
 
-from django.db.transaction import atomic
 from django.utils import timezone
 
-from .enums import ExpectedFees, PayableStatus, TransactionMethod, TransactionStatus
-from .models import BalanceHistory, Customer, Payable
+from .enums import (
+    BalanceBucket,
+    ExpectedFees,
+    PayableStatus,
+    TransactionMethod,
+    TransactionStatus,
+)
+from .models import Customer, Payable
 from .models import Transaction as TransactionModel
+from .posting import BalancePosting, BalancePostingService
+from .striping import balance_for_transaction
+from .tracing import traced
+
+logger = logging.getLogger(__name__)
 
 
 class Transaction(ABC):
+    @abstractmethod
+    def build_payable(self, transaction: TransactionModel, customer: Customer) -> Payable:
+        pass
+
     @abstractmethod
     def create_payable(self, transaction: TransactionModel, customer: Customer) -> Payable:
         pass
@@ -44,45 +57,59 @@ class CreditCardTransaction(Transaction):
     payable_status: str
     expected_fee: float
     payment_date: datetime
+    balance_bucket: str
 
     def __init__(self):
         self.payable_status = PayableStatus.WAITING_FUNDS
         self.expected_fee = ExpectedFees.CREDIT_CARD
         self.payment_date = timezone.now() + timedelta(days=30)
+        self.balance_bucket = BalanceBucket.WAITING_FUNDS
+
+    def build_payable(self, transaction: TransactionModel, customer: Customer) -> Payable:
+        calculated_amount = transaction.value - (transaction.value * self.expected_fee)
+        return Payable(
+            transaction=transaction,
+            customer=customer,
+            status=self.payable_status,
+            payment_date=self.payment_date,
+            amount=calculated_amount
+        )
 
+    @traced()
     def create_payable(self, transaction: TransactionModel, customer: Customer) -> Payable:
-            calculated_amount = transaction.value - (transaction.value * self.expected_fee)
-            return Payable.objects.create(
-                transaction=transaction,
-                customer=customer,
-                status=self.payable_status,
-                payment_date=self.payment_date,
-                amount=calculated_amount
-            )
+        payable = self.build_payable(transaction, customer)
+        payable.save(force_insert=True)
+        return payable
 
-    @atomic
+    @traced()
     def apply_payable_on_balance(self, payable: Payable, customer: Customer) -> None:
-        BalanceHistory.objects.create(
-            balance=customer.balance,
-            available=customer.balance.available,
-            waiting_funds=customer.balance.waiting_funds,
-        )
-        customer.balance.waiting_funds += Decimal(payable.amount)
-        customer.balance.save()
+        balance = balance_for_transaction(customer, payable.transaction_id)
+        values = BalancePostingService().post([
+            BalancePosting(
+                balance_id=balance.id,
+                waiting_funds=payable.amount,
+                payable_id=payable.id,
+                transaction_id=payable.transaction_id,
+            )
+        ])
+        for bucket, value in values[balance.id].items():
+            setattr(balance, bucket, value)
 
+    @traced()
     def finish_transaction(self, transaction: TransactionModel) -> None:
         transaction.status = TransactionStatus.PROCESSED
         transaction.expected_fee = self.expected_fee
         transaction.save()
 
-        logging.info(
-            f"[payments.factory] transaction {transaction.id} processed as credit_card; "
-            f"Fee applied {transaction.expected_fee.value}; "
-            f"Payment will be available at {self.payment_date}."
+        logger.info(
+            "[payments.factory] transaction %s processed as credit_card; Fee applied %s; "
+            "Payment will be available at %s.",
+            transaction.id, transaction.expected_fee.value, self.payment_date,
         )
 
+    @traced()
     def fail_transaction(self, transaction: TransactionModel) -> None:
-        logging.info(f"[payments.factory] transaction {transaction.id} failed.")
+        logger.info("[payments.factory] transaction %s failed.", transaction.id)
 
         transaction.status = TransactionStatus.FAILED
         transaction.save()
@@ -92,15 +119,17 @@ class DebitCardTransaction(Transaction):
     payable_status: str
     expected_fee: float
     payment_date: datetime
+    balance_bucket: str
 
     def __init__(self):
         self.payable_status = PayableStatus.PAID
         self.expected_fee = ExpectedFees.DEBIT_CARD
         self.payment_date = timezone.now()
+        self.balance_bucket = BalanceBucket.AVAILABLE
 
-    def create_payable(self, transaction: TransactionModel, customer: Customer) -> Payable:
+    def build_payable(self, transaction: TransactionModel, customer: Customer) -> Payable:
         calculated_amount = transaction.value - (transaction.value * self.expected_fee)
-        return Payable.objects.create(
+        return Payable(
             transaction=transaction,
             customer=customer,
             status=self.payable_status,
@@ -108,28 +137,40 @@ class DebitCardTransaction(Transaction):
             amount=calculated_amount
         )
 
-    @atomic
+    @traced()
+    def create_payable(self, transaction: TransactionModel, customer: Customer) -> Payable:
+        payable = self.build_payable(transaction, customer)
+        payable.save(force_insert=True)
+        return payable
+
+    @traced()
     def apply_payable_on_balance(self, payable: Payable, customer: Customer) -> None:
-        BalanceHistory.objects.create(
-            balance=customer.balance,
-            available=customer.balance.available,
-            waiting_funds=customer.balance.waiting_funds,
-        )
-        customer.balance.available += Decimal(payable.amount)
-        customer.balance.save()
+        balance = balance_for_transaction(customer, payable.transaction_id)
+        values = BalancePostingService().post([
+            BalancePosting(
+                balance_id=balance.id,
+                available=payable.amount,
+                payable_id=payable.id,
+                transaction_id=payable.transaction_id,
+            )
+        ])
+        for bucket, value in values[balance.id].items():
+            setattr(balance, bucket, value)
 
+    @traced()
     def finish_transaction(self, transaction: TransactionModel) -> None:
         transaction.status = TransactionStatus.PROCESSED
         transaction.expected_fee = self.expected_fee
         transaction.save()
 
-        logging.info(
-            f"[payments.factory] transaction {transaction.id} processed as debit_card; "
-            f"Fee applied {transaction.expected_fee.value}. "
+        logger.info(
+            "[payments.factory] transaction %s processed as debit_card; Fee applied %s. ",
+            transaction.id, transaction.expected_fee.value,
         )
 
+    @traced()
     def fail_transaction(self, transaction: TransactionModel) -> None:
-        logging.info(f"[payments.factory] transaction {transaction.id} failed.")
+        logger.info("[payments.factory] transaction %s failed.", transaction.id)
 
         transaction.status = TransactionStatus.FAILED
         transaction.save()
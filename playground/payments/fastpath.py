@@ -0,0 +1,164 @@
+import decimal
+from collections.abc import Callable, Iterable
+
+import orjson
+from django.conf import settings
+from django.db.models import QuerySet
+from rest_framework import serializers
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+ISO_8601 = "iso-8601"
+# Fields whose column values are already their representation
+PLAIN_FIELDS = (serializers.CharField, serializers.BooleanField, serializers.IntegerField)
+
+
+def _decimal_converter(field: serializers.DecimalField) -> Callable | None:
+    """Same as DecimalField.to_representation, with the quantize context built once."""
+    coerce_to_string = getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output:
+        return None
+    if field.decimal_places is None:
+        return lambda value: f"{value:f}"
+
+    exponent = decimal.Decimal(".1") ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+    return lambda value: f"{value.quantize(exponent, rounding=rounding, context=context):f}"
+
+
+def _datetime_converter(field: serializers.DateTimeField) -> Callable | None:
+    """Same as DateTimeField.to_representation for aware values and ISO 8601 output."""
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    timezone = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or timezone is None:
+        return None
+
+    def convert(value):
+        value = value.astimezone(timezone).isoformat()
+        return f"{value[:-6]}Z" if value.endswith("+00:00") else value
+
+    return convert
+
+
+def _converter(field: serializers.Field) -> Callable | None:
+    """
+    Converter of a column value to its representation, None when the value from the
+    database already is it. Types without a fast converter use field.to_representation.
+    """
+    if isinstance(field, serializers.DecimalField):
+        return _decimal_converter(field) or field.to_representation
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime_converter(field) or field.to_representation
+    if isinstance(field, serializers.UUIDField) and field.uuid_format == "hex_verbose":
+        return str
+    if isinstance(field, serializers.ChoiceField):
+        choices = field.choice_strings_to_values
+        return lambda value: choices.get(str(value), value)
+    if isinstance(field, PLAIN_FIELDS):
+        return None
+    return field.to_representation
+
+
+class FastSerializer:
+    """
+    Read only serialization of a ModelSerializer from values_list() rows.
+    The readable fields must be plain model columns; each one gets a converter compiled
+    from its serializer field, so the output is the same as serializer.data without
+    building a model instance and a serializer per row.
+    """
+
+    def __init__(self, serializer_class: type[serializers.ModelSerializer]):
+        self.serializer_class = serializer_class
+        # Foreign keys are columns by their attname (customer_id), not as related objects
+        columns = {field.attname for field in serializer_class.Meta.model._meta.concrete_fields}
+        self.columns = []
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if field.source not in columns:
+                raise ValueError(f"Field {name} of {serializer_class.__name__} is not a column.")
+            self.columns.append(field.source)
+
+    def fields(self) -> list[tuple[str, Callable | None]]:
+        """Output name and converter of each column, compiled for the current timezone."""
+        return [
+            (name, _converter(field))
+            for name, field in self.serializer_class().fields.items()
+            if not field.write_only
+        ]
+
+    def serialize(self, rows: Iterable[tuple]) -> list[dict]:
+        """Rows must start with the columns, in order, and may have more values after them."""
+        fields = [(index, name, convert) for index, (name, convert) in enumerate(self.fields())]
+        data = []
+        for row in rows:
+            item = {}
+            for index, name, convert in fields:
+                value = row[index]
+                item[name] = value if value is None or convert is None else convert(value)
+            data.append(item)
+        return data
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with orjson. The output has the same bytes as JSONRenderer
+    with the default settings (compact, unicode and U+2028/U+2029 escaped); other
+    settings, indented output and values orjson would write differently (datetimes,
+    Decimals, lazy strings) fall back to it.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            data is None
+            or not api_settings.COMPACT_JSON
+            or not api_settings.UNICODE_JSON
+            or self.get_indent(accepted_media_type or "", renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            content = orjson.dumps(
+                data, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return (
+            content
+            .replace("\u2028".encode(), b"\\u2028")
+            .replace("\u2029".encode(), b"\\u2029")
+        )
+
+
+class FastListMixin:
+    """
+    Lists served with FastSerializer from values_list() rows and FastJSONRenderer,
+    when PAYMENTS_FAST_SERIALIZERS is on. The rows carry the serializer columns plus the
+    id, updated_at and ordering fields the paginators read by attribute.
+    """
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def list(self, request, *args, **kwargs):
+        if not settings.PAYMENTS_FAST_SERIALIZERS:
+            return super().list(request, *args, **kwargs)
+
+        fast, queryset = self.fast_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(fast.serialize(page))
+        return Response(fast.serialize(queryset))
+
+    def fast_queryset(self) -> tuple[FastSerializer, QuerySet]:
+        """FastSerializer of the view and its filtered values_list() queryset."""
+        fast = FastSerializer(self.get_serializer_class())
+        extra = [
+            column for column in ["id", "updated_at", *getattr(self, "ordering_fields", [])]
+            if column not in fast.columns
+        ]
+        return fast, self.filter_queryset(self.get_queryset()).values_list(
+            *fast.columns, *extra, named=True
+        )
@@ -0,0 +1,27 @@
+from django_filters import ChoiceFilter, FilterSet, IsoDateTimeFilter
+
+from .enums import TransactionMethod
+from .models import Payable, Transaction
+
+
+class TransactionExportFilter(FilterSet):
+    """Filters of the transactions list, plus a [created_after, created_before) range."""
+    created_after = IsoDateTimeFilter(field_name="created_at", lookup_expr="gte")
+    created_before = IsoDateTimeFilter(field_name="created_at", lookup_expr="lt")
+
+    class Meta:
+        model = Transaction
+        fields = ["status", "method"]
+
+
+class PayableExportFilter(FilterSet):
+    """Payables by status and transaction method, with created_at and payment_date ranges."""
+    method = ChoiceFilter(field_name="transaction__method", choices=TransactionMethod.choices)
+    created_after = IsoDateTimeFilter(field_name="created_at", lookup_expr="gte")
+    created_before = IsoDateTimeFilter(field_name="created_at", lookup_expr="lt")
+    payment_after = IsoDateTimeFilter(field_name="payment_date", lookup_expr="gte")
+    payment_before = IsoDateTimeFilter(field_name="payment_date", lookup_expr="lt")
+
+    class Meta:
+        model = Payable
+        fields = ["status"]
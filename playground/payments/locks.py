@@ -0,0 +1,107 @@
+import logging
+import uuid
+from abc import ABC, abstractmethod
+from datetime import timedelta
+
+import redis
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import SettlementLease
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLock(ABC):
+    """
+    Lock held for a limited time (ttl) by an owner token.
+    The owner keeps it with renew() (heartbeat) and an expired lease can be taken over
+    by another owner, so a dead worker never blocks the lock forever.
+    The owner token can be passed to other processes, which renew or release the same lease.
+    """
+    name: str
+    ttl: int
+    owner: str
+
+    def __init__(self, name: str, ttl: int | None = None, owner: str | None = None):
+        self.name = name
+        self.ttl = ttl or settings.PAYMENTS_LOCK_TTL
+        self.owner = owner or uuid.uuid4().hex
+
+    @abstractmethod
+    def acquire(self) -> bool:
+        pass
+
+    @abstractmethod
+    def renew(self) -> bool:
+        pass
+
+    @abstractmethod
+    def release(self) -> None:
+        pass
+
+
+class RedisLeaseLock(LeaseLock):
+    key_prefix = "payments:lease:"
+
+    # Only the owner can renew or release the lease
+    renew_script = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end"
+    )
+    release_script = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('del', KEYS[1]) else return 0 end"
+    )
+
+    def __init__(self, name: str, ttl: int | None = None, owner: str | None = None, client=None):
+        super().__init__(name, ttl, owner)
+        self.client = client or redis.Redis.from_url(settings.PAYMENTS_LOCK_REDIS_URL)
+        self.key = f"{self.key_prefix}{name}"
+
+    def acquire(self) -> bool:
+        return bool(self.client.set(self.key, self.owner, nx=True, px=self.ttl * 1000))
+
+    def renew(self) -> bool:
+        return bool(self.client.eval(self.renew_script, 1, self.key, self.owner, self.ttl * 1000))
+
+    def release(self) -> None:
+        self.client.eval(self.release_script, 1, self.key, self.owner)
+
+
+class DatabaseLeaseLock(LeaseLock):
+    """Lease on a SettlementLease row, for deployments without Redis."""
+
+    def acquire(self) -> bool:
+        now = timezone.now()
+        SettlementLease.objects.bulk_create(
+            [SettlementLease(name=self.name, owner="", expires_at=now)],
+            ignore_conflicts=True,
+        )
+        return bool(SettlementLease.objects.filter(
+            Q(owner=self.owner) | Q(expires_at__lte=now), name=self.name
+        ).update(owner=self.owner, expires_at=now + timedelta(seconds=self.ttl), updated_at=now))
+
+    def renew(self) -> bool:
+        now = timezone.now()
+        return bool(SettlementLease.objects.filter(
+            name=self.name, owner=self.owner, expires_at__gt=now
+        ).update(expires_at=now + timedelta(seconds=self.ttl), updated_at=now))
+
+    def release(self) -> None:
+        now = timezone.now()
+        SettlementLease.objects.filter(name=self.name, owner=self.owner).update(
+            expires_at=now, updated_at=now
+        )
+
+
+def get_lease_lock(name: str, ttl: int | None = None, owner: str | None = None) -> LeaseLock:
+    """Returns a lease lock on the backend defined by PAYMENTS_LOCK_BACKEND."""
+    if settings.PAYMENTS_LOCK_BACKEND == "redis":
+        return RedisLeaseLock(name, ttl, owner)
+    if settings.PAYMENTS_LOCK_BACKEND == "database":
+        return DatabaseLeaseLock(name, ttl, owner)
+
+    logger.error("[payments.locks] invalid lock backend: %s", settings.PAYMENTS_LOCK_BACKEND)
+    raise ValueError(f"Invalid lock backend: {settings.PAYMENTS_LOCK_BACKEND}")
@@ -0,0 +1,122 @@
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener
+
+from . import metrics
+from .tracing import current_span
+
+# Attributes every LogRecord has, anything else was passed on `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "trace_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, trace id and `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, UTC).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+        entry.update(
+            (key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES
+        )
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Waits for room instead of failing when stopped with a full queue
+        self.queue.put(self._sentinel)
+
+
+class QueuedHandler(QueueHandler):
+    """
+    Hands records to a bounded queue drained by a QueueListener thread, which formats
+    them and writes to `filename` and/or the console, so logging I/O and formatting
+    leave the request thread. When the queue is full records are dropped and counted,
+    and a warning with the number of dropped records goes out once there is room again.
+    Forked processes (Celery prefork workers) restart the listener with a new queue.
+    """
+
+    def __init__(self, filename: str | None = None, console: bool = True, maxsize: int = 10_000):
+        # Created first, so logging.shutdown closes this handler (draining the queue) before them
+        handlers: list[logging.Handler] = [logging.StreamHandler()] if console else []
+        if filename:
+            handlers.append(logging.FileHandler(filename))
+
+        super().__init__(queue.Queue(maxsize))
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._pending_drops = 0
+        self.listener = _Listener(self.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+        self._closed = False
+
+        os.register_at_fork(after_in_child=self._restart)
+
+    def setFormatter(self, fmt: logging.Formatter | None) -> None:  # noqa: N802
+        super().setFormatter(fmt)
+        for handler in self.listener.handlers:
+            handler.setFormatter(fmt)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The message is only merged with its args on the listener thread
+        span = current_span()
+        record.trace_id = span.trace_id if span and span.sampled else None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self._pending_drops:
+            self._report_drops()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+                self._pending_drops += 1
+            metrics.LOG_RECORDS_DROPPED.inc()
+
+    def _report_drops(self) -> None:
+        with self._dropped_lock:
+            dropped, self._pending_drops = self._pending_drops, 0
+        report = logging.makeLogRecord({
+            "name": "payments.log",
+            "levelno": logging.WARNING,
+            "levelname": "WARNING",
+            "msg": "[payments.log] %s log records dropped, logging queue was full",
+            "args": (dropped,),
+        })
+        try:
+            self.queue.put_nowait(report)
+        except queue.Full:
+            with self._dropped_lock:
+                self._pending_drops += dropped
+
+    def _restart(self) -> None:
+        # Only the forking thread survives a fork, so the listener thread is gone
+        if self._closed:
+            return
+        self.queue = queue.Queue(self.maxsize)
+        self.listener = _Listener(self.queue, *self.listener.handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def close(self) -> None:
+        """Called by logging.shutdown on exit: writes the queued records before closing."""
+        if self._closed:
+            return
+        self._closed = True
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+        super().close()
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.models import Customer
+from payments.striping import BalanceStripingService
+
+
+class Command(BaseCommand):
+    help = (
+        "Promotes a customer to a striped balance with N slots, or demotes it back "
+        "to a single balance when slots is 1. Safe to run while transactions are processed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("customer_id")
+        parser.add_argument("slots", type=int)
+
+    def handle(self, *args, **options):
+        service = BalanceStripingService()
+        try:
+            if options["slots"] == 1:
+                customer = service.demote(options["customer_id"])
+            else:
+                customer = service.promote(options["customer_id"], options["slots"])
+        except (Customer.DoesNotExist, ValueError) as err:
+            raise CommandError(str(err)) from err
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Customer {customer.id} has {customer.balance_slots} balance slots."
+        ))
@@ -0,0 +1,152 @@
+import asyncio
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from statistics import quantiles
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+HOST = "localhost"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares throughput and latency of a payments endpoint served in process by the WSGI "
+        "handler (sync views on a pool of worker threads, like gunicorn gthread) and by the "
+        "ASGI handler (async views on the event loop), with concurrent clients. "
+        "--client-delay-ms simulates slow clients: the response is held that long while it is "
+        "sent, holding a worker thread under WSGI and only a coroutine under ASGI."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/transactions/?page_size=50")
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=64)
+        parser.add_argument("--threads", type=int, default=16, help="WSGI worker threads")
+        parser.add_argument("--client-delay-ms", type=int, default=0)
+
+    def handle(self, *args, **options):
+        path, _, query = options["path"].partition("?")
+        delay = options["client_delay_ms"] / 1000
+        self.stdout.write(
+            f"GET {options['path']} | {options['requests']} requests | "
+            f"{options['concurrency']} clients | client delay - {options['client_delay_ms']}ms"
+        )
+
+        with (
+            override_settings(ROOT_URLCONF="payments.urls", ALLOWED_HOSTS=[HOST]),
+            ThreadPoolExecutor(options["threads"]) as workers,
+        ):
+            wsgi = asyncio.run(self._run(
+                self._wsgi_client(WSGIHandler(), workers, path, query, delay),
+                options["requests"],
+                options["concurrency"],
+            ))
+        self._report(f"wsgi ({options['threads']} threads)", wsgi)
+
+        with override_settings(ROOT_URLCONF="payments.async_urls", ALLOWED_HOSTS=[HOST]):
+            asgi = asyncio.run(self._run(
+                self._asgi_client(ASGIHandler(), path, query, delay),
+                options["requests"],
+                options["concurrency"],
+            ))
+        self._report("asgi", asgi)
+
+    async def _run(self, request, requests: int, concurrency: int) -> dict:
+        """Closed loop: each client sends its next request when the previous one is answered."""
+        latencies = []
+        statuses = []
+        remaining = iter(range(requests))
+
+        async def client():
+            for _ in remaining:
+                started = time.perf_counter()
+                statuses.append(await request())
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return {
+            "elapsed": time.perf_counter() - started,
+            "latencies": latencies,
+            "errors": sum(status >= 400 for status in statuses),  # noqa: PLR2004
+        }
+
+    def _wsgi_client(self, handler: WSGIHandler, workers, path: str, query: str, delay: float):
+        def serve() -> int:
+            status = []
+            environ = {
+                "REQUEST_METHOD": "GET",
+                "PATH_INFO": path,
+                "QUERY_STRING": query,
+                "SERVER_NAME": HOST,
+                "SERVER_PORT": "80",
+                "HTTP_HOST": HOST,
+                "wsgi.input": io.BytesIO(),
+                "wsgi.url_scheme": "http",
+            }
+            response = handler(environ, lambda line, headers: status.append(int(line[:3])))
+            try:
+                for _ in response:
+                    pass
+                # A slow client keeps the worker thread busy while the response is sent
+                time.sleep(delay)
+            finally:
+                response.close()
+            return status[0]
+
+        async def request() -> int:
+            return await asyncio.get_running_loop().run_in_executor(workers, serve)
+
+        return request
+
+    def _asgi_client(self, handler: ASGIHandler, path: str, query: str, delay: float):
+        async def request() -> int:
+            done = asyncio.Event()
+            status = []
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode(),
+                "query_string": query.encode(),
+                "root_path": "",
+                "headers": [(b"host", HOST.encode())],
+                "client": ("127.0.0.1", 0),
+                "server": (HOST, 80),
+            }
+            messages = iter([{"type": "http.request", "body": b"", "more_body": False}])
+
+            async def receive():
+                if message := next(messages, None):
+                    return message
+                await done.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    status.append(message["status"])
+                elif not message.get("more_body"):
+                    # A slow client only keeps this coroutine waiting
+                    await asyncio.sleep(delay)
+                    done.set()
+
+            await handler(scope, receive, send)
+            return status[0]
+
+        return request
+
+    def _report(self, name: str, result: dict) -> None:
+        latencies = result["latencies"]
+        percentiles = quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        self.stdout.write(
+            f"{name} | {len(latencies) / result['elapsed']:.0f} req/s | "
+            f"p50 - {percentiles[49] * 1000:.1f}ms | p95 - {percentiles[94] * 1000:.1f}ms | "
+            f"p99 - {percentiles[98] * 1000:.1f}ms | errors - {result['errors']}"
+        )
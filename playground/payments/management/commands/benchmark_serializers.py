@@ -0,0 +1,93 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.transaction import atomic, set_rollback
+from rest_framework.renderers import JSONRenderer
+
+from payments.enums import TransactionMethod, TransactionStatus
+from payments.fastpath import FastJSONRenderer, FastSerializer
+from payments.models import Transaction
+from payments.serializers import CustomerSerializer, TransactionSerializer
+
+SERIALIZERS = {"transaction": TransactionSerializer, "customer": CustomerSerializer}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares rows/s of the DRF serializer and JSON renderer with the fast path "
+        "(values_list rows, FastSerializer and FastJSONRenderer) on a list of rows. "
+        "Missing transactions are created for the run and rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", choices=SERIALIZERS, default="transaction")
+        parser.add_argument("--rows", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        serializer_class = SERIALIZERS[options["model"]]
+        model = serializer_class.Meta.model
+        rows = options["rows"]
+
+        with atomic():
+            if model is Transaction:
+                self._fill_transactions(rows)
+            queryset = model.objects.order_by("-created_at", "-id")[:rows]
+            count = queryset.count()
+            if not count:
+                raise CommandError(f"There are no {options['model']} rows to serialize.")
+
+            fast = FastSerializer(serializer_class)
+            drf = self._best(options["repeat"], lambda: JSONRenderer().render(
+                serializer_class(queryset, many=True).data
+            ))
+            fastpath = self._best(options["repeat"], lambda: FastJSONRenderer().render(
+                fast.serialize(queryset.values_list(*fast.columns))
+            ))
+            set_rollback(True)
+
+        if drf["content"] != fastpath["content"]:
+            raise CommandError("Fast path output is different from the DRF serializer.")
+
+        self.stdout.write(
+            f"Serializing {count} {options['model']} rows, best of {options['repeat']}"
+        )
+        for name, result in (("drf", drf), ("fast", fastpath)):
+            self.stdout.write(
+                f"{name} | {count / result['elapsed']:.0f} rows/s | "
+                f"{result['elapsed'] * 1000:.1f} ms | {len(result['content']) // 1024} kB"
+            )
+        self.stdout.write(f"speedup - {drf['elapsed'] / fastpath['elapsed']:.1f}x")
+
+    def _best(self, repeat: int, run) -> dict:
+        """Best time of the runs, each one querying, serializing and rendering the rows."""
+        best = None
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            content = run()
+            elapsed = time.perf_counter() - started
+            if best is None or elapsed < best["elapsed"]:
+                best = {"elapsed": elapsed, "content": content}
+        return best
+
+    def _fill_transactions(self, rows: int) -> None:
+        missing = rows - Transaction.objects.count()
+        Transaction.objects.bulk_create(
+            [
+                Transaction(
+                    value=Decimal(index % 100_000) / 100,
+                    description=f"Benchmark transaction {index}",
+                    method=TransactionMethod.CREDIT,
+                    status=TransactionStatus.PROCESSED,
+                    expected_fee=Decimal("5.00"),
+                    card_number="4111111111111111",
+                    card_owner="Benchmark",
+                    card_expiration_year="2028",
+                    card_verification_code="123",
+                )
+                for index in range(max(missing, 0))
+            ],
+            batch_size=1000,
+        )
+
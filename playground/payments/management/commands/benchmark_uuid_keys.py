@@ -0,0 +1,59 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.transaction import atomic
+
+from payments.utils import uuid7
+
+GENERATORS = {"v4": uuid.uuid4, "v7": uuid7}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares insert throughput and primary key index size of UUIDv4 and UUIDv7 keys "
+        "on scratch tables, dropped at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Inserting {options['rows']} rows in batches of {options['batch_size']}")
+        for version, generator in GENERATORS.items():
+            result = self._benchmark(version, generator, options["rows"], options["batch_size"])
+            self.stdout.write(
+                f"{version} | {result['throughput']:.0f} rows/s | "
+                f"index size - {result['index_size'] // 1024} kB | "
+                f"bytes/row - {result['index_size'] / options['rows']:.1f}"
+            )
+
+    def _benchmark(self, version: str, generator, rows: int, batch_size: int) -> dict:
+        table = connection.ops.quote_name(f"uuid_benchmark_{version}")
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            cursor.execute(
+                f"CREATE TABLE {table} (id uuid PRIMARY KEY, "
+                "created_at timestamptz NOT NULL DEFAULT now(), "
+                "value numeric(9, 2) NOT NULL DEFAULT 0)"
+            )
+            # Ids are generated upfront, so only the database side is measured
+            ids = [str(generator()) for _ in range(rows)]
+            try:
+                started = time.perf_counter()
+                for offset in range(0, rows, batch_size):
+                    with atomic():
+                        cursor.execute(
+                            f"INSERT INTO {table} (id) SELECT unnest(%s::uuid[])",  # noqa: S608
+                            [ids[offset:offset + batch_size]],
+                        )
+                elapsed = time.perf_counter() - started
+
+                cursor.execute("SELECT pg_relation_size(%s)", [f"uuid_benchmark_{version}_pkey"])
+                index_size = cursor.fetchone()[0]
+            finally:
+                cursor.execute(f"DROP TABLE {table}")
+
+        return {"throughput": rows / elapsed if elapsed else 0.0, "index_size": index_size}
@@ -0,0 +1,110 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.transaction import atomic
+
+from payments.enums import UNFINISHED_RUN_STATUSES
+from payments.models import BalanceEntry, Payable, SettlementRun
+from payments.utils import uuid7
+
+# Append-only trigger of balance entries, which also rejects changes of their references
+APPEND_ONLY_TRIGGERS = {BalanceEntry._meta.db_table: "payments_balanceentry_append_only"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Rewrites UUIDv4 primary keys of existing rows to UUIDv7 built from their created_at, "
+        "updating every foreign key that points to them, in batches. "
+        "Ids are exposed by the API, so clients holding old ids will not find them anymore."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("models", nargs="+", help="Model names, e.g. Transaction Payable")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        models = []
+        for name in options["models"]:
+            try:
+                models.append(apps.get_model("payments", name))
+            except LookupError as err:
+                raise CommandError(str(err)) from err
+
+        if Payable in models and SettlementRun.objects.filter(
+            status__in=UNFINISHED_RUN_STATUSES
+        ).exists():
+            raise CommandError("Settlement runs keep payable ids to resume, finish them first.")
+
+        for model in models:
+            if options["dry_run"]:
+                self.stdout.write(f"{model.__name__}: {self._pending(model)} rows to rekey")
+                continue
+
+            rekeyed = 0
+            while batch := self._rekey_batch(model, options["batch_size"]):
+                rekeyed += batch
+                self.stdout.write(f"{model.__name__}: {rekeyed} rows rekeyed")
+
+            self.stdout.write(self.style.SUCCESS(f"{model.__name__}: done, {rekeyed} rows"))
+
+    def _pending(self, model) -> int:
+        table = connection.ops.quote_name(model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT count(*) FROM {table} WHERE substr(id::text, 15, 1) <> '7'"  # noqa: S608
+            )
+            return cursor.fetchone()[0]
+
+    @atomic
+    def _rekey_batch(self, model, batch_size: int) -> int:
+        """
+        Rekeys a batch in one transaction. Foreign keys are DEFERRABLE INITIALLY DEFERRED,
+        so rows and their references are updated in any order and checked on commit.
+        Append-only triggers of the updated tables are disabled until the batch ends, the
+        lock taken by ALTER TABLE keeps other transactions from writing there meanwhile.
+        """
+        quote = connection.ops.quote_name
+        table = quote(model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id, created_at FROM {table} "  # noqa: S608
+                "WHERE substr(id::text, 15, 1) <> '7' ORDER BY created_at LIMIT %s FOR UPDATE",
+                [batch_size],
+            )
+            mapping = [(str(old), str(uuid7(created_at))) for old, created_at in cursor.fetchall()]
+            if not mapping:
+                return 0
+
+            values = ", ".join(["(%s::uuid, %s::uuid)"] * len(mapping))
+            params = [value for pair in mapping for value in pair]
+            references = [
+                (relation.related_model._meta.db_table, relation.field.column)
+                for relation in model._meta.related_objects
+                if relation.field.concrete
+            ]
+            updates = [*references, (model._meta.db_table, "id")]
+            triggers = {
+                related_table: APPEND_ONLY_TRIGGERS[related_table]
+                for related_table, _ in updates
+                if related_table in APPEND_ONLY_TRIGGERS
+            }
+            self._alter_triggers(cursor, triggers, "DISABLE")
+            for related_table, column in updates:
+                cursor.execute(
+                    f"UPDATE {quote(related_table)} SET {quote(column)} = keys.new_id "  # noqa: S608
+                    f"FROM (VALUES {values}) AS keys (old_id, new_id) "
+                    f"WHERE {quote(related_table)}.{quote(column)} = keys.old_id",
+                    params,
+                )
+            if triggers:
+                # Pending foreign key checks would keep ALTER TABLE from enabling them again
+                cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+            self._alter_triggers(cursor, triggers, "ENABLE")
+
+        return len(mapping)
+
+    def _alter_triggers(self, cursor, triggers: dict[str, str], action: str) -> None:
+        quote = connection.ops.quote_name
+        for table, trigger in triggers.items():
+            cursor.execute(f"ALTER TABLE {quote(table)} {action} TRIGGER {quote(trigger)}")
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+
+from payments.models import Customer
+from payments.scheduling import SettlementSchedule
+from payments.services import PayableService
+
+
+class Command(BaseCommand):
+    help = (
+        "Shows the settlement window split in slots, with the customers and the due "
+        "payables settled on each slot."
+    )
+
+    def handle(self, *args, **options):
+        schedule = SettlementSchedule.from_settings()
+        customers = {
+            row["slot"]: row["count"]
+            for row in Customer.objects.filter(active=True).annotate(
+                slot=schedule.slot_expression()
+            ).values("slot").annotate(count=Count("id")).order_by()
+        }
+        payables = {
+            row["slot"]: row
+            for row in PayableService().get_due_payables().annotate(
+                slot=schedule.slot_expression("customer")
+            ).values("slot").annotate(count=Count("id"), amount=Sum("amount")).order_by()
+        }
+
+        self.stdout.write(
+            f"Settlement window {schedule.window_start:%H:%M}-{schedule.window_end:%H:%M} "
+            f"in {schedule.slots} slots of {schedule.slot_length}"
+        )
+        for slot in range(schedule.slots):
+            due = payables.get(slot, {})
+            self.stdout.write(
+                f"slot {slot} | starts at {schedule.slot_start(slot):%H:%M} | "
+                f"customers - {customers.get(slot, 0)} | due payables - {due.get('count', 0)} | "
+                f"amount - {due.get('amount') or 0}"
+            )
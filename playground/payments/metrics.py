@@ -0,0 +1,122 @@
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+REQUESTS = Counter(
+    "payments_http_requests",
+    "HTTP requests by view (URL name), method and status code.",
+    ["view", "method", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "payments_http_request_duration_seconds",
+    "HTTP request latency by view (URL name) and method.",
+    ["view", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "payments_http_request_queries",
+    "SQL queries executed per HTTP request by view (URL name).",
+    ["view"],
+    buckets=QUERIES_BUCKETS,
+)
+REQUEST_QUERIES_LATENCY = Histogram(
+    "payments_http_request_queries_duration_seconds",
+    "Time spent on SQL queries per HTTP request by view (URL name).",
+    ["view"],
+    buckets=LATENCY_BUCKETS,
+)
+TRANSACTIONS = Counter(
+    "payments_transactions",
+    "Processed transactions by method and resulting status.",
+    ["method", "status"],
+)
+SETTLEMENT_PAYABLES = Counter(
+    "payments_settlement_payables",
+    "Payables handled by settlement runs, by outcome (settled or failed).",
+    ["outcome"],
+)
+SETTLEMENT_CHUNK_LATENCY = Histogram(
+    "payments_settlement_chunk_duration_seconds",
+    "Settlement chunk duration, checkpoint included.",
+    buckets=LATENCY_BUCKETS,
+)
+SETTLEMENT_CHUNK_SIZE = Gauge(
+    "payments_settlement_chunk_size",
+    "Size of the next settlement chunk, picked by the adaptive throttle.",
+    multiprocess_mode="mostrecent",
+)
+SETTLEMENT_LATENCY = Gauge(
+    "payments_settlement_latency_seconds",
+    "Moving average of the settlement chunk latency, seen by the adaptive throttle.",
+    multiprocess_mode="mostrecent",
+)
+SETTLEMENT_THROTTLED = Counter(
+    "payments_settlement_throttled_seconds",
+    "Time settlement waited to stay under PAYMENTS_SETTLEMENT_MAX_RATE.",
+)
+SETTLEMENT_ERRORS = Counter(
+    "payments_settlement_errors",
+    "Settlement errors by reason: failed payable, failed chunk or lost lease.",
+    ["reason"],
+)
+
+LOG_RECORDS_DROPPED = Counter(
+    "payments_log_records_dropped",
+    "Log records dropped because the logging queue was full.",
+)
+
+TRACES_DROPPED = Counter(
+    "payments_traces_dropped",
+    "Traces dropped because the tracing export queue was full.",
+)
+
+
+def registry() -> CollectorRegistry:
+    """
+    Registry to be exported. With PROMETHEUS_MULTIPROC_DIR set (before the process starts)
+    every gunicorn worker and Celery process writes its samples to files on that directory,
+    and the exported registry aggregates the files of all of them.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+
+    collector_registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collector_registry)
+    return collector_registry
+
+
+def render() -> tuple[bytes, str]:
+    """Metrics on the text exposition format, with its content type."""
+    return generate_latest(registry()), CONTENT_TYPE_LATEST
+
+
+def record_transactions(method: str, status: str, count: int = 1) -> None:
+    TRANSACTIONS.labels(method=method, status=status).inc(count)
+
+
+def record_settlement_chunk(settled: int, failed: int, elapsed: float) -> None:
+    SETTLEMENT_PAYABLES.labels(outcome="settled").inc(settled)
+    SETTLEMENT_PAYABLES.labels(outcome="failed").inc(failed)
+    SETTLEMENT_CHUNK_LATENCY.observe(elapsed)
+
+
+def record_settlement_throttle(chunk_size: int, latency: float, throttled: float) -> None:
+    SETTLEMENT_CHUNK_SIZE.set(chunk_size)
+    SETTLEMENT_LATENCY.set(latency)
+    SETTLEMENT_THROTTLED.inc(throttled)
+
+
+def record_settlement_error(reason: str) -> None:
+    SETTLEMENT_ERRORS.labels(reason=reason).inc()
@@ -0,0 +1,222 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils import timezone
+
+from . import metrics, tracing
+from .queries import QueryCollector
+
+logger = logging.getLogger(__name__)
+
+
+def _view_name(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match else "unresolved"
+
+
+class QuerySampler:
+    """
+    Ring buffer with the last sampled requests of the process: requests slower than
+    PAYMENTS_QUERY_SAMPLER_LATENCY_MS or running more than PAYMENTS_QUERY_SAMPLER_MAX_QUERIES
+    queries, with their slowest and duplicated query shapes.
+    """
+    _lock = threading.Lock()
+    _samples: deque = deque(maxlen=100)
+
+    @classmethod
+    def add(cls, sample: dict) -> None:
+        with cls._lock:
+            if cls._samples.maxlen != settings.PAYMENTS_QUERY_SAMPLER_SIZE:
+                cls._samples = deque(cls._samples, maxlen=settings.PAYMENTS_QUERY_SAMPLER_SIZE)
+            cls._samples.append(sample)
+
+    @classmethod
+    def samples(cls) -> list[dict]:
+        with cls._lock:
+            return list(cls._samples)
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._samples.clear()
+
+
+class PaymentsMiddleware:
+    """
+    Base of the payments middlewares, sync and async capable: on an ASGI chain of async
+    views it awaits the next handler on the event loop instead of holding a thread.
+    Subclasses implement before() (its result is the request state, None to skip),
+    after() and optionally failed() when the handler raises.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        state = self.before(request)
+        if state is None:
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        except BaseException as err:
+            self.failed(request, state, err)
+            raise
+        return self.after(request, response, state)
+
+    async def __acall__(self, request):
+        state = self.before(request)
+        if state is None:
+            return await self.get_response(request)
+        try:
+            response = await self.get_response(request)
+        except BaseException as err:
+            self.failed(request, state, err)
+            raise
+        return self.after(request, response, state)
+
+    def before(self, request):
+        raise NotImplementedError
+
+    def after(self, request, response, state):
+        raise NotImplementedError
+
+    def failed(self, request, state, err: BaseException) -> None:
+        pass
+
+
+class QuerySamplerMiddleware(PaymentsMiddleware):
+    """
+    Times every query of a request through a connection execute wrapper and samples
+    the request on QuerySampler when it goes over the latency or query count threshold.
+    Requests under the thresholds only pay for a list append per query: shapes are
+    normalized and grouped only for sampled requests.
+    """
+
+    def before(self, request):
+        if not settings.PAYMENTS_QUERY_SAMPLER_ENABLED:
+            return None
+
+        # MetricsMiddleware already collects the request queries
+        collector = getattr(request, "query_collector", None)
+        owned = collector is None
+        if owned:
+            collector = QueryCollector().__enter__()
+        return time.perf_counter(), collector, owned
+
+    def after(self, request, response, state):
+        started, collector, owned = state
+        if owned:
+            collector.__exit__(None, None, None)
+        elapsed = time.perf_counter() - started
+
+        if (
+            elapsed * 1000 >= settings.PAYMENTS_QUERY_SAMPLER_LATENCY_MS
+            or collector.count > settings.PAYMENTS_QUERY_SAMPLER_MAX_QUERIES
+        ):
+            self.sample(request, response, collector, elapsed)
+
+        return response
+
+    def failed(self, request, state, err: BaseException) -> None:
+        _, collector, owned = state
+        if owned:
+            collector.__exit__(type(err), err, err.__traceback__)
+
+    def sample(self, request, response, collector: QueryCollector, elapsed: float) -> None:
+        sample = {
+            "at": timezone.now(),
+            "view": _view_name(request),
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration": elapsed,
+            "queries": collector.count,
+            "query_duration": collector.duration,
+            "slowest": collector.slowest(),
+            "duplicates": collector.duplicates(),
+        }
+        QuerySampler.add(sample)
+
+        logger.warning(
+            "[payments.middleware] sampled request: view - %s | %s %s | status - %s | "
+            "duration - %.1fms | queries - %s (%.1fms) | duplicated shapes - %s",
+            sample["view"],
+            request.method,
+            request.path,
+            response.status_code,
+            elapsed * 1000,
+            collector.count,
+            collector.duration * 1000,
+            len(sample["duplicates"]),
+        )
+
+
+class MetricsMiddleware(PaymentsMiddleware):
+    """
+    Records request count, latency, SQL queries count and SQL time per view (URL name)
+    on the payments metrics registry. Queries are collected on request.query_collector,
+    which QuerySamplerMiddleware reuses.
+    """
+
+    def before(self, request):
+        if not settings.PAYMENTS_METRICS_ENABLED:
+            return None
+
+        request.query_collector = QueryCollector().__enter__()
+        return time.perf_counter(), request.query_collector
+
+    def after(self, request, response, state):
+        started, collector = state
+        collector.__exit__(None, None, None)
+        elapsed = time.perf_counter() - started
+
+        view = _view_name(request)
+        metrics.REQUESTS.labels(view=view, method=request.method, status=response.status_code).inc()
+        metrics.REQUEST_LATENCY.labels(view=view, method=request.method).observe(elapsed)
+        metrics.REQUEST_QUERIES.labels(view=view).observe(collector.count)
+        metrics.REQUEST_QUERIES_LATENCY.labels(view=view).observe(collector.duration)
+
+        return response
+
+    def failed(self, request, state, err: BaseException) -> None:
+        state[1].__exit__(type(err), err, err.__traceback__)
+
+
+class TracingMiddleware(PaymentsMiddleware):
+    """
+    Request root span, continuing the trace of an incoming traceparent header.
+    Sampled responses carry their traceparent, so clients can find the trace.
+    """
+
+    def before(self, request):
+        return tracing.start_span(
+            f"http {request.method}",
+            request.headers.get(tracing.TRACEPARENT),
+            method=request.method,
+            path=request.path,
+        )
+
+    def after(self, request, response, state):
+        span, token = state
+        if token and span.sampled:
+            span.name = f"http {request.method} {_view_name(request)}"
+            span.attributes["status"] = response.status_code
+            response[tracing.TRACEPARENT] = span.traceparent
+        tracing.end_span(span, token)
+        return response
+
+    def failed(self, request, state, err: BaseException) -> None:
+        span, token = state
+        tracing.end_span(span, token, err)
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:12
+# ruff: noqa
+
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0006_remove_transaction_card_expiration_date_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="balance",
+            name="version",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="balancehistory",
+            name="version",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="BalanceEntry",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("bucket", models.CharField(choices=[("available", "Available"), ("waiting_funds", "Waiting Funds")])),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=13)),
+                ("version", models.PositiveBigIntegerField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("balance", models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name="entries", related_query_name="entry", to="payments.balance")),
+                ("payable", models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name="entries", related_query_name="entry", to="payments.payable")),
+                ("transaction", models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name="entries", related_query_name="entry", to="payments.transaction")),
+            ],
+            options={
+                "verbose_name_plural": "BalanceEntries",
+                "ordering": ["balance", "version"],
+            },
+        ),
+    ]
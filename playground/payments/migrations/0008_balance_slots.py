@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:13
+# ruff: noqa
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0007_balance_entries_and_snapshot_versions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="balance",
+            name="slot",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="customer",
+            name="balance_slots",
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddConstraint(
+            model_name="balance",
+            constraint=models.UniqueConstraint(fields=("customer", "slot"), name="unique_customer_balance_slot"),
+        ),
+    ]
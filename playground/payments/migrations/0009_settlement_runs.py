@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:17
+# ruff: noqa
+
+import datetime
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0008_balance_slots"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SettlementRun",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("window_start", models.DateTimeField(null=True)),
+                ("window_end", models.DateTimeField()),
+                ("shard", models.PositiveSmallIntegerField(default=0)),
+                ("shards", models.PositiveSmallIntegerField(default=1)),
+                ("status", models.CharField(choices=[("running", "Running"), ("finished", "Finished")], default="running")),
+                ("last_payment_date", models.DateTimeField(null=True)),
+                ("last_payable_id", models.UUIDField(null=True)),
+                ("total_count", models.PositiveIntegerField(default=0)),
+                ("settled_count", models.PositiveIntegerField(default=0)),
+                ("failed_count", models.PositiveIntegerField(default=0)),
+                ("duration", models.DurationField(default=datetime.timedelta)),
+                ("finished_at", models.DateTimeField(null=True)),
+            ],
+            options={
+                "ordering": ["id"],
+            },
+        ),
+        migrations.CreateModel(
+            name="SettlementRunError",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("message", models.TextField()),
+                ("payable", models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to="payments.payable")),
+                ("run", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="errors", related_query_name="error", to="payments.settlementrun")),
+            ],
+            options={
+                "ordering": ["id"],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:19
+# ruff: noqa
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("payments", "0009_settlement_runs"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="payable",
+            index=models.Index(condition=models.Q(("status", "waiting_funds")), fields=["payment_date", "id"], name="payable_waiting_due_idx"),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:20
+# ruff: noqa
+
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0010_payable_waiting_due_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SettlementLease",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("name", models.CharField(max_length=100, unique=True)),
+                ("owner", models.CharField(max_length=64)),
+                ("expires_at", models.DateTimeField()),
+            ],
+            options={
+                "ordering": ["id"],
+            },
+        ),
+    ]
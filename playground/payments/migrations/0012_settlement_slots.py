@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0011_settlement_lease"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customer",
+            name="settlement_slot",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="settlementrun",
+            name="slot",
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+    ]
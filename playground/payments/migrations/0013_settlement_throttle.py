@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:24
+
+import datetime
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0012_settlement_slots"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="settlementrun",
+            name="chunk_size",
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="settlementrun",
+            name="latency",
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name="settlementrun",
+            name="throttled",
+            field=models.DurationField(default=datetime.timedelta),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:28
+# ruff: noqa
+
+from django.db import migrations, models
+
+import payments.utils
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0013_settlement_throttle"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="balance",
+            name="id",
+            field=models.UUIDField(default=payments.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name="balanceentry",
+            name="id",
+            field=models.UUIDField(default=payments.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name="balancehistory",
+            name="id",
+            field=models.UUIDField(default=payments.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name="customer",
+            name="id",
+            field=models.UUIDField(default=payments.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name="payable",
+            name="id",
+            field=models.UUIDField(default=payments.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name="settlementlease",
+            name="id",
+            field=models.UUIDField(default=payments.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name="settlementrun",
+            name="id",
+            field=models.UUIDField(default=payments.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name="settlementrunerror",
+            name="id",
+            field=models.UUIDField(default=payments.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="id",
+            field=models.UUIDField(default=payments.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:29
+# ruff: noqa
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("payments", "0014_uuid7_primary_keys"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="balanceentry",
+            index=models.Index(fields=["balance", "version"], name="balance_entry_version_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="balancehistory",
+            index=models.Index(fields=["balance", "version"], name="balance_history_version_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="customer",
+            index=models.Index(fields=["created_at", "id"], name="customer_created_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="customer",
+            index=models.Index(fields=["type", "created_at", "id"], name="customer_type_created_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="customer",
+            index=models.Index(fields=["active", "created_at", "id"], name="customer_active_created_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="transaction",
+            index=models.Index(fields=["created_at", "id"], name="transaction_created_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="transaction",
+            index=models.Index(fields=["value", "id"], name="transaction_value_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="transaction",
+            index=models.Index(fields=["status", "created_at", "id"], name="transaction_status_created_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="transaction",
+            index=models.Index(fields=["method", "created_at", "id"], name="transaction_method_created_idx"),
+        ),
+    ]
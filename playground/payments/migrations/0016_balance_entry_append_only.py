@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:10
+# ruff: noqa
+
+from django.db import migrations
+
+# Entries can't be deleted or changed, references included, even through QuerySet.update()
+# and delete() or raw SQL. rekey_uuid7 disables the trigger within its own transactions.
+APPEND_ONLY = """
+CREATE FUNCTION payments_balanceentry_append_only() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        RAISE EXCEPTION 'Balance entry % can''t be deleted.', OLD.id;
+    END IF;
+    IF NEW IS DISTINCT FROM OLD THEN
+        RAISE EXCEPTION 'Balance entry % can''t be changed.', OLD.id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER payments_balanceentry_append_only
+BEFORE UPDATE OR DELETE ON payments_balanceentry
+FOR EACH ROW EXECUTE FUNCTION payments_balanceentry_append_only();
+"""
+
+DROP_APPEND_ONLY = """
+DROP TRIGGER payments_balanceentry_append_only ON payments_balanceentry;
+DROP FUNCTION payments_balanceentry_append_only();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0015_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.RunSQL(APPEND_ONLY, DROP_APPEND_ONLY),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:30
+# ruff: noqa
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0016_balance_entry_append_only"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="settlementrun",
+            name="status",
+            field=models.CharField(choices=[("running", "Running"), ("failed", "Failed"), ("finished", "Finished")], default="running"),
+        ),
+    ]
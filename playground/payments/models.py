@@ -1,12 +1,27 @@
-import uuid
+from datetime import timedelta
 
 from django.db import models
 
-from .enums import Currency, CustomerType, PayableStatus, TransactionMethod, TransactionStatus
+from .enums import (
+    BalanceBucket,
+    Currency,
+    CustomerType,
+    PayableStatus,
+    SettlementRunStatus,
+    TransactionMethod,
+    TransactionStatus,
+)
+from .exceptions import BalanceEntryImmutableError
+from .utils import uuid7
 
 
 class BaseModel(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    """
+    Ids are time-ordered UUIDv7, so ordering by id follows insertion order and
+    new rows are appended to the right of the primary key index.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     created_at = models.DateTimeField(auto_now_add=True, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -42,16 +57,41 @@ class Transaction(BaseModel):
 
     class Meta:
         ordering = ["id"]
+        # Access paths of the transactions list: filters, orderings and the cursor tie-breaker
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="transaction_created_idx"),
+            models.Index(fields=["value", "id"], name="transaction_value_idx"),
+            models.Index(
+                fields=["status", "created_at", "id"], name="transaction_status_created_idx"
+            ),
+            models.Index(
+                fields=["method", "created_at", "id"], name="transaction_method_created_idx"
+            ),
+        ]
 
 
 class Customer(BaseModel):
+    """
+    balance_slots > 1 means a striped balance: writes are spread over slot rows.
+    settlement_slot pins the customer to a settlement slot, otherwise it is picked by hash.
+    """
+
     name = models.CharField(max_length=255)
     type = models.CharField(choices=CustomerType)
     document_number = models.CharField(max_length=20, unique=True)
     active = models.BooleanField(default=True)
+    balance_slots = models.PositiveSmallIntegerField(default=1)
+    settlement_slot = models.PositiveSmallIntegerField(null=True, blank=True)
 
     class Meta:
         ordering = ["id"]
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="customer_created_idx"),
+            models.Index(fields=["type", "created_at", "id"], name="customer_type_created_idx"),
+            models.Index(
+                fields=["active", "created_at", "id"], name="customer_active_created_idx"
+            ),
+        ]
 
 
 class Payable(BaseModel):
@@ -68,26 +108,169 @@ class Payable(BaseModel):
 
     class Meta:
         ordering = ["id"]
+        indexes = [
+            models.Index(
+                fields=["payment_date", "id"],
+                condition=models.Q(status=PayableStatus.WAITING_FUNDS),
+                name="payable_waiting_due_idx",
+            ),
+        ]
 
 class Balance(BalanceValues):
+    """available and waiting_funds are the running totals of the balance entries.
+    version is the number of postings applied on the balance.
+    Striped customers have one row per slot and their balance is the sum of all slots.
+    """
+
     customer = models.ForeignKey(
         Customer,
         related_name="balances",
         related_query_name="balance",
         on_delete=models.PROTECT
     )
+    slot = models.PositiveSmallIntegerField(default=0)
+    version = models.PositiveBigIntegerField(default=0)
 
     class Meta:
         ordering = ["id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["customer", "slot"], name="unique_customer_balance_slot"
+            )
+        ]
 
 
 class BalanceHistory(BalanceValues):
+    """Checkpoint snapshot of a balance at a given version."""
+
     balance = models.ForeignKey(
         Balance,
         related_name="balance_historic",
         related_query_name="balance_history",
         on_delete=models.PROTECT
     )
+    version = models.PositiveBigIntegerField(default=0)
 
     class Meta:
         verbose_name = "BalancesHistoric"
+        indexes = [
+            models.Index(fields=["balance", "version"], name="balance_history_version_idx"),
+        ]
+
+
+class BalanceEntry(models.Model):
+    """Append-only ledger entry with the signed amount applied on a balance bucket.
+    Kept narrow on purpose: no updated_at since entries are never changed.
+    save() and delete() refuse changes and a database trigger also rejects deletes and
+    content updates made by QuerySet.update(), QuerySet.delete() or raw SQL.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    balance = models.ForeignKey(
+        Balance,
+        related_name="entries",
+        related_query_name="entry",
+        on_delete=models.PROTECT
+    )
+    bucket = models.CharField(choices=BalanceBucket)
+    amount = models.DecimalField(max_digits=13, decimal_places=2)
+    version = models.PositiveBigIntegerField()
+    payable = models.ForeignKey(
+        Payable,
+        related_name="entries",
+        related_query_name="entry",
+        on_delete=models.PROTECT,
+        null=True,
+    )
+    transaction = models.ForeignKey(
+        Transaction,
+        related_name="entries",
+        related_query_name="entry",
+        on_delete=models.PROTECT,
+        null=True,
+    )
+    created_at = models.DateTimeField(auto_now_add=True, editable=False)
+
+    class Meta:
+        ordering = ["balance", "version"]
+        verbose_name_plural = "BalanceEntries"
+        indexes = [
+            models.Index(fields=["balance", "version"], name="balance_entry_version_idx"),
+        ]
+
+    def __str__(self):
+        return str(self.id)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise BalanceEntryImmutableError(f"Balance entry {self.id} can't be changed.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise BalanceEntryImmutableError(f"Balance entry {self.id} can't be deleted.")
+
+
+class SettlementRun(BaseModel):
+    """Settlement of a shard (of a slot, if scheduled) for a window, checkpointed after each chunk.
+    last_payment_date and last_payable_id are the keyset position to resume from.
+    duration only counts the time spent settling chunks, summed over resumes.
+    chunk_size and latency (seconds per chunk, moving average) are the adaptive throttle
+    state, throttled is the time spent pacing chunks under the rows/sec ceiling.
+    """
+
+    window_start = models.DateTimeField(null=True)
+    window_end = models.DateTimeField()
+    shard = models.PositiveSmallIntegerField(default=0)
+    shards = models.PositiveSmallIntegerField(default=1)
+    slot = models.PositiveSmallIntegerField(null=True)
+    status = models.CharField(choices=SettlementRunStatus, default=SettlementRunStatus.RUNNING)
+    last_payment_date = models.DateTimeField(null=True)
+    last_payable_id = models.UUIDField(null=True)
+    total_count = models.PositiveIntegerField(default=0)
+    settled_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    duration = models.DurationField(default=timedelta)
+    chunk_size = models.PositiveIntegerField(null=True)
+    latency = models.FloatField(null=True)
+    throttled = models.DurationField(default=timedelta)
+    finished_at = models.DateTimeField(null=True)
+
+    class Meta:
+        ordering = ["id"]
+
+    @property
+    def last_key(self) -> tuple | None:
+        if self.last_payable_id is None:
+            return None
+        return (self.last_payment_date, self.last_payable_id)
+
+    @property
+    def throughput(self) -> float:
+        """Settled payables per second."""
+        seconds = self.duration.total_seconds()
+        return self.settled_count / seconds if seconds else 0.0
+
+
+class SettlementRunError(BaseModel):
+    run = models.ForeignKey(
+        SettlementRun,
+        related_name="errors",
+        related_query_name="error",
+        on_delete=models.CASCADE
+    )
+    payable = models.ForeignKey(Payable, on_delete=models.SET_NULL, null=True)
+    message = models.TextField()
+
+    class Meta:
+        ordering = ["id"]
+
+
+class SettlementLease(BaseModel):
+    """Table backend of the settlement lease lock: one row per lock name."""
+
+    name = models.CharField(max_length=100, unique=True)
+    owner = models.CharField(max_length=64)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["id"]
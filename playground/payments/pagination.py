@@ -0,0 +1,207 @@
+import json
+import logging
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from functools import cached_property
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+logger = logging.getLogger(__name__)
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Cursor pagination using keyset (seek) queries: the cursor keeps the values of the
+    ordering fields of the last row and the next page is filtered with
+    (created_at, id) < (last created_at, last id), so any page costs the same as the first.
+    The ordering comes from the view OrderingFilter (created_at by default) and id is
+    always added as a tie-breaker, so the position is unique.
+    """
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    default_ordering = "-created_at"
+    tie_breaker = "id"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self._page(list(self.page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset for async views, reading the page with the async ORM."""
+        return self._page([row async for row in self.page_queryset(queryset, request, view)])
+
+    def _page(self, rows: list) -> list:
+        self.validator_rows = [(row.id, row.updated_at) for row in rows]
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        self.has_next = has_more if not self.reverse else bool(self.position)
+        self.has_previous = bool(self.position) if not self.reverse else has_more
+        self.first = self._position(rows[0]) if rows else None
+        self.last = self._position(rows[-1]) if rows else None
+        return rows
+
+    def page_queryset(self, queryset, request, view=None):
+        """Rows of the page, plus the next one telling if there are more pages."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.position, self.reverse = self.decode_cursor(request)
+
+        ordering = [self._invert(field) for field in self.ordering] if self.reverse else (
+            self.ordering
+        )
+        queryset = queryset.order_by(*ordering)
+        if self.position:
+            queryset = queryset.filter(self._seek(ordering, self.position))
+        return queryset[:self.page_size + 1]
+
+    def page_validators(self, queryset, request, view=None) -> list[tuple]:
+        """id and updated_at of the page rows, the same rows validator_rows has once paginated."""
+        return list(self.page_queryset(queryset, request, view).values_list("id", "updated_at"))
+
+    async def apage_validators(self, queryset, request, view=None) -> list[tuple]:
+        """page_validators for async views."""
+        rows = self.page_queryset(queryset, request, view).values_list("id", "updated_at")
+        return [row async for row in rows]
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_ordering(self, request, queryset, view) -> list[str]:
+        ordering = [self.default_ordering]
+        for backend in getattr(view, "filter_backends", []):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view) or ordering
+                break
+
+        ordering = [field for field in ordering if field.lstrip("-") != self.tie_breaker]
+        direction = "-" if ordering[-1].startswith("-") else ""
+        return [*ordering, f"{direction}{self.tie_breaker}"]
+
+    def get_next_link(self) -> str | None:
+        if not self.has_next or self.last is None:
+            return None
+        return self.encode_cursor(self.last, reverse=False)
+
+    def get_previous_link(self) -> str | None:
+        if not self.has_previous or self.first is None:
+            return None
+        return self.encode_cursor(self.first, reverse=True)
+
+    def encode_cursor(self, position: list, reverse: bool) -> str:
+        cursor = json.dumps({"p": position, "r": reverse}, default=str)
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, urlsafe_b64encode(cursor.encode()).decode()
+        )
+
+    def decode_cursor(self, request) -> tuple[list | None, bool]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode()))
+            position, reverse = cursor["p"], bool(cursor["r"])
+        except (BinasciiError, UnicodeDecodeError, ValueError, KeyError, TypeError) as err:
+            logger.info("[payments.pagination] invalid cursor: %s", encoded)
+            raise NotFound("Invalid cursor.") from err
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound("Invalid cursor.")
+        return position, reverse
+
+    def _position(self, row) -> list:
+        return [getattr(row, field.lstrip("-")) for field in self.ordering]
+
+    def _seek(self, ordering: list[str], position: list) -> Q:
+        """Rows after a position: (a > x) OR (a = x AND b > y) OR ..., per field direction."""
+        seek = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition = Q(**{f"{name}__{lookup}": position[index]})
+            for previous, value in zip(ordering[:index], position, strict=False):
+                condition &= Q(**{previous.lstrip("-"): value})
+            seek |= condition
+        return seek
+
+    def _invert(self, field: str) -> str:
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that counts with the query planner estimate (EXPLAIN) on PostgreSQL when
+    it is over PAYMENTS_PAGINATION_COUNT_THRESHOLD rows, instead of a COUNT(*) that
+    reads the whole table. Smaller results are counted exactly.
+    """
+
+    @cached_property
+    def count(self) -> int:
+        queryset = self.object_list
+        if connections[queryset.db].vendor != "postgresql":
+            return super().count
+
+        plan = json.loads(queryset.order_by().explain(format="json"))
+        estimate = int(plan[0]["Plan"]["Plan Rows"])
+        if estimate < settings.PAYMENTS_PAGINATION_COUNT_THRESHOLD:
+            return super().count
+        return estimate
+
+
+class EstimatedCountPageNumberPagination(PageNumberPagination):
+    """Optional offset pagination (?page=N), with estimated counts on large tables."""
+    django_paginator_class = EstimatedCountPaginator
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+
+class KeysetPaginationMixin:
+    """
+    Lists paginated with KeysetCursorPagination by default.
+    Requests with the page query param use the offset pagination instead.
+    """
+    pagination_class = KeysetCursorPagination
+    offset_pagination_class = EstimatedCountPageNumberPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            use_offset = self.offset_pagination_class.page_query_param in self.request.query_params
+            self._paginator = (
+                self.offset_pagination_class if use_offset else self.pagination_class
+            )()
+        return self._paginator
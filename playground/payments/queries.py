@@ -0,0 +1,174 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .exceptions import QueryBudgetExceededError
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_CONTROL = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+_LITERALS = [
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"'(?:[^']|'')*'(::\w+)?"), "?"),
+    (re.compile(r"\b\d+(\.\d+)?\b"), "?"),
+    (re.compile(r"\((\s*\?\s*,)+\s*\?\s*\)"), "(...)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def normalize_sql(sql: str) -> str:
+    """Query shape: literals replaced by ? and IN lists collapsed, so repeated queries match."""
+    for pattern, replacement in _LITERALS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+# Collectors active on the current context (thread, or request task under ASGI)
+_collectors: ContextVar[tuple["QueryCollector", ...]] = ContextVar(
+    "payments_query_collectors", default=()
+)
+
+
+def collect_query(execute, sql, params, many, context):
+    """Connection execute wrapper: times the query for every collector active on the context."""
+    collectors = _collectors.get()
+    # Savepoints only exist when nested in an outer transaction (e.g. tests), not counted
+    if not collectors or sql.startswith(TRANSACTION_CONTROL):
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        for collector in collectors:
+            collector.queries.append(sql)
+            collector.durations.append(elapsed)
+
+
+class QueryCollector:
+    """
+    Collects the SQL executed while active, with its duration.
+    Collecting is only a list append, shapes are normalized when reported.
+    Active collectors live on a context variable, so async views collect the queries
+    the async ORM runs on its worker threads too.
+    """
+
+    def __init__(self):
+        self.queries: list[str] = []
+        self.durations: list[float] = []
+
+    def __enter__(self) -> "QueryCollector":
+        self._token = _collectors.set((*_collectors.get(), self))
+        return self
+
+    def __exit__(self, *exc_info):
+        _collectors.reset(self._token)
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def duration(self) -> float:
+        return sum(self.durations)
+
+    def slowest(self, limit: int = 5) -> list[tuple[str, float]]:
+        """Slowest queries shapes with their duration in seconds."""
+        queries = sorted(zip(self.queries, self.durations, strict=True), key=lambda q: -q[1])
+        return [(normalize_sql(sql), duration) for sql, duration in queries[:limit]]
+
+    def duplicates(self) -> dict[str, int]:
+        """Query shapes executed more than once, the usual sign of an N+1."""
+        shapes = Counter(normalize_sql(sql) for sql in self.queries)
+        return {shape: count for shape, count in shapes.most_common() if count > 1}
+
+    def report(self, name: str, budget: int) -> str:
+        lines = [f"{name} executed {self.count} queries, budget is {budget}."]
+        lines.extend(
+            f"  {count}x {shape}" for shape, count in self.duplicates().items()
+        )
+        return "\n".join(lines)
+
+
+def query_budget(budget: int, name: str | None = None):
+    """
+    Declares the max number of SQL queries of a view handler or service call.
+    With PAYMENTS_QUERY_BUDGET_MODE "raise" (tests) going over the budget raises
+    QueryBudgetExceededError, with "log" it is logged with the duplicated query shapes
+    and with "off" queries are not collected at all.
+    Use method_decorator(query_budget(n), name="get") for inherited view handlers.
+    """
+    def decorator(function):
+        label = name or function.__qualname__
+
+        def check(collector: QueryCollector) -> None:
+            if collector.count > budget:
+                report = collector.report(label, budget)
+                if settings.PAYMENTS_QUERY_BUDGET_MODE == "raise":
+                    raise QueryBudgetExceededError(report)
+                logger.warning("[payments.queries] query budget exceeded: %s", report)
+
+        if iscoroutinefunction(function):
+            @wraps(function)
+            async def wrapper(*args, **kwargs):
+                if settings.PAYMENTS_QUERY_BUDGET_MODE == "off":
+                    return await function(*args, **kwargs)
+
+                with QueryCollector() as collector:
+                    result = await function(*args, **kwargs)
+                check(collector)
+                return result
+        else:
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                if settings.PAYMENTS_QUERY_BUDGET_MODE == "off":
+                    return function(*args, **kwargs)
+
+                with QueryCollector() as collector:
+                    result = function(*args, **kwargs)
+                check(collector)
+                return result
+
+        wrapper.query_budget = budget
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def assert_query_budget(budget: int, allow_duplicates: bool = True):
+    """Test helper: fails when the block runs more than `budget` queries or repeats shapes."""
+    with QueryCollector() as collector:
+        yield collector
+
+    report = collector.report("block", budget)
+    assert collector.count <= budget, report  # noqa: S101
+    assert allow_duplicates or not collector.duplicates(), report  # noqa: S101
+
+
+def install_execute_wrapper(wrapper, dispatch_uid: str) -> None:
+    """Runs `wrapper` around the queries of every database connection, open or opened later."""
+
+    def install_on(connection=None, **kwargs) -> None:
+        # Inserted first: execute_wrapper() blocks active on connection time pop the last wrapper
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, wrapper)
+
+    connection_created.connect(install_on, weak=False, dispatch_uid=dispatch_uid)
+    for connection in connections.all(initialized_only=True):
+        install_on(connection)
+
+
+def install() -> None:
+    """Collects the queries of every database connection for the active QueryCollectors."""
+    install_execute_wrapper(collect_query, "payments.queries")
@@ -0,0 +1,81 @@
+from datetime import datetime, time, timedelta
+
+from celery.schedules import crontab
+from django.db.models import F, QuerySet, Value
+from django.db.models.functions import Coalesce, Concat, Mod
+
+from .expressions import StableHash
+
+SETTLEMENT_TASK = "payments.tasks.pay_daily_payables"
+
+
+class SettlementSchedule:
+    """
+    Spreads settlement over a daily window (e.g. 02:00-07:00) split in equal slots.
+    Each customer settles on its configured Customer.settlement_slot, or on a slot picked
+    by a hash of its id, so balance and payable writes are spread over the whole window
+    instead of landing at once. The hash is salted, so slots do not follow the shards split.
+    """
+
+    def __init__(self, window_start: str, window_end: str, slots: int):
+        if slots < 1:
+            raise ValueError("A settlement schedule must have at least 1 slot.")
+
+        self.window_start = time.fromisoformat(window_start)
+        self.window_end = time.fromisoformat(window_end)
+        self.slots = slots
+
+    @classmethod
+    def from_settings(cls) -> "SettlementSchedule":
+        from django.conf import settings  # noqa: PLC0415
+
+        return cls(
+            settings.PAYMENTS_SETTLEMENT_WINDOW_START,
+            settings.PAYMENTS_SETTLEMENT_WINDOW_END,
+            settings.PAYMENTS_SETTLEMENT_SLOTS,
+        )
+
+    @property
+    def window(self) -> timedelta:
+        start = datetime.combine(datetime.min, self.window_start)
+        end = datetime.combine(datetime.min, self.window_end)
+        # A window ending before its start goes through midnight
+        return (end - start) % timedelta(days=1) or timedelta(days=1)
+
+    @property
+    def slot_length(self) -> timedelta:
+        return self.window / self.slots
+
+    def slot_start(self, slot: int) -> time:
+        start = datetime.combine(datetime.min, self.window_start)
+        return (start + self.slot_length * slot).time()
+
+    def beat_schedule(self) -> dict:
+        """One Celery beat entry per slot, firing pay_daily_payables(slot) on its start."""
+        return {
+            f"pay_daily_payables_slot_{slot}": {
+                "task": SETTLEMENT_TASK,
+                "schedule": crontab(
+                    hour=self.slot_start(slot).hour, minute=self.slot_start(slot).minute
+                ),
+                "args": (slot,),
+            }
+            for slot in range(self.slots)
+        }
+
+    def slot_expression(self, customer_field: str = ""):
+        """Settlement slot of a customer, `customer_field` is the lookup path to it."""
+        prefix = f"{customer_field}__" if customer_field else ""
+        return Mod(
+            Coalesce(
+                F(f"{prefix}settlement_slot"),
+                StableHash(Concat(F(f"{prefix}id"), Value(":settlement"))),
+            ),
+            self.slots,
+        )
+
+    def filter_slot(self, payables: QuerySet, slot: int) -> QuerySet:
+        """Keeps the payables of customers settled on a slot."""
+        return payables.alias(
+            settlement_slot=self.slot_expression("customer")
+        ).filter(settlement_slot=slot)
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 
 from .enums import CustomerType, TransactionMethod, TransactionStatus
-from .models import Balance, Customer, Transaction
+from .models import Balance, Customer, Payable, Transaction
 from .utils import is_valid_cnpj, is_valid_cpf
 
 
@@ -56,6 +56,23 @@ class TransactionSerializer(serializers.ModelSerializer):
         ]
 
 
+class PayableSerializer(serializers.ModelSerializer):
+    transaction_id = serializers.UUIDField(read_only=True)
+    customer_id = serializers.UUIDField(read_only=True)
+
+    class Meta:
+        model = Payable
+        fields = [
+            "id",
+            "transaction_id",
+            "customer_id",
+            "amount",
+            "status",
+            "payment_date",
+            "created_at",
+        ]
+
+
 class TransactionProcessRequestSerializer(serializers.Serializer):
     """
     Receives and validate transaction process request.
@@ -70,6 +87,16 @@ class TransactionProcessRequestSerializer(serializers.Serializer):
     card_verification_code = serializers.CharField(max_length=3)
 
 
+class TransactionBatchProcessRequestSerializer(serializers.Serializer):
+    """
+    Receives a batch of transaction process requests.
+    Each item is validated as a TransactionProcessRequestSerializer on its own.
+    """
+    transactions = serializers.ListField(
+        child=serializers.DictField(), allow_empty=False, max_length=1000
+    )
+
+
 class TransactionProcessResponseSerializer(serializers.Serializer):
     """
     Returns transaction process response with current status.
@@ -1,34 +1,66 @@
 import logging
-from decimal import Decimal
+import time
+from collections import Counter, defaultdict
+from collections.abc import Iterator
+from datetime import datetime, timedelta
 from uuid import UUID
 
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import QuerySet
+from django.db.models import F, Q, QuerySet
+from django.db.models.functions import Mod
 from django.db.transaction import atomic
 from django.utils import timezone
 
-from .enums import Currency, PayableStatus, TransactionStatus
+from . import metrics
+from .enums import (
+    UNFINISHED_RUN_STATUSES,
+    Currency,
+    PayableStatus,
+    SettlementRunStatus,
+    TransactionStatus,
+)
 from .exceptions import (
     TransactionCreationError,
     TransactionFailedError,
     TransactionRelatedEntityNotFoundError,
 )
+from .expressions import StableHash
 from .factory import Transaction as TransactionABC
 from .factory import TransactionFactory
-from .models import Balance, BalanceHistory, Customer, Payable, Transaction
+from .models import (
+    Balance,
+    Customer,
+    Payable,
+    SettlementRun,
+    SettlementRunError,
+    Transaction,
+)
+from .posting import BalancePosting, BalancePostingService, to_amount
+from .queries import query_budget
+from .striping import balance_for_transaction, load_slot_balances
+from .throttling import AdaptiveThrottle, pick_concurrency
+from .tracing import span, traced
+
+logger = logging.getLogger(__name__)
 
 
 class TransactionService:
+    @query_budget(9)
+    @traced("transaction.process")
     def process(self, data: dict) -> dict[str, str]:
         """
         Process a transaction and applies specific rules.
         Returns transaction_id and status.
         If the transaction fails, client receives a failed status response.
         """
+        metrics_status = TransactionStatus.FAILED
         try:
-            customer: Customer = self._get_customer_with_balance(data["customer_id"])
-            transaction: Transaction = self._create_pending_transaction(data)
-            logging.info(f"[payments.service] pending transaction created for {customer.id}")
+            with span("transaction.customer_lookup"):
+                customer: Customer = self._get_customer_with_balance(data["customer_id"])
+            with span("transaction.pending_insert"):
+                transaction: Transaction = self._create_pending_transaction(data)
+            logger.info("[payments.service] pending transaction created for %s", customer.id)
 
             factory: TransactionABC = TransactionFactory.create(transaction.method)
             payable: Payable = factory.create_payable(transaction, customer)
@@ -48,9 +80,107 @@ class TransactionService:
             raise TransactionFailedError(
                 f"Transaction processing failed: {err}"
             ) from err
+        else:
+            metrics_status = transaction.status
+        finally:
+            metrics.record_transactions(data["method"], metrics_status)
 
         return {"customer_id": data["customer_id"], "status": transaction.status}
 
+    @query_budget(7)
+    def process_many(self, items: list[dict]) -> list[dict[str, str]]:
+        """
+        Process a batch of transactions using bulk writes.
+        Customers and balances are loaded once, transactions, payables and balance
+        history are bulk created and each customer balance is updated once.
+        Returns customer_id and status for each item, in the same order.
+        Items for unknown customers or failing as a whole receive a failed status.
+        """
+        results = [
+            {"customer_id": item["customer_id"], "status": TransactionStatus.FAILED}
+            for item in items
+        ]
+        customers = self._get_customers_with_balance(item["customer_id"] for item in items)
+        processable = [
+            (index, item) for index, item in enumerate(items)
+            if str(item["customer_id"]) in customers
+        ]
+        if not processable:
+            self._record_outcomes(items, results)
+            return results
+
+        transactions = []
+        payables = []
+        factories = []
+        for _, item in processable:
+            factory: TransactionABC = TransactionFactory.create(item["method"])
+            transaction = self._build_transaction(item, factory)
+            transactions.append(transaction)
+            payables.append(factory.build_payable(transaction, customers[str(item["customer_id"])]))
+            factories.append(factory)
+
+        try:
+            with atomic():
+                Transaction.objects.bulk_create(transactions)
+                Payable.objects.bulk_create(payables)
+                self._apply_payables_on_balances(payables, factories)
+        except Exception as err:
+            logger.error("[payments.service] batch processing failed: %s", err)
+            self._fail_transactions(transactions)
+            self._record_outcomes(items, results)
+            return results
+
+        for index, _ in processable:
+            results[index]["status"] = TransactionStatus.PROCESSED
+        logger.info("[payments.service] batch processed %s transactions", len(transactions))
+        self._record_outcomes(items, results)
+
+        return results
+
+    def _build_transaction(self, data: dict, factory: TransactionABC) -> Transaction:
+        return Transaction(
+            value=data["value"],
+            currency=data.get("currency", Currency.BRL),
+            description=data["description"],
+            method=data["method"],
+            status=TransactionStatus.PROCESSED,
+            expected_fee=factory.expected_fee,
+            card_number=data["card_number"],
+            card_owner=data["card_owner"],
+            card_expiration_year=data["card_expiration_year"],
+            card_verification_code=data["card_verification_code"],
+        )
+
+    def _record_outcomes(self, items: list[dict], results: list[dict[str, str]]) -> None:
+        outcomes = Counter(
+            (item["method"], result["status"])
+            for item, result in zip(items, results, strict=True)
+        )
+        for (method, status), count in outcomes.items():
+            metrics.record_transactions(method, status, count)
+
+    def _fail_transactions(self, transactions: list[Transaction]) -> None:
+        for transaction in transactions:
+            transaction.status = TransactionStatus.FAILED
+            transaction.expected_fee = 0.0
+        try:
+            Transaction.objects.bulk_create(transactions)
+        except Exception as err:
+            logger.error("[payments.service] failed transactions not recorded: %s", err)
+
+    def _apply_payables_on_balances(
+        self, payables: list[Payable], factories: list[TransactionABC]
+    ) -> None:
+        BalancePostingService().post([
+            BalancePosting(
+                balance_id=balance_for_transaction(payable.customer, payable.transaction_id).id,
+                payable_id=payable.id,
+                transaction_id=payable.transaction_id,
+                **{factory.balance_bucket: payable.amount}
+            )
+            for payable, factory in zip(payables, factories, strict=True)
+        ])
+
     def _create_pending_transaction(self, data: dict) -> Transaction:
         try:
             default_expected_fee = 0.0
@@ -79,56 +209,348 @@ class TransactionService:
                 f"Customer {customer_id} not found."
             ) from err
 
-        balance = Balance.objects.filter(customer=customer).first()
-        if not balance:
+        balances = list(Balance.objects.filter(customer=customer, slot__lt=customer.balance_slots))
+        if not balances:
             raise TransactionRelatedEntityNotFoundError(
                 f"Balance not found for customer {customer_id}."
             )
 
-        customer.balance = balance
+        load_slot_balances(balances, customer)
 
         return customer
 
+    def _get_customers_with_balance(self, customer_ids) -> dict[str, Customer]:
+        valid_ids = set()
+        for customer_id in customer_ids:
+            try:
+                valid_ids.add(UUID(str(customer_id)))
+            except ValueError:
+                logger.info("[payments.service] invalid customer_id on batch: %s", customer_id)
+
+        customers = {}
+        balances = defaultdict(list)
+        for balance in Balance.objects.select_related("customer").filter(customer_id__in=valid_ids):
+            customers.setdefault(str(balance.customer_id), balance.customer)
+            balances[str(balance.customer_id)].append(balance)
+
+        for customer_id, customer in customers.items():
+            load_slot_balances(balances[customer_id], customer)
+
+        return customers
+
 
 class PayableService:
-    def get_today_payables(self) -> QuerySet[Payable]:
-        today = timezone.now().date()
+    def get_due_payables(
+        self, until: datetime | None = None, since: datetime | None = None
+    ) -> QuerySet[Payable]:
+        """
+        Waiting funds payables due up to `until` (now by default).
+        Without `since`, every overdue payable is included (catch-up).
+        Served by the partial (payment_date, id) index of waiting funds payables.
+        """
         payables = Payable.objects.filter(
-            created_at__date=today,
-            status=PayableStatus.WAITING_FUNDS
+            status=PayableStatus.WAITING_FUNDS,
+            payment_date__lte=until or timezone.now(),
         )
+        if since:
+            payables = payables.filter(payment_date__gte=since)
 
         return self._filter_inactive_customer_payables(payables)
 
+    def get_today_payables(self) -> QuerySet[Payable]:
+        since, until = self.get_settlement_window(catch_up=False)
+        return self.get_due_payables(until, since)
+
+    def get_settlement_window(self, catch_up: bool) -> tuple[datetime | None, datetime]:
+        """Returns (since, until): today's due payables, or the whole backlog on catch-up."""
+        now = timezone.now()
+        if catch_up:
+            return None, now
+        return timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0), now
+
+    def filter_shard(
+        self, payables: QuerySet[Payable], shard: int, shards: int
+    ) -> QuerySet[Payable]:
+        """
+        Keeps the payables of customers hashed into a shard.
+        A customer always belongs to the same shard, so shards never share a balance.
+        """
+        return payables.alias(shard=Mod(StableHash("customer_id"), shards)).filter(shard=shard)
+
+    def iter_payable_chunks(
+        self,
+        payables: QuerySet[Payable],
+        chunk_size: int | None = None,
+        after: tuple | None = None,
+        throttle: AdaptiveThrottle | None = None,
+    ) -> Iterator[tuple[list[UUID], tuple]]:
+        """
+        Streams payable ids in chunks using keyset pagination over (payment_date, id).
+        Yields the chunk ids and its last key, so memory stays flat no matter how many
+        payables are due and a stopped run can continue from a key with `after`.
+        With a throttle, each chunk takes its current chunk size.
+        """
+        chunk_size = chunk_size or settings.PAYMENTS_SETTLEMENT_CHUNK_SIZE
+        payables = payables.order_by("payment_date", "id")
+        last_key = after
+        while True:
+            chunk = payables
+            if last_key:
+                payment_date, payable_id = last_key
+                chunk = chunk.filter(
+                    Q(payment_date__gt=payment_date)
+                    | Q(payment_date=payment_date, id__gt=payable_id)
+                )
+            size = throttle.chunk_size if throttle else chunk_size
+            rows = list(chunk.values_list("payment_date", "id")[:size])
+            if not rows:
+                return
+            last_key = rows[-1]
+            yield [payable_id for _, payable_id in rows], last_key
+
     def _filter_inactive_customer_payables(self, payables: Payable) -> QuerySet[Payable]:
-        inactive_customer_payables = payables.filter(customer__active=False)
-        if inactive_customer_payables:
-            inactive_customers = list(
-                inactive_customer_payables.values_list("customer_id", flat=True).distinct()
-            )
-            logging.info(
+        inactive_customers = list(
+            payables.filter(customer__active=False).values_list(
+                "customer_id", flat=True
+            ).order_by().distinct()
+        )
+        if inactive_customers:
+            logger.info(
                 "[payments.service] payables for inactive customers are not considered | "
-                f"customer_ids: {inactive_customers}"
+                "customer_ids: %s",
+                inactive_customers,
             )
 
-            return payables.exclude(customer__active=False)
-        return payables
+        return payables.filter(customer__active=True)
 
+    @query_budget(7)
     @atomic
-    def apply_waiting_funds_payable(self, payable: Payable) -> None:
-        balance = payable.customer.balances.first()
-        BalanceHistory.objects.create(
-            balance=balance,
-            available=balance.available,
-            waiting_funds=balance.waiting_funds,
-        )
-        balance.available += Decimal(payable.amount)
-        balance.waiting_funds -= Decimal(payable.amount)
-        balance.save()
+    def apply_waiting_funds_payable(self, payable: Payable) -> bool:
+        """
+        Pays a single payable. The payable row is locked and re-checked first, so a payable
+        already paid by an overlapping run is skipped. Returns whether it was paid.
+        """
+        if not Payable.objects.select_for_update().filter(
+            id=payable.id, status=PayableStatus.WAITING_FUNDS
+        ).exists():
+            logger.info("[payments.service] payable %s already paid, skipping", payable.id)
+            return False
+
+        balance_id = payable.customer.balances.filter(slot=0).values_list("id", flat=True).first()
+        BalancePostingService().post([
+            BalancePosting(
+                balance_id=balance_id,
+                available=payable.amount,
+                waiting_funds=-to_amount(payable.amount),
+                payable_id=payable.id,
+                transaction_id=payable.transaction_id,
+            )
+        ])
 
         payable.status = PayableStatus.PAID
         payable.save()
 
-        logging.info(
-            f"[payments.service] payable {payable.id} applied for {payable.customer.id}"
+        logger.info("[payments.service] payable %s applied for %s", payable.id, payable.customer.id)
+        return True
+
+    @query_budget(7)
+    @atomic
+    def settle_chunk(self, payable_ids: list[UUID]) -> int:
+        """
+        Settles a chunk of payables in a single database transaction.
+        Payables locked by another worker are skipped and left for the next chunk or run.
+        Raises Balance.DoesNotExist if a customer has no primary balance.
+        """
+        locked_ids = list(
+            Payable.objects.select_for_update(skip_locked=True).filter(
+                id__in=payable_ids, status=PayableStatus.WAITING_FUNDS
+            ).order_by("id").values_list("id", flat=True)
+        )
+        if not locked_ids:
+            return 0
+
+        payables = list(Payable.objects.filter(
+            id__in=locked_ids, customer__balance__slot=0
+        ).values("id", "transaction_id", "amount", "customer__balance__id"))
+        if len(payables) != len(locked_ids):
+            # Raised like on row mode, so the chunk is rolled back instead of paid unposted
+            unposted = set(locked_ids) - {row["id"] for row in payables}
+            raise Balance.DoesNotExist(
+                f"No balance for the customers of payables {', '.join(map(str, sorted(unposted)))}"
+            )
+
+        BalancePostingService().post([
+            BalancePosting(
+                balance_id=row["customer__balance__id"],
+                available=row["amount"],
+                waiting_funds=-row["amount"],
+                payable_id=row["id"],
+                transaction_id=row["transaction_id"],
+            )
+            for row in payables
+        ])
+        Payable.objects.filter(id__in=locked_ids).update(
+            status=PayableStatus.PAID, updated_at=timezone.now()
+        )
+
+        logger.info("[payments.service] %s payables settled on chunk", len(locked_ids))
+        return len(locked_ids)
+
+
+class SettlementRunService:
+    """
+    Tracks settlement runs: a shard run is checkpointed after each chunk and an
+    unfinished run is resumed from its last key, so a crash only costs the remaining work.
+    """
+
+    def __init__(self):
+        self.payable_service = PayableService()
+
+    def start(
+        self,
+        shard: int,
+        shards: int,
+        window: tuple[datetime | None, datetime],
+        slot: int | None = None,
+    ) -> SettlementRun:
+        """
+        Resumes the unfinished (running or failed) run of the shard (and slot)
+        or starts a new one for the window.
+        """
+        run = SettlementRun.objects.filter(
+            shard=shard, shards=shards, slot=slot, status__in=UNFINISHED_RUN_STATUSES
+        ).order_by("id").first()
+        if run:
+            logger.info(
+                "[payments.service] resuming settlement run %s | shard - %s | last key - %s",
+                run.id, shard, run.last_key,
+            )
+            if run.status == SettlementRunStatus.FAILED:
+                run.status = SettlementRunStatus.RUNNING
+                run.save(update_fields=["status", "updated_at"])
+            return run
+
+        return SettlementRun.objects.create(
+            shard=shard, shards=shards, slot=slot, window_start=window[0], window_end=window[1]
+        )
+
+    def checkpoint(
+        self, run: SettlementRun, last_key: tuple, settled: int, failed: int, elapsed: float
+    ) -> None:
+        run.last_payment_date, run.last_payable_id = last_key
+        run.settled_count += settled
+        run.failed_count += failed
+        run.duration += timedelta(seconds=elapsed)
+        SettlementRun.objects.filter(id=run.id).update(
+            last_payment_date=run.last_payment_date,
+            last_payable_id=run.last_payable_id,
+            settled_count=F("settled_count") + settled,
+            failed_count=F("failed_count") + failed,
+            duration=F("duration") + timedelta(seconds=elapsed),
+            updated_at=timezone.now(),
+        )
+
+    def settle_chunk(self, run: SettlementRun, payable_ids: list[UUID], last_key: tuple) -> None:
+        """
+        Set-based settlement of a chunk, checkpointed in the same database transaction.
+        A failed chunk is rolled back, recorded as an error and skipped.
+        """
+        started = time.perf_counter()
+        try:
+            with atomic():
+                settled = self.payable_service.settle_chunk(payable_ids)
+                self.checkpoint(run, last_key, settled, 0, time.perf_counter() - started)
+        except Exception as e:
+            logger.error(
+                "[payments.service] error settling payables: run - %s | shard - %s | error - %s",
+                run.id, run.shard, e,
+            )
+            self.record_error(run, str(e))
+            self.checkpoint(run, last_key, 0, len(payable_ids), time.perf_counter() - started)
+            metrics.record_settlement_chunk(0, len(payable_ids), time.perf_counter() - started)
+        else:
+            metrics.record_settlement_chunk(settled, 0, time.perf_counter() - started)
+
+    def apply_chunk(self, run: SettlementRun, payable_ids: list[UUID], last_key: tuple) -> None:
+        """Row by row settlement of a chunk, recording an error for each failed payable."""
+        started = time.perf_counter()
+        settled = failed = 0
+        # Chunk ids already come in (payment_date, id) order, no need to sort them again
+        chunk = Payable.objects.select_related("customer").filter(id__in=payable_ids).in_bulk()
+        for payable in (chunk[payable_id] for payable_id in payable_ids if payable_id in chunk):
+            try:
+                settled += self.payable_service.apply_waiting_funds_payable(payable)
+            except Exception as e:
+                logger.error(
+                    "[payments.service] error applying payable to balance: "
+                    "payable_id - %s | error - %s",
+                    payable.id, e,
+                )
+                self.record_error(run, str(e), payable.id)
+                failed += 1
+
+        self.checkpoint(run, last_key, settled, failed, time.perf_counter() - started)
+        metrics.record_settlement_chunk(settled, failed, time.perf_counter() - started)
+
+    def save_throttle(self, run: SettlementRun, throttle: AdaptiveThrottle) -> None:
+        """Keeps the throttle state, so a resumed run continues with the same chunk size."""
+        run.chunk_size = throttle.chunk_size
+        run.latency = throttle.latency
+        run.throttled = timedelta(seconds=throttle.throttled)
+        SettlementRun.objects.filter(id=run.id).update(
+            chunk_size=run.chunk_size,
+            latency=run.latency,
+            throttled=run.throttled,
+            updated_at=timezone.now(),
+        )
+
+    def pick_shards(self, slot: int | None = None) -> int:
+        """
+        Number of shards settled in parallel, adapted from the latency of the last run.
+        An unfinished split is kept, so its runs are resumed.
+        """
+        runs = SettlementRun.objects.filter(slot=slot).order_by("-id")
+        unfinished = runs.filter(status__in=UNFINISHED_RUN_STATUSES).first()
+        if unfinished:
+            return unfinished.shards
+
+        last = runs.filter(latency__isnull=False).first()
+        return pick_concurrency(
+            last.shards if last else settings.PAYMENTS_SETTLEMENT_SHARDS,
+            last.latency if last else None,
+            settings.PAYMENTS_SETTLEMENT_SHARDS,
+            settings.PAYMENTS_SETTLEMENT_TARGET_LATENCY,
+        )
+
+    def record_error(
+        self, run: SettlementRun, message: str, payable_id: UUID | None = None
+    ) -> None:
+        SettlementRunError.objects.create(run=run, payable_id=payable_id, message=message)
+        metrics.record_settlement_error("payable" if payable_id else "chunk")
+
+    def fail(self, shard: int, shards: int, slot: int | None, message: str) -> None:
+        """Marks the running run of a shard as failed, keeping its last key to be resumed."""
+        for run in SettlementRun.objects.filter(
+            shard=shard, shards=shards, slot=slot, status=SettlementRunStatus.RUNNING
+        ):
+            run.status = SettlementRunStatus.FAILED
+            run.save(update_fields=["status", "updated_at"])
+            SettlementRunError.objects.create(run=run, message=message)
+            logger.error(
+                "[payments.service] settlement run %s failed | shard - %s | last key - %s | "
+                "error - %s",
+                run.id, shard, run.last_key, message,
+            )
+        metrics.record_settlement_error("shard")
+
+    def finish(self, run: SettlementRun) -> SettlementRun:
+        run.status = SettlementRunStatus.FINISHED
+        run.finished_at = timezone.now()
+        run.save(update_fields=["status", "finished_at", "total_count", "updated_at"])
+
+        logger.info(
+            "[payments.service] settlement run %s finished | shard - %s | "
+            "settled - %s | failed - %s | duration - %s | throughput - %.2f/s",
+            run.id, run.shard, run.settled_count, run.failed_count, run.duration, run.throughput,
         )
+        return run
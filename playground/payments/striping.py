@@ -0,0 +1,141 @@
+import logging
+from decimal import Decimal
+from uuid import UUID
+
+from django.db.transaction import atomic
+
+from .enums import BalanceBucket
+from .models import Balance, Customer
+from .posting import BalancePosting, BalancePostingService
+
+logger = logging.getLogger(__name__)
+
+MIN_STRIPED_SLOTS = 2
+
+
+def pick_slot(transaction_id: UUID, slots: int) -> int:
+    """Stable slot for a transaction: the same id always lands on the same slot."""
+    return transaction_id.int % slots if slots > 1 else 0
+
+
+def balance_for_transaction(customer: Customer, transaction_id: UUID) -> Balance:
+    """
+    Returns the balance row that receives a transaction posting.
+    Uses the slot rows loaded on customer.slot_balances, falling back to customer.balance.
+    """
+    slot_balances = getattr(customer, "slot_balances", None) or [customer.balance]
+    return slot_balances[pick_slot(transaction_id, len(slot_balances))]
+
+
+def load_slot_balances(balances: list[Balance], customer: Customer) -> None:
+    """
+    Sets customer.balance (slot 0) and customer.slot_balances (active slots ordered by slot)
+    from balance rows loaded for the customer.
+    """
+    slot_balances = sorted(
+        (balance for balance in balances if balance.slot < customer.balance_slots),
+        key=lambda balance: balance.slot,
+    )
+    customer.balance = slot_balances[0]
+    customer.slot_balances = slot_balances
+
+
+def get_customer_balance(customer_id: UUID) -> Balance | None:
+    """
+    Returns the primary balance (slot 0) of a customer with available, waiting_funds
+    and updated_at summed up from all of its slots. Values are not meant to be saved.
+    """
+    return sum_slot_balances(list(customer_balances(customer_id)))
+
+
+def customer_balances(customer_id: UUID):
+    """Balance rows of every slot of a customer, with the customer."""
+    return (
+        Balance.objects.select_related("customer")
+        .filter(customer__id=customer_id)
+        .order_by("slot")
+    )
+
+
+def sum_slot_balances(balances: list[Balance]) -> Balance | None:
+    """Primary balance with the values of all slots summed up, see get_customer_balance."""
+    if not balances:
+        return None
+
+    balance = balances[0]
+    for bucket in BalanceBucket.values:
+        setattr(balance, bucket, sum((getattr(b, bucket) for b in balances), Decimal(0)))
+    balance.updated_at = max(b.updated_at for b in balances)
+
+    return balance
+
+
+class BalanceStripingService:
+    """
+    Promotes customers to striped balances and demotes them back, online.
+    Promotion only creates empty slot rows, so in flight postings are never lost.
+    Demotion moves every slot back into slot 0 through postings; a posting that picked
+    an old slot before the demotion just leaves a residue that is still summed on reads
+    and moved on the next demotion.
+    """
+
+    @atomic
+    def promote(self, customer_id: UUID, slots: int) -> Customer:
+        if slots < MIN_STRIPED_SLOTS:
+            raise ValueError(f"A striped balance must have at least {MIN_STRIPED_SLOTS} slots.")
+
+        customer = Customer.objects.select_for_update().get(id=customer_id)
+        primary = Balance.objects.get(customer=customer, slot=0)
+        Balance.objects.bulk_create(
+            [
+                Balance(customer=customer, slot=slot, available=0, waiting_funds=0)
+                for slot in range(1, slots)
+            ],
+            ignore_conflicts=True,
+        )
+        customer.balance_slots = slots
+        customer.save(update_fields=["balance_slots", "updated_at"])
+
+        logger.info(
+            "[payments.striping] customer %s promoted to %s balance slots | primary balance: %s",
+            customer.id, slots, primary.id,
+        )
+        return customer
+
+    @atomic
+    def demote(self, customer_id: UUID) -> Customer:
+        customer = Customer.objects.select_for_update().get(id=customer_id)
+        customer.balance_slots = 1
+        customer.save(update_fields=["balance_slots", "updated_at"])
+
+        balances = list(
+            Balance.objects.select_for_update().filter(customer=customer).order_by("id")
+        )
+        primary = next(balance for balance in balances if balance.slot == 0)
+        slots = [
+            balance for balance in balances
+            if balance.slot > 0 and (balance.available or balance.waiting_funds)
+        ]
+        totals = {
+            bucket: sum((getattr(balance, bucket) for balance in slots), Decimal(0))
+            for bucket in BalanceBucket.values
+        }
+        if slots:
+            BalancePostingService().post([
+                *[
+                    BalancePosting(
+                        balance_id=balance.id,
+                        available=-balance.available,
+                        waiting_funds=-balance.waiting_funds,
+                    )
+                    for balance in slots
+                ],
+                BalancePosting(balance_id=primary.id, **totals),
+            ])
+
+        logger.info(
+            "[payments.striping] customer %s demoted to a single balance | "
+            "moved to primary balance: %s",
+            customer.id, totals,
+        )
+        return customer
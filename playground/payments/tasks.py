@@ -1,29 +1,202 @@
 import logging
+import time
+from itertools import islice
 
-from celery import shared_task
+from celery import chord, shared_task
+from django.conf import settings
+
+from . import metrics
+from .enums import SettlementMode
+from .exceptions import LeaseLostError
+from .locks import get_lease_lock
+from .scheduling import SettlementSchedule
+from .throttling import AdaptiveThrottle
+
+logger = logging.getLogger(__name__)
+
+SETTLEMENT_LOCK = "payments.settlement"
+
+
+def _lease_name(slot: int | None) -> str:
+    return SETTLEMENT_LOCK if slot is None else f"{SETTLEMENT_LOCK}.{slot}"
 
 
 @shared_task
-def pay_daily_payables():
-    from .services import PayableService  # noqa: PLC0415
+def pay_daily_payables(slot: int | None = None):
+    """
+    Settlement coordinator: fans out one settle_payables_shard task per shard
+    (customers are split by a hash of their id) and collects the results on
+    summarize_settlement once every shard finishes.
+    Beat runs it once per slot of the settlement window, settling only the customers
+    of that slot. Without a slot every customer is settled.
+
+    The whole run holds the settlement lease lock: while a run is in progress the next
+    beat ticks are skipped. Shards renew the lease after each chunk and summarize_settlement
+    releases it, or fail_settlement when a shard fails (summarize_settlement never runs then).
+    If a worker dies the lease expires and the next tick takes it over.
+
+    Up to PAYMENTS_SETTLEMENT_SHARDS shards run in parallel: fewer when the last run
+    was over PAYMENTS_SETTLEMENT_TARGET_LATENCY, so settlement backs off a busy database.
+    """
+    from .services import SettlementRunService  # noqa: PLC0415
+
+    lease = get_lease_lock(_lease_name(slot))
+    if not lease.acquire():
+        logger.info("[payments.tasks] Settlement of slot %s already running, skipping.", slot)
+        return None
 
-    logging.info("[payments.tasks] Starting daily payable processing...")
+    shards = SettlementRunService().pick_shards(slot)
+
+    logger.info(
+        "[payments.tasks] Starting daily payable processing of slot %s on %s shards...",
+        slot, shards,
+    )
+
+    return chord(
+        settle_payables_shard.s(shard, shards, lease.owner, slot).on_error(
+            fail_settlement.s(lease.owner, slot)
+        )
+        for shard in range(shards)
+    )(summarize_settlement.s(lease.owner, slot)).id
+
+
+@shared_task
+def settle_payables_shard(
+    shard: int, shards: int, lease_owner: str | None = None, slot: int | None = None
+) -> dict:
+    """
+    Streams the shard due payables in keyset chunks, so worker memory stays flat.
+    The shard SettlementRun is checkpointed after each chunk and an unfinished run
+    is resumed from its last key. With PAYMENTS_SETTLEMENT_MAX_CHUNKS a run settles
+    at most that many chunks and the backlog is drained by the next runs.
+    A failed chunk is rolled back and recorded, and the next chunks are still settled.
+    When started by the coordinator, the settlement lease is renewed after each chunk and
+    the shard stops if it was lost, leaving the run to be resumed by the lease new owner.
+    Chunk sizes are adapted to the commit latency and paced under a share of
+    PAYMENTS_SETTLEMENT_MAX_RATE by an AdaptiveThrottle.
+    """
+    from .services import PayableService, SettlementRunService  # noqa: PLC0415
 
     service = PayableService()
-    payables = service.get_today_payables()
+    run_service = SettlementRunService()
+    window = service.get_settlement_window(settings.PAYMENTS_SETTLEMENT_CATCH_UP)
+    run = run_service.start(shard, shards, window, slot)
+    payables = service.filter_shard(
+        service.get_due_payables(run.window_end, run.window_start), shard, shards
+    )
+    if slot is not None:
+        payables = SettlementSchedule.from_settings().filter_slot(payables, slot)
+    if not run.last_key:
+        run.total_count = payables.count()
+        run.save(update_fields=["total_count", "updated_at"])
 
-    if not payables:
-        logging.info("[payments.tasks] No payables to process today.")
-        return
+    if not run.total_count:
+        logger.info("[payments.tasks] No payables to process today on shard %s.", shard)
+        return _run_result(run_service.finish(run))
+
+    throttle = AdaptiveThrottle(
+        run.chunk_size, max_rate=settings.PAYMENTS_SETTLEMENT_MAX_RATE / shards or None
+    )
+    chunks = service.iter_payable_chunks(payables, after=run.last_key, throttle=throttle)
+    max_chunks = settings.PAYMENTS_SETTLEMENT_MAX_CHUNKS or None
+    for payable_ids, last_key in islice(chunks, max_chunks):
+        started = time.perf_counter()
+        if settings.PAYMENTS_SETTLEMENT_MODE == SettlementMode.SET:
+            run_service.settle_chunk(run, payable_ids, last_key)
+        else:
+            run_service.apply_chunk(run, payable_ids, last_key)
+        throttle.observe(len(payable_ids), time.perf_counter() - started)
+        run_service.save_throttle(run, throttle)
 
-    for payable in payables:
-        try:
-            service.apply_waiting_funds_payable(payable)
-        except Exception as e:
-            logging.error(
-                "[payments.tasks] error applying payable to balance: "
-                f"payable_id - {payable.id} | error - {str(e)}"
+        if lease_owner and not get_lease_lock(_lease_name(slot), owner=lease_owner).renew():
+            logger.error(
+                "[payments.tasks] settlement lease lost on shard %s, run %s stopped at %s.",
+                shard, run.id, run.last_key,
             )
-            continue
+            metrics.record_settlement_error("lease_lost")
+            raise LeaseLostError(f"Settlement lease lost on shard {shard}.")
+
+    if max_chunks and next(chunks, None):
+        logger.info(
+            "[payments.tasks] shard %s reached %s chunks, run %s continues on the next settlement.",
+            shard, max_chunks, run.id,
+        )
+        return _run_result(run)
+
+    run = run_service.finish(run)
+    logger.info(
+        "[payments.tasks] %s of %s payables processed on shard %s.",
+        run.settled_count, run.total_count, shard,
+    )
+    return _run_result(run)
+
+
+def _run_result(run) -> dict:
+    return {
+        "run_id": str(run.id),
+        "shard": run.shard,
+        "slot": run.slot,
+        "total": run.total_count,
+        "settled": run.settled_count,
+        "failed": run.failed_count,
+        "duration": run.duration.total_seconds(),
+        "chunk_size": run.chunk_size,
+        "latency": run.latency or 0.0,
+        "throttled": run.throttled.total_seconds(),
+        "errors": list(run.errors.values_list("message", flat=True)),
+    }
+
+
+@shared_task
+def fail_settlement(
+    request, exc, traceback, lease_owner: str | None = None, slot: int | None = None
+) -> None:
+    """
+    Errback of the shard tasks. A failed shard fails the whole chord, so the lease is
+    released here instead of being held until it expires, and the shard run is marked
+    failed to be resumed from its last key by the next settlement.
+    A shard that lost the lease leaves its run to the lease new owner.
+    """
+    from .services import SettlementRunService  # noqa: PLC0415
+
+    if isinstance(exc, LeaseLostError):
+        return
+
+    shard, shards = request.args[:2]
+    SettlementRunService().fail(shard, shards, slot, f"{type(exc).__name__}: {exc}")
+    if lease_owner:
+        get_lease_lock(_lease_name(slot), owner=lease_owner).release()
+
+
+@shared_task
+def summarize_settlement(
+    results: list[dict], lease_owner: str | None = None, slot: int | None = None
+) -> dict:
+    if lease_owner:
+        get_lease_lock(_lease_name(slot), owner=lease_owner).release()
+
+    summary = {
+        "slot": slot,
+        "shards": len(results),
+        "total": sum(result["total"] for result in results),
+        "settled": sum(result["settled"] for result in results),
+        "failed": sum(result["failed"] for result in results),
+        "duration": max((result["duration"] for result in results), default=0.0),
+        "latency": max((result["latency"] for result in results), default=0.0),
+        "throttled": sum(result["throttled"] for result in results),
+        "errors": [error for result in results for error in result["errors"]],
+    }
+
+    summary["throughput"] = summary["settled"] / summary["duration"] if summary["duration"] else 0.0
 
-    logging.info(f"[payments.tasks] {len(payables)} payables processed.")
+    logger.info(
+        "[payments.tasks] daily payable processing finished: shards - %s | settled - %s | "
+        "failed - %s | throughput - %.2f/s | latency - %.3fs | throttled - %.2fs",
+        summary["shards"],
+        summary["settled"],
+        summary["failed"],
+        summary["throughput"],
+        summary["latency"],
+        summary["throttled"],
+    )
+    return summary
@@ -1,5 +1,6 @@
 import pytest
 
+from payments.cache import get_balance_cache
 from payments.enums import CustomerType, PayableStatus, TransactionMethod, TransactionStatus
 
 from .factories import BalanceFactory, CustomerFactory, PayableFactory, TransactionFactory
@@ -26,6 +27,52 @@ def best_health_check_ever():
         ["Ele vibra, ele é fibra muita libra já pesou", "Flamengo até morrer eu sou!"]
     ]
 
+@pytest.fixture(autouse=True)
+def enforce_query_budgets(settings):
+    """Query budgets are a contract: going over one fails the test."""
+    settings.PAYMENTS_QUERY_BUDGET_MODE = "raise"
+
+
+@pytest.fixture(autouse=True)
+def balance_cache(settings):
+    """
+    Tests run on the per process cache, without Redis.
+    Balances cached by a test are not served to the next one.
+    """
+    settings.PAYMENTS_BALANCE_CACHE_BACKEND = "local"
+    cache = get_balance_cache()
+    yield cache
+    cache.clear()
+
+
+@pytest.fixture
+def fixed_chunk_size(settings):
+    """Settles in chunks of 2 payables, keeping the adaptive throttle from resizing them."""
+    settings.PAYMENTS_SETTLEMENT_CHUNK_SIZE = 2
+    settings.PAYMENTS_SETTLEMENT_MIN_CHUNK_SIZE = 2
+    settings.PAYMENTS_SETTLEMENT_MAX_CHUNK_SIZE = 2
+    return settings.PAYMENTS_SETTLEMENT_CHUNK_SIZE
+
+
+@pytest.fixture
+def celery_eager():
+    """Runs Celery tasks, groups and chords inline with the in-memory broker."""
+    from playground.celery import app  # noqa: PLC0415
+
+    previous = {
+        key: app.conf[key]
+        for key in ("broker_url", "result_backend", "task_always_eager", "task_eager_propagates")
+    }
+    app.conf.update(
+        broker_url="memory://",
+        result_backend="cache+memory://",
+        task_always_eager=True,
+        task_eager_propagates=True,
+    )
+    yield app
+    app.conf.update(previous)
+
+
 @pytest.fixture
 def pending_credit_transaction():
     return TransactionFactory()
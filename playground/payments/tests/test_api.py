@@ -14,8 +14,9 @@ from rest_framework.test import APIClient
 
 from payments.enums import CustomerType, TransactionMethod, TransactionStatus
 from payments.factory import CreditCardTransaction, DebitCardTransaction
-from payments.models import Customer
+from payments.models import Balance, Customer, Transaction
 from payments.serializers import BalanceSerializer, CustomerSerializer
+from payments.striping import BalanceStripingService
 
 
 def test_ping_endpoint(best_health_check_ever):
@@ -44,7 +45,70 @@ def test_list_transactions(
     response = client.get("/api/v1/payments/transactions/")
 
     assert response.status_code == HTTP_200_OK
-    assert len(response.data) == credit_transactions_quantity + debit_transactions_quantity
+    assert len(response.data["results"]) == (
+        credit_transactions_quantity + debit_transactions_quantity
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("ordering", ["-created_at", "value", "-value"])
+def test_list_transactions_cursor_pagination(
+    processed_credit_transactions, processed_debit_transactions, ordering
+):
+    client = APIClient()
+    Transaction.objects.filter(
+        id__in=[transaction.id for transaction in processed_credit_transactions[:3]]
+    ).update(value=100)
+    expected = [
+        str(transaction_id) for transaction_id in Transaction.objects.order_by(
+            ordering, f"{ordering[0] if ordering.startswith('-') else ''}id"
+        ).values_list("id", flat=True)
+    ]
+
+    ids = []
+    pages = []
+    url = f"/api/v1/payments/transactions/?ordering={ordering}&page_size=3"
+    while url:
+        response = client.get(url)
+        assert response.status_code == HTTP_200_OK
+        pages.append(response.data)
+        ids.extend(item["id"] for item in response.data["results"])
+        url = response.data["next"]
+
+    previous = client.get(pages[-1]["previous"])
+
+    assert ids == expected
+    assert pages[0]["previous"] is None
+    assert [item["id"] for item in previous.data["results"]] == [
+        item["id"] for item in pages[-2]["results"]
+    ]
+
+
+@pytest.mark.django_db
+def test_list_transactions_invalid_cursor():
+    client = APIClient()
+    response = client.get("/api/v1/payments/transactions/?cursor=vasco")
+
+    assert response.status_code == HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("threshold", [0, 10000])
+def test_list_customers_offset_pagination(
+    settings, individual_customers_quantity, individual_customers, threshold
+):
+    settings.PAYMENTS_PAGINATION_COUNT_THRESHOLD = threshold
+    page_size = 2
+    client = APIClient()
+    response = client.get(f"/api/v1/payments/customers/?page=2&page_size={page_size}")
+
+    assert response.status_code == HTTP_200_OK
+    assert len(response.data["results"]) == page_size
+    assert response.data["previous"] is not None
+    if threshold:
+        assert response.data["count"] == individual_customers_quantity
+    else:
+        assert isinstance(response.data["count"], int)
 
 
 @pytest.mark.django_db
@@ -62,7 +126,7 @@ def test_list_transactions_filtered_by_method(
     response = client.get(f"/api/v1/payments/transactions/?method={method}")
 
     assert response.status_code == HTTP_200_OK
-    assert len(response.data) == expected_count
+    assert len(response.data["results"]) == expected_count
 
 
 @pytest.mark.django_db
@@ -83,7 +147,7 @@ def test_list_transactions_filtered_by_status(
     response = client.get(f"/api/v1/payments/transactions/?status={status}")
 
     assert response.status_code == HTTP_200_OK
-    assert len(response.data) == expected_count
+    assert len(response.data["results"]) == expected_count
 
 
 @pytest.mark.django_db
@@ -139,7 +203,7 @@ def test_list_customers(individual_customers_quantity, individual_customers):
     response = client.get("/api/v1/payments/customers/")
 
     assert response.status_code == HTTP_200_OK
-    assert len(response.data) == individual_customers_quantity
+    assert len(response.data["results"]) == individual_customers_quantity
 
 
 @pytest.mark.django_db
@@ -160,7 +224,7 @@ def test_list_customers_filtered_by_type(
 
     assert response.status_code == expected_status_code
     if expected_quantity:
-        assert len(response.data) == expected_quantity
+        assert len(response.data["results"]) == expected_quantity
 
 
 @pytest.mark.django_db
@@ -175,7 +239,7 @@ def test_list_customers_filtered_by_active(
     response = client.get(f"/api/v1/payments/customers/?active={active}")
 
     assert response.status_code == expected_status_code
-    assert len(response.data) == expected_quantity
+    assert len(response.data["results"]) == expected_quantity
 
 
 @pytest.mark.django_db
@@ -355,3 +419,60 @@ def test_process_transaction_failed_transaction_error(customer_with_balance, met
 
     assert response.status_code == HTTP_500_INTERNAL_SERVER_ERROR
     assert response.data["status"] == TransactionStatus.FAILED
+
+
+@pytest.mark.django_db
+def test_process_transaction_batch(customer_with_balance):
+    transaction_data = {
+        "customer_id": str(customer_with_balance.id),
+        "value": 10.0,
+        "description": "Deu Flamengo no Maracanã lotado!",
+        "method": TransactionMethod.CREDIT,
+        "card_number": "Filipe Luís",
+        "card_owner": "Rafinha",
+        "card_expiration_year": "2028",
+        "card_verification_code": "123",
+    }
+    request_data = {
+        "transactions": [
+            transaction_data,
+            {**transaction_data, "method": "wrong_method"},
+            {**transaction_data, "method": TransactionMethod.DEBIT},
+        ]
+    }
+    client = APIClient()
+    response = client.post(
+        "/api/v1/payments/transactions/process/batch/", data=request_data, format="json"
+    )
+
+    assert response.status_code == HTTP_200_OK
+    assert [item["status"] for item in response.data] == [
+        TransactionStatus.PROCESSED, TransactionStatus.FAILED, TransactionStatus.PROCESSED
+    ]
+
+
+@pytest.mark.django_db
+def test_process_transaction_batch_validation_error():
+    client = APIClient()
+    response = client.post(
+        "/api/v1/payments/transactions/process/batch/",
+        data={"transactions": []},
+        format="json"
+    )
+
+    assert response.status_code == HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_get_striped_balance_by_customer(balance):
+    BalanceStripingService().promote(balance.customer.id, 2)
+    slot = Balance.objects.get(customer=balance.customer, slot=1)
+    slot.available = 20.0
+    slot.save()
+
+    client = APIClient()
+    response = client.get(f"/api/v1/payments/customers/{balance.customer.id}/balance/")
+
+    assert response.status_code == HTTP_200_OK
+    assert response.data["id"] == str(balance.id)
+    assert response.data["available"] == "1020.00"
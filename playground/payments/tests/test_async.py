@@ -0,0 +1,185 @@
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import include, path
+from prometheus_client import REGISTRY
+from rest_framework.status import (
+    HTTP_200_OK,
+    HTTP_204_NO_CONTENT,
+    HTTP_304_NOT_MODIFIED,
+    HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
+)
+from rest_framework.test import APIClient
+
+from payments.enums import TransactionMethod, TransactionStatus
+from payments.exceptions import QueryBudgetExceededError
+from payments.models import Customer
+from payments.queries import assert_query_budget, query_budget
+
+# The async routes, as served under ASGI
+urlpatterns = [path("api/v1/payments/", include("payments.async_urls"))]
+pytestmark = pytest.mark.urls("payments.tests.test_async")
+
+
+def async_get(url: str, **extra):
+    return async_to_sync(AsyncClient().get)(url, **extra)
+
+
+def sync_get(url: str, **extra):
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr("django.conf.settings.ROOT_URLCONF", "playground.urls")
+        return APIClient().get(url, **extra)
+
+
+def transaction_request(customer) -> dict:
+    return {
+        "customer_id": str(customer.id),
+        "value": 10.0,
+        "description": "Gabigol no último minuto!",
+        "method": TransactionMethod.DEBIT,
+        "card_number": "Gabriel Barbosa",
+        "card_owner": "Arrascaeta",
+        "card_expiration_year": "2028",
+        "card_verification_code": "123",
+    }
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("query", ["", "?ordering=value&page_size=3", "?page=2&page_size=3"])
+def test_async_transactions_list_matches_sync(
+    processed_credit_transactions, processed_debit_transactions, query
+):
+    url = f"/api/v1/payments/transactions/{query}"
+    response = async_get(url)
+
+    assert response.status_code == HTTP_200_OK
+    assert response.content == sync_get(url).content
+
+
+@pytest.mark.django_db
+def test_async_transactions_list_not_modified(processed_credit_transactions):
+    url = "/api/v1/payments/transactions/?page_size=3"
+    first = async_get(url)
+
+    with assert_query_budget(1):
+        response = async_get(url, headers={"If-None-Match": first["ETag"]})
+
+    assert response.status_code == HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.django_db
+def test_async_list_invalid_filter():
+    response = async_get("/api/v1/payments/transactions/?status=vasco")
+
+    assert response.status_code == HTTP_400_BAD_REQUEST
+    assert "status" in json.loads(response.content)
+
+
+@pytest.mark.django_db
+def test_async_customer_detail(customer):
+    url = f"/api/v1/payments/customers/{customer.id}/"
+    response = async_get(url)
+    not_modified = async_get(url, headers={"If-None-Match": response["ETag"]})
+
+    assert response.content == sync_get(url).content
+    assert response["ETag"] == sync_get(url)["ETag"]
+    assert not_modified.status_code == HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.django_db
+def test_async_customer_not_found():
+    response = async_get("/api/v1/payments/customers/01a15093-773e-7000-b6d4-858a2cd4e793/")
+
+    assert response.status_code == HTTP_404_NOT_FOUND
+    assert json.loads(response.content) == {"detail": "No Customer matches the given query."}
+
+
+@pytest.mark.django_db
+def test_async_customer_delete_runs_sync_view(customer_with_balance):
+    client = AsyncClient()
+    response = async_to_sync(client.delete)(
+        f"/api/v1/payments/customers/{customer_with_balance.id}/"
+    )
+
+    assert response.status_code == HTTP_204_NO_CONTENT
+    assert not Customer.objects.filter(id=customer_with_balance.id).exists()
+
+
+@pytest.mark.django_db
+def test_async_customer_balance(customer_with_balance):
+    url = f"/api/v1/payments/customers/{customer_with_balance.id}/balance/"
+    response = async_get(url)
+
+    with assert_query_budget(0):
+        cached = async_get(url)
+
+    assert response.content == sync_get(url).content
+    assert cached.content == response.content
+
+
+@pytest.mark.django_db
+def test_async_transaction_process(customer_with_balance):
+    client = AsyncClient()
+    response = async_to_sync(client.post)(
+        "/api/v1/payments/transactions/process/",
+        transaction_request(customer_with_balance),
+        content_type="application/json",
+    )
+
+    assert response.status_code == HTTP_200_OK
+    assert json.loads(response.content) == {
+        "customer_id": str(customer_with_balance.id), "status": TransactionStatus.PROCESSED
+    }
+
+
+@pytest.mark.django_db
+def test_async_transaction_process_errors(customer):
+    client = AsyncClient()
+    post = async_to_sync(client.post)
+    url = "/api/v1/payments/transactions/process/"
+    unknown = {
+        **transaction_request(customer), "customer_id": "01a15093-773e-7000-b6d4-858a2cd4e793"
+    }
+
+    invalid = post(url, {"value": 10.0}, content_type="application/json")
+    malformed = post(url, "{", content_type="application/json")
+    not_found = post(url, unknown, content_type="application/json")
+
+    assert invalid.status_code == HTTP_400_BAD_REQUEST
+    assert "customer_id" in json.loads(invalid.content)
+    assert malformed.status_code == HTTP_400_BAD_REQUEST
+    assert not_found.status_code == HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_async_middleware_collects_async_orm_queries(customer):
+    labels = {"view": "customer-details"}
+    queries = REGISTRY.get_sample_value("payments_http_request_queries_sum", labels) or 0.0
+
+    async_get(f"/api/v1/payments/customers/{customer.id}/")
+
+    assert REGISTRY.get_sample_value("payments_http_request_queries_sum", labels) == queries + 1
+
+
+@pytest.mark.django_db
+def test_async_query_budget(customer):
+    @query_budget(0)
+    async def lookup():
+        return await Customer.objects.filter(id=customer.id).afirst()
+
+    with pytest.raises(QueryBudgetExceededError):
+        async_to_sync(lookup)()
+
+
+@pytest.mark.django_db
+def test_export_streams_async_under_asgi(processed_credit_transactions):
+    response = async_get("/api/v1/payments/transactions/export/")
+
+    async def read():
+        return b"".join([chunk async for chunk in response.streaming_content])
+
+    assert response.is_async
+    assert len(async_to_sync(read)().splitlines()) == len(processed_credit_transactions)
@@ -0,0 +1,295 @@
+import asyncio
+import threading
+from unittest.mock import patch
+
+import pytest
+import redis
+from rest_framework.test import APIClient
+
+from payments.cache import LocalBalanceCache, RedisBalanceCache, get_balance_cache
+from payments.enums import TransactionMethod, TransactionStatus
+from payments.models import Payable
+from payments.queries import assert_query_budget
+from payments.services import TransactionService
+
+THREADS = 5
+
+
+def balance_url(customer) -> str:
+    return f"/api/v1/payments/customers/{customer.id}/balance/"
+
+
+@pytest.mark.django_db
+def test_balance_is_served_from_cache(customer_with_balance):
+    client = APIClient()
+    first = client.get(balance_url(customer_with_balance))
+
+    with assert_query_budget(0):
+        second = client.get(balance_url(customer_with_balance))
+
+    assert second.data == first.data
+
+
+@pytest.mark.django_db
+def test_balance_cache_is_invalidated_on_posting_commit(
+    django_capture_on_commit_callbacks, customer_with_balance
+):
+    client = APIClient()
+    before = client.get(balance_url(customer_with_balance)).data
+
+    with django_capture_on_commit_callbacks(execute=True):
+        TransactionService().process({
+            "customer_id": customer_with_balance.id,
+            "value": 10.0,
+            "description": "Gabigol no último minuto!",
+            "method": TransactionMethod.DEBIT,
+            "card_number": "Gabriel Barbosa",
+            "card_owner": "Arrascaeta",
+            "card_expiration_year": "2028",
+            "card_verification_code": "123",
+        })
+    after = client.get(balance_url(customer_with_balance)).data
+
+    assert after["available"] != before["available"]
+
+
+@pytest.mark.django_db
+def test_balance_cache_keeps_version_until_commit(customer_with_balance):
+    client = APIClient()
+    before = client.get(balance_url(customer_with_balance)).data
+
+    # Callbacks are not executed: the posting transaction is not committed yet
+    get_balance_cache().invalidate([customer_with_balance.id])
+
+    assert client.get(balance_url(customer_with_balance)).data == before
+
+
+@pytest.mark.django_db
+def test_missing_balance_is_not_cached(customer):
+    client = APIClient()
+
+    assert client.get(balance_url(customer)).status_code == 404  # noqa: PLR2004
+    assert get_balance_cache().get(f"{customer.id}:0") is None
+
+
+def test_local_balance_cache_evicts_least_recently_used():
+    cache = LocalBalanceCache(ttl=60, maxsize=2)
+    cache.set("a:0", {"value": "a"})
+    cache.set("b:0", {"value": "b"})
+    cache.get("a:0")
+    cache.set("c:0", {"value": "c"})
+
+    assert cache.get("a:0") == {"value": "a"}
+    assert cache.get("b:0") is None
+    assert cache.get("c:0") == {"value": "c"}
+
+
+def test_local_balance_cache_expires_entries():
+    cache = LocalBalanceCache(ttl=10, maxsize=2)
+    with patch("payments.cache.time.monotonic", return_value=100.0):
+        cache.set("a:0", {"value": "a"})
+
+    with patch("payments.cache.time.monotonic", return_value=109.0):
+        assert cache.get("a:0") == {"value": "a"}
+    with patch("payments.cache.time.monotonic", return_value=110.0):
+        assert cache.get("a:0") is None
+
+
+def test_local_balance_cache_versions():
+    cache = LocalBalanceCache(ttl=60, maxsize=10)
+    cache.get_or_load("customer", lambda: {"value": 1})
+
+    cache.bump(["customer"])
+
+    assert cache.version("customer") == 1
+    assert cache.get_or_load("customer", lambda: {"value": 2}) == {"value": 2}
+
+
+def test_concurrent_misses_are_coalesced():
+    cache = LocalBalanceCache(ttl=60, maxsize=10)
+    loading = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def loader():
+        calls.append(1)
+        loading.set()
+        release.wait(timeout=5)
+        return {"value": "Flamengo"}
+
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_load("customer", loader)))
+        for _ in range(THREADS)
+    ]
+    threads[0].start()
+    loading.wait(timeout=5)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert len(calls) == 1
+    assert results == [{"value": "Flamengo"}] * THREADS
+
+
+def test_concurrent_async_misses_are_coalesced():
+    cache = LocalBalanceCache(ttl=60, maxsize=10)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"value": "Flamengo"}
+
+    async def misses():
+        return await asyncio.gather(
+            *(cache.aget_or_load("customer", loader) for _ in range(THREADS))
+        )
+
+    assert asyncio.run(misses()) == [{"value": "Flamengo"}] * THREADS
+    assert len(calls) == 1
+    assert cache._async_flights == {}
+
+
+def test_coalesced_async_misses_get_the_load_error():
+    cache = LocalBalanceCache(ttl=60, maxsize=10)
+
+    async def loader():
+        await asyncio.sleep(0.01)
+        raise TimeoutError("canceling statement due to statement timeout")
+
+    async def misses():
+        return await asyncio.gather(
+            *(cache.aget_or_load("customer", loader) for _ in range(THREADS)),
+            return_exceptions=True,
+        )
+
+    errors = asyncio.run(misses())
+
+    assert len(errors) == THREADS
+    assert all(isinstance(error, TimeoutError) for error in errors)
+
+def test_coalesced_misses_get_the_load_error():
+    cache = LocalBalanceCache(ttl=60, maxsize=10)
+    loading = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def loader():
+        loading.set()
+        release.wait(timeout=5)
+        raise TimeoutError("canceling statement due to statement timeout")
+
+    def get():
+        try:
+            cache.get_or_load("customer", loader)
+        except TimeoutError as err:
+            errors.append(err)
+
+    threads = [threading.Thread(target=get) for _ in range(THREADS)]
+    threads[0].start()
+    loading.wait(timeout=5)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert len(errors) == THREADS
+    assert cache.get_or_load("customer", lambda: {"value": "Flamengo"}) == {"value": "Flamengo"}
+
+
+def test_coalesced_miss_loads_after_wait_timeout():
+    cache = LocalBalanceCache(ttl=60, maxsize=10)
+    cache.wait_timeout = 0.01
+    loading = threading.Event()
+    release = threading.Event()
+
+    def hung_loader():
+        loading.set()
+        release.wait(timeout=5)
+        return {"value": "hung"}
+
+    leader = threading.Thread(target=lambda: cache.get_or_load("customer", hung_loader))
+    leader.start()
+    loading.wait(timeout=5)
+
+    assert cache.get_or_load("customer", lambda: {"value": "Flamengo"}) == {"value": "Flamengo"}
+
+    release.set()
+    leader.join(timeout=5)
+
+
+def test_local_balance_cache_versions_are_bounded():
+    cache = LocalBalanceCache(ttl=60, maxsize=2)
+    cache.get_or_load("a", lambda: {"value": "a0"})
+    cache.get_or_load("b", lambda: {"value": "b0"})
+    cache.bump(["a"])
+    cache.get_or_load("a", lambda: {"value": "a1"})
+    versions = {"a": cache.version("a"), "b": cache.version("b")}
+
+    cache.bump(["b", "c"])
+
+    assert len(cache._versions) <= 1
+    assert cache.version("a") > versions["a"]
+    assert cache.version("b") > versions["b"]
+    assert cache.get_or_load("a", lambda: {"value": "a2"}) == {"value": "a2"}
+    assert cache.get_or_load("b", lambda: {"value": "b1"}) == {"value": "b1"}
+
+
+def test_unavailable_redis_loads_balances():
+    client = redis.Redis(host="127.0.0.1", port=9, socket_connect_timeout=0.1)
+    cache = RedisBalanceCache(ttl=60, client=client)
+
+    assert cache.get_or_load("customer", lambda: {"value": "Flamengo"}) == {"value": "Flamengo"}
+
+
+def test_invalid_balance_cache_backend(settings):
+    settings.PAYMENTS_BALANCE_CACHE_BACKEND = "memcached"
+
+    with pytest.raises(ValueError, match="Invalid balance cache backend"):
+        get_balance_cache()
+
+
+@pytest.mark.django_db
+def test_failed_version_bump_keeps_the_posting(
+    django_capture_on_commit_callbacks, customer_with_balance
+):
+    balance = customer_with_balance.balances.get()
+    client = redis.Redis(host="127.0.0.1", port=9, socket_connect_timeout=0.1)
+
+    with (
+        patch("payments.posting.get_balance_cache", return_value=RedisBalanceCache(client=client)),
+        django_capture_on_commit_callbacks(execute=True),
+    ):
+        result = TransactionService().process({
+            "customer_id": customer_with_balance.id,
+            "value": 10.0,
+            "description": "Gabigol no último minuto!",
+            "method": TransactionMethod.DEBIT,
+            "card_number": "Gabriel Barbosa",
+            "card_owner": "Arrascaeta",
+            "card_expiration_year": "2028",
+            "card_verification_code": "123",
+        })
+
+    balance.refresh_from_db()
+    assert result["status"] == TransactionStatus.PROCESSED
+    assert Payable.objects.filter(customer=customer_with_balance).count() == 1
+    assert balance.available > 0
+
+
+@pytest.mark.django_db
+def test_balance_cache_is_invalidated_on_customer_update(
+    django_capture_on_commit_callbacks, customer_with_balance
+):
+    client = APIClient()
+    client.get(balance_url(customer_with_balance))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        customer_with_balance.name = "Filipe Luís"
+        customer_with_balance.save()
+
+    assert client.get(balance_url(customer_with_balance)).data["customer"]["name"] == "Filipe Luís"
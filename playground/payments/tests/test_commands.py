@@ -0,0 +1,99 @@
+import uuid
+from decimal import Decimal
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import InternalError
+from django.db.transaction import atomic
+
+from payments.models import BalanceEntry, Payable, SettlementRun, Transaction
+from payments.posting import BalancePosting, BalancePostingService
+
+from .factories import BalanceFactory, PayableFactory, TransactionFactory
+
+
+@pytest.fixture
+def uuid4_payables():
+    transactions = [TransactionFactory.create(id=uuid.uuid4()) for _ in range(5)]
+    return [
+        PayableFactory.create(id=uuid.uuid4(), transaction=transaction)
+        for transaction in transactions
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rekey_uuid7(capsys, uuid4_payables):
+    links = {
+        payable.created_at: payable.transaction.created_at for payable in uuid4_payables
+    }
+
+    call_command("rekey_uuid7", "Transaction", "Payable", "--batch-size", "2")
+
+    transactions = list(Transaction.objects.all())
+    payables = list(Payable.objects.select_related("transaction"))
+
+    assert "Transaction: done, 5 rows" in capsys.readouterr().out
+    assert all(transaction.id.version == 7 for transaction in transactions)  # noqa: PLR2004
+    assert all(payable.id.version == 7 for payable in payables)  # noqa: PLR2004
+    assert [t.created_at for t in transactions] == sorted(t.created_at for t in transactions)
+    assert {p.created_at: p.transaction.created_at for p in payables} == links
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rekey_uuid7_moves_balance_entries(uuid4_payables):
+    balance = BalanceFactory.create()
+    BalancePostingService().post([
+        BalancePosting(
+            balance_id=balance.id,
+            available=Decimal("1"),
+            payable_id=payable.id,
+            transaction_id=payable.transaction_id,
+        )
+        for payable in uuid4_payables
+    ])
+
+    call_command("rekey_uuid7", "Transaction", "Payable", "--batch-size", "2")
+
+    entries = BalanceEntry.objects.select_related("payable")
+    assert entries.count() == len(uuid4_payables)
+    assert all(entry.payable.id.version == 7 for entry in entries)  # noqa: PLR2004
+    assert all(entry.transaction_id == entry.payable.transaction_id for entry in entries)
+    # The append-only trigger is enabled again
+    with pytest.raises(InternalError), atomic():
+        entries.update(payable=None)
+
+
+@pytest.mark.django_db
+def test_rekey_uuid7_dry_run(capsys, uuid4_payables):
+    call_command("rekey_uuid7", "Payable", "--dry-run")
+
+    assert "Payable: 5 rows to rekey" in capsys.readouterr().out
+    assert all(payable.id.version == 4 for payable in Payable.objects.all())  # noqa: PLR2004
+
+
+@pytest.mark.django_db
+def test_rekey_uuid7_refuses_while_settlement_runs(uuid4_payables):
+    SettlementRun.objects.create(window_end=uuid4_payables[0].payment_date)
+
+    with pytest.raises(CommandError):
+        call_command("rekey_uuid7", "Payable")
+
+
+@pytest.mark.django_db
+def test_benchmark_serializers(capsys, processed_credit_transaction):
+    call_command("benchmark_serializers", "--rows", "20", "--repeat", "1")
+    output = capsys.readouterr().out
+
+    assert "Serializing 20 transaction rows" in output
+    assert "fast |" in output
+    assert Transaction.objects.count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_benchmark_asgi(capsys, processed_credit_transaction):
+    call_command("benchmark_asgi", "--requests", "4", "--concurrency", "2", "--threads", "2")
+    output = capsys.readouterr().out
+
+    assert "wsgi (2 threads) |" in output
+    assert "asgi |" in output
+    assert output.count("errors - 0") == 2  # noqa: PLR2004
@@ -0,0 +1,132 @@
+from unittest.mock import patch
+
+import pytest
+from rest_framework.status import HTTP_200_OK, HTTP_304_NOT_MODIFIED
+from rest_framework.test import APIClient
+
+from payments.models import Customer, Transaction
+from payments.queries import assert_query_budget
+
+
+def customer_url(customer) -> str:
+    return f"/api/v1/payments/customers/{customer.id}/"
+
+
+def balance_url(customer) -> str:
+    return f"/api/v1/payments/customers/{customer.id}/balance/"
+
+
+@pytest.mark.django_db
+def test_customer_not_modified(customer):
+    client = APIClient()
+    first = client.get(customer_url(customer))
+
+    with (
+        assert_query_budget(1),
+        patch("payments.views.CustomerSerializer") as serializer,
+    ):
+        response = client.get(customer_url(customer), HTTP_IF_NONE_MATCH=first["ETag"])
+
+    assert response.status_code == HTTP_304_NOT_MODIFIED
+    assert response["ETag"] == first["ETag"]
+    assert not response.content
+    serializer.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_customer_not_modified_since(customer):
+    client = APIClient()
+    first = client.get(customer_url(customer))
+
+    response = client.get(customer_url(customer), HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+
+    assert response.status_code == HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.django_db
+def test_customer_modified(customer):
+    client = APIClient()
+    first = client.get(customer_url(customer))
+
+    customer.name = "Arrascaeta"
+    customer.save()
+    response = client.get(customer_url(customer), HTTP_IF_NONE_MATCH=first["ETag"])
+
+    assert response.status_code == HTTP_200_OK
+    assert response.data["name"] == "Arrascaeta"
+    assert response["ETag"] != first["ETag"]
+
+
+@pytest.mark.django_db
+def test_balance_not_modified_from_cache(customer_with_balance):
+    client = APIClient()
+    first = client.get(balance_url(customer_with_balance))
+
+    with assert_query_budget(0):
+        response = client.get(
+            balance_url(customer_with_balance), HTTP_IF_NONE_MATCH=first["ETag"]
+        )
+
+    assert response.status_code == HTTP_304_NOT_MODIFIED
+    assert first["Last-Modified"]
+
+
+@pytest.mark.django_db
+def test_balance_not_modified_without_cache(settings, customer_with_balance):
+    settings.PAYMENTS_BALANCE_CACHE_BACKEND = "off"
+    client = APIClient()
+    first = client.get(balance_url(customer_with_balance))
+
+    response = client.get(balance_url(customer_with_balance), HTTP_IF_NONE_MATCH=first["ETag"])
+
+    assert response.status_code == HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.django_db
+def test_transactions_page_not_modified(processed_credit_transactions):
+    client = APIClient()
+    url = "/api/v1/payments/transactions/?page_size=3"
+    first = client.get(url)
+
+    with (
+        assert_query_budget(1),
+        patch("payments.views.TransactionListAPIView.serializer_class") as serializer,
+    ):
+        response = client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+    assert response.status_code == HTTP_304_NOT_MODIFIED
+    serializer.assert_not_called()
+    assert "Last-Modified" not in first
+
+
+@pytest.mark.django_db
+def test_transactions_page_modified(processed_credit_transactions):
+    client = APIClient()
+    url = "/api/v1/payments/transactions/?page_size=3"
+    first = client.get(url)
+
+    Transaction.objects.filter(id=first.data["results"][0]["id"]).delete()
+    response = client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+    assert response.status_code == HTTP_200_OK
+    assert response["ETag"] != first["ETag"]
+
+
+@pytest.mark.django_db
+def test_customers_pages_have_own_etags(individual_customers):
+    client = APIClient()
+    first = client.get("/api/v1/payments/customers/?page_size=2")
+    second = client.get(first.data["next"], HTTP_IF_NONE_MATCH=first["ETag"])
+
+    assert second.status_code == HTTP_200_OK
+    assert second["ETag"] != first["ETag"]
+    assert Customer.objects.count() > len(first.data["results"])
+
+
+@pytest.mark.django_db
+def test_offset_page_is_not_conditional(individual_customers):
+    client = APIClient()
+    response = client.get("/api/v1/payments/customers/?page=1")
+
+    assert response.status_code == HTTP_200_OK
+    assert "ETag" not in response
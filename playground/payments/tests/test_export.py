@@ -0,0 +1,100 @@
+import csv
+import gzip
+import io
+import json
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST
+from rest_framework.test import APIClient
+
+from payments.enums import PayableStatus, TransactionMethod, TransactionStatus
+from payments.models import Payable, Transaction
+from payments.serializers import PayableSerializer, TransactionSerializer
+
+from .factories import PayableFactory, TransactionFactory
+
+
+def content(response) -> bytes:
+    return b"".join(response.streaming_content)
+
+
+@pytest.mark.django_db
+def test_export_transactions_ndjson(settings, processed_credit_transactions):
+    settings.PAYMENTS_EXPORT_CHUNK_SIZE = 4
+    client = APIClient()
+    response = client.get("/api/v1/payments/transactions/export/")
+    lines = [json.loads(line) for line in content(response).splitlines()]
+
+    assert response.status_code == HTTP_200_OK
+    assert response.streaming
+    assert response["Content-Type"] == "application/x-ndjson"
+    assert response["Content-Disposition"] == 'attachment; filename="transactions.ndjson"'
+    assert lines == [
+        TransactionSerializer(transaction).data
+        for transaction in Transaction.objects.order_by("created_at", "id")
+    ]
+
+
+@pytest.mark.django_db
+def test_export_transactions_csv_filtered(
+    processed_credit_transactions, processed_debit_transactions, debit_transactions_quantity
+):
+    TransactionFactory(method=TransactionMethod.DEBIT, status=TransactionStatus.FAILED)
+    client = APIClient()
+    response = client.get(
+        "/api/v1/payments/transactions/export/",
+        {"output": "csv", "method": TransactionMethod.DEBIT, "status": TransactionStatus.PROCESSED},
+        HTTP_ACCEPT="text/csv",
+    )
+    rows = list(csv.DictReader(io.StringIO(content(response).decode())))
+
+    assert response["Content-Type"] == "text/csv"
+    assert len(rows) == debit_transactions_quantity
+    assert {row["method"] for row in rows} == {TransactionMethod.DEBIT}
+    assert list(rows[0]) == TransactionSerializer.Meta.fields
+
+
+@pytest.mark.django_db
+def test_export_transactions_created_range(processed_credit_transactions):
+    now = timezone.now()
+    Transaction.objects.filter(id=processed_credit_transactions[0].id).update(
+        created_at=now - timedelta(days=40)
+    )
+    client = APIClient()
+    response = client.get(
+        "/api/v1/payments/transactions/export/",
+        {"created_before": (now - timedelta(days=30)).isoformat()},
+    )
+
+    [line] = content(response).splitlines()
+
+    assert json.loads(line)["id"] == str(processed_credit_transactions[0].id)
+
+
+@pytest.mark.django_db
+def test_export_payables_gzip(customer):
+    PayableFactory.create_batch(3, customer=customer)
+    PayableFactory(customer=customer, status=PayableStatus.PAID)
+    client = APIClient()
+    response = client.get(
+        "/api/v1/payments/payables/export/?status=waiting_funds", HTTP_ACCEPT_ENCODING="gzip"
+    )
+    lines = [json.loads(line) for line in gzip.decompress(content(response)).splitlines()]
+
+    assert response["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response["Vary"]
+    assert lines == [
+        PayableSerializer(payable).data
+        for payable in Payable.objects.filter(status=PayableStatus.WAITING_FUNDS).order_by("id")
+    ]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("query", ["output=xlsx", "created_after=yesterday"])
+def test_export_invalid_request(query):
+    client = APIClient()
+    response = client.get(f"/api/v1/payments/transactions/export/?{query}")
+
+    assert response.status_code == HTTP_400_BAD_REQUEST
@@ -0,0 +1,73 @@
+from decimal import Decimal
+
+import pytest
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import ModelSerializer
+from rest_framework.test import APIClient
+
+from payments.fastpath import FastJSONRenderer, FastSerializer
+from payments.models import Balance, Transaction
+from payments.serializers import BalanceSerializer, TransactionSerializer
+
+from .factories import TransactionFactory
+
+
+def both_paths(settings, url: str) -> tuple[bytes, bytes]:
+    client = APIClient()
+    settings.PAYMENTS_FAST_SERIALIZERS = False
+    slow = client.get(url)
+    settings.PAYMENTS_FAST_SERIALIZERS = True
+    fast = client.get(url)
+    return slow.content, fast.content
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("ordering", ["-created_at", "value"])
+def test_transactions_wire_format_is_identical(settings, ordering):
+    TransactionFactory(description="Gabigol no último minuto \U0001f534", value=Decimal("7"))
+    TransactionFactory(value=Decimal("1234567.5"), expected_fee=Decimal("0.1"))
+    TransactionFactory.create_batch(3)
+
+    url = f"/api/v1/payments/transactions/?ordering={ordering}&page_size=2"
+    while url:
+        slow, fast = both_paths(settings, url)
+        assert fast == slow
+        url = APIClient().get(url).data["next"]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("query", ["", "?page=1&page_size=2", "?active=true&search=a"])
+def test_customers_wire_format_is_identical(settings, individual_customers, query):
+    slow, fast = both_paths(settings, f"/api/v1/payments/customers/{query}")
+
+    assert fast == slow
+
+
+@pytest.mark.django_db
+def test_fast_serializer_matches_serializer_data(settings, processed_credit_transaction):
+    settings.TIME_ZONE = "America/Sao_Paulo"
+    fast = FastSerializer(TransactionSerializer)
+    rows = Transaction.objects.values_list(*fast.columns)
+
+    assert fast.serialize(rows) == [TransactionSerializer(processed_credit_transaction).data]
+
+
+def test_fast_serializer_needs_plain_columns():
+    with pytest.raises(ValueError, match="customer of BalanceSerializer is not a column"):
+        FastSerializer(BalanceSerializer)
+
+
+def test_fast_serializer_skips_write_only_fields():
+    class Serializer(ModelSerializer):
+        class Meta:
+            model = Balance
+            fields = ["id", "available"]
+            extra_kwargs = {"available": {"write_only": True}}
+
+    assert FastSerializer(Serializer).columns == ["id"]
+
+
+def test_fast_renderer_falls_back_on_unsupported_values():
+    data = {"value": Decimal("10.50"), "name": "Arrascaeta"}
+
+    assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from payments.locks import DatabaseLeaseLock
+from payments.models import SettlementLease
+
+
+@pytest.mark.django_db
+def test_database_lease_lock_acquire_and_contention():
+    lease = DatabaseLeaseLock("settlement", ttl=60)
+    other = DatabaseLeaseLock("settlement", ttl=60)
+
+    assert lease.acquire()
+    assert lease.acquire()
+    assert not other.acquire()
+    assert SettlementLease.objects.get(name="settlement").owner == lease.owner
+
+
+@pytest.mark.django_db
+def test_database_lease_lock_renew_and_release():
+    lease = DatabaseLeaseLock("settlement", ttl=60)
+    other = DatabaseLeaseLock("settlement", ttl=60)
+    lease.acquire()
+
+    assert lease.renew()
+    assert not other.renew()
+
+    lease.release()
+
+    assert not lease.renew()
+    assert other.acquire()
+
+
+@pytest.mark.django_db
+def test_database_lease_lock_expired_lease_is_taken_over():
+    lease = DatabaseLeaseLock("settlement", ttl=60)
+    other = DatabaseLeaseLock("settlement", ttl=60)
+    lease.acquire()
+    SettlementLease.objects.filter(name="settlement").update(
+        expires_at=timezone.now() - timedelta(seconds=1)
+    )
+
+    assert other.acquire()
+    assert not lease.renew()
+    assert SettlementLease.objects.get(name="settlement").owner == other.owner
@@ -0,0 +1,86 @@
+import json
+import logging
+
+import pytest
+from prometheus_client import REGISTRY
+
+from payments.log import JsonFormatter, QueuedHandler
+from payments.tracing import span
+
+
+def record(message: str, *args, **extra) -> logging.LogRecord:
+    return logging.makeLogRecord({
+        "name": "payments.tests",
+        "levelno": logging.INFO,
+        "levelname": "INFO",
+        "msg": message,
+        "args": args,
+        **extra,
+    })
+
+
+@pytest.fixture
+def queued_handler(tmp_path):
+    handler = QueuedHandler(filename=str(tmp_path / "general.log"), console=False, maxsize=2)
+    handler.setFormatter(JsonFormatter())
+    yield handler
+    handler.close()
+
+
+def written(tmp_path) -> list[dict]:
+    return [json.loads(line) for line in (tmp_path / "general.log").read_text().splitlines()]
+
+
+def test_json_formatter():
+    try:
+        raise ValueError("Vasco")
+    except ValueError as err:
+        exc_info = (type(err), err, None)
+    entry = json.loads(JsonFormatter().format(
+        record("[payments.tests] %s x %s", "Flamengo", 0, exc_info=exc_info, shard=3)
+    ))
+
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "payments.tests"
+    assert entry["message"] == "[payments.tests] Flamengo x 0"
+    assert entry["shard"] == 3  # noqa: PLR2004
+    assert "ValueError: Vasco" in entry["exception"]
+
+
+def test_queued_handler_writes_json_lines_off_thread(settings, tmp_path, queued_handler):
+    settings.PAYMENTS_TRACING_SAMPLE_RATE = 1.0
+    settings.PAYMENTS_TRACING_EXPORTER = "none"
+
+    with span("request") as current:
+        queued_handler.handle(record("[payments.tests] %s", "Mengão"))
+    queued_handler.close()
+
+    [entry] = written(tmp_path)
+
+    assert entry["message"] == "[payments.tests] Mengão"
+    assert entry["trace_id"] == current.trace_id
+
+
+def test_queued_handler_drops_and_reports_when_full(tmp_path, queued_handler):
+    dropped = REGISTRY.get_sample_value("payments_log_records_dropped_total")
+    queued_handler.listener.stop()
+
+    for index in range(5):
+        queued_handler.handle(record("[payments.tests] %s", index))
+
+    assert queued_handler.dropped == 3  # noqa: PLR2004
+    assert REGISTRY.get_sample_value("payments_log_records_dropped_total") == dropped + 3
+
+    queued_handler.listener.start()
+    queued_handler.queue.join()
+    queued_handler.handle(record("[payments.tests] %s", "after"))
+    queued_handler.close()
+
+    messages = [entry["message"] for entry in written(tmp_path)]
+
+    assert messages == [
+        "[payments.tests] 0",
+        "[payments.tests] 1",
+        "[payments.log] 3 log records dropped, logging queue was full",
+        "[payments.tests] after",
+    ]
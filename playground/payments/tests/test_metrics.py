@@ -0,0 +1,115 @@
+from unittest.mock import patch
+
+import pytest
+from prometheus_client import REGISTRY, CollectorRegistry
+
+from payments.enums import TransactionMethod, TransactionStatus
+from payments.metrics import registry
+from payments.services import PayableService, TransactionService
+from payments.tasks import settle_payables_shard
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.django_db
+def test_metrics_middleware_records_requests(client):
+    labels = {"view": "transactions", "method": "GET"}
+    requests = sample("payments_http_requests_total", status="200", **labels)
+    latencies = sample("payments_http_request_duration_seconds_count", **labels)
+    queries = sample("payments_http_request_queries_sum", view="transactions")
+
+    response = client.get("/api/v1/payments/transactions/")
+
+    assert response.status_code == 200  # noqa: PLR2004
+    assert sample("payments_http_requests_total", status="200", **labels) == requests + 1
+    assert sample("payments_http_request_duration_seconds_count", **labels) == latencies + 1
+    assert sample("payments_http_request_queries_sum", view="transactions") > queries
+
+
+@pytest.mark.django_db
+def test_metrics_middleware_disabled(settings, client):
+    settings.PAYMENTS_METRICS_ENABLED = False
+    labels = {"view": "transactions", "method": "GET", "status": "200"}
+    requests = sample("payments_http_requests_total", **labels)
+
+    client.get("/api/v1/payments/transactions/")
+
+    assert sample("payments_http_requests_total", **labels) == requests
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint(client):
+    client.get("/vasco-vai-rebaixar-mais-uma-vez/")
+
+    response = client.get("/metrics")
+    content = response.content.decode()
+
+    assert response.status_code == 200  # noqa: PLR2004
+    assert response["Content-Type"].startswith("text/plain")
+    assert "# TYPE payments_http_request_duration_seconds histogram" in content
+    assert 'payments_http_requests_total{method="GET",status="404",view="unresolved"}' in content
+
+
+@pytest.mark.django_db
+def test_transaction_outcomes_are_recorded(customer_with_balance):
+    method = TransactionMethod.DEBIT
+    processed_labels = {"method": method, "status": TransactionStatus.PROCESSED}
+    failed_labels = {"method": method, "status": TransactionStatus.FAILED}
+    processed = sample("payments_transactions_total", **processed_labels)
+    failed = sample("payments_transactions_total", **failed_labels)
+    item = {
+        "customer_id": customer_with_balance.id,
+        "value": 10.0,
+        "description": "Mengão do meu coração!",
+        "method": method,
+        "card_number": "Gerson",
+        "card_owner": "Pedro",
+        "card_expiration_year": "2028",
+        "card_verification_code": "123",
+    }
+    unknown = {**item, "customer_id": "d9d7729b-dd03-46fe-ae79-bf1c49428efe"}
+
+    TransactionService().process(item)
+    TransactionService().process_many([item, unknown])
+
+    assert sample("payments_transactions_total", **processed_labels) == processed + 2
+    assert sample("payments_transactions_total", **failed_labels) == failed + 1
+
+
+@pytest.mark.django_db
+def test_settlement_metrics(fixed_chunk_size, waiting_funds_payables):
+    settled = sample("payments_settlement_payables_total", outcome="settled")
+    failed = sample("payments_settlement_payables_total", outcome="failed")
+    errors = sample("payments_settlement_errors_total", reason="chunk")
+    chunks = sample("payments_settlement_chunk_duration_seconds_count")
+    settle_chunk = PayableService.settle_chunk
+    calls = []
+
+    def fail_first_chunk(self, payable_ids):
+        calls.append(payable_ids)
+        if len(calls) == 1:
+            raise Exception("Fluminense")
+        return settle_chunk(self, payable_ids)
+
+    with patch.object(PayableService, "settle_chunk", fail_first_chunk):
+        result = settle_payables_shard(0, 1)
+
+    assert sample("payments_settlement_payables_total", outcome="settled") == (
+        settled + result["settled"]
+    )
+    assert sample("payments_settlement_payables_total", outcome="failed") == (
+        failed + fixed_chunk_size
+    )
+    assert sample("payments_settlement_errors_total", reason="chunk") == errors + 1
+    assert sample("payments_settlement_chunk_duration_seconds_count") == chunks + len(calls)
+
+
+def test_registry_aggregates_processes_with_multiproc_dir(monkeypatch, tmp_path):
+    assert registry() is REGISTRY
+
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+
+    assert isinstance(registry(), CollectorRegistry)
+    assert registry() is not REGISTRY
@@ -0,0 +1,138 @@
+"""
+Plan regression suite: runs the SQL generated by endpoints and tasks through EXPLAIN
+with sequential scans and sorts disabled on the planner. Test tables are tiny, so a
+plain EXPLAIN would always pick a sequential scan; with them disabled the planner only
+falls back to one (or to a sort) when no index serves the query, which is what would
+happen on large tables.
+"""
+import json
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from payments.enums import SettlementMode
+from payments.models import (
+    Balance,
+    BalanceEntry,
+    BalanceHistory,
+    Customer,
+    Payable,
+    Transaction,
+)
+from payments.tasks import settle_payables_shard
+
+LARGE_TABLES = {
+    model._meta.db_table
+    for model in (Balance, BalanceEntry, BalanceHistory, Customer, Payable, Transaction)
+}
+SORT_NODES = {"Sort", "Incremental Sort"}
+EXPLAINED_STATEMENTS = ("SELECT", "UPDATE")
+
+
+def explain(sql: str) -> dict:
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        cursor.execute("SET LOCAL enable_sort = off")
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+        plan = cursor.fetchone()[0]
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+
+
+def plan_problems(plan: dict) -> list[str]:
+    problems = []
+    if plan["Node Type"] == "Seq Scan" and plan.get("Relation Name") in LARGE_TABLES:
+        problems.append(f"sequential scan on {plan['Relation Name']}")
+    if plan["Node Type"] in SORT_NODES:
+        problems.append(f"sort on {plan.get('Sort Key')}")
+    for child in plan.get("Plans", []):
+        problems.extend(plan_problems(child))
+    return problems
+
+
+def assert_indexed_plans(queries: list[dict]) -> None:
+    problems = []
+    for query in queries:
+        sql = query["sql"]
+        if not sql.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+            continue
+        problems.extend(f"{problem}: {sql}" for problem in plan_problems(explain(sql)))
+
+    assert not problems, "\n".join(problems)
+
+
+@pytest.fixture
+def seeded_data(
+    processed_credit_transactions,
+    processed_debit_transactions,
+    individual_customers,
+    corporate_customers,
+    waiting_funds_payables,
+):
+    return waiting_funds_payables[0].customer
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("url", [
+    "/api/v1/payments/transactions/",
+    "/api/v1/payments/transactions/?status=processed",
+    "/api/v1/payments/transactions/?method=credit_card",
+    "/api/v1/payments/transactions/?status=processed&method=debit_card",
+    "/api/v1/payments/transactions/?ordering=value",
+    "/api/v1/payments/transactions/?ordering=-value",
+    "/api/v1/payments/transactions/?ordering=created_at",
+    "/api/v1/payments/transactions/?page=1",
+    "/api/v1/payments/customers/",
+    "/api/v1/payments/customers/?type=individual",
+    "/api/v1/payments/customers/?active=true",
+    "/api/v1/payments/customers/?type=corporate&ordering=created_at",
+])
+def test_list_endpoint_plans(seeded_data, url):
+    client = APIClient()
+    first = client.get(f"{url}{'&' if '?' in url else '?'}page_size=2")
+    with CaptureQueriesContext(connection) as context:
+        next_url = first.data["next"]
+        client.get(next_url)
+
+    assert_indexed_plans(context.captured_queries)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("path", ["", "balance/"])
+def test_customer_endpoint_plans(seeded_data, path):
+    with CaptureQueriesContext(connection) as context:
+        APIClient().get(f"/api/v1/payments/customers/{seeded_data.id}/{path}")
+
+    assert_indexed_plans(context.captured_queries)
+
+
+@pytest.mark.django_db
+def test_process_transaction_plans(customer_with_balance):
+    request_data = {
+        "customer_id": customer_with_balance.id,
+        "value": 10.0,
+        "description": "Mengão campeão da América!",
+        "method": "credit_card",
+        "card_number": "Pedro",
+        "card_owner": "Giorgian De Arrascaeta",
+        "card_expiration_year": "2028",
+        "card_verification_code": "123",
+    }
+    with CaptureQueriesContext(connection) as context:
+        APIClient().post("/api/v1/payments/transactions/process/", data=request_data)
+
+    assert_indexed_plans(context.captured_queries)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("mode", [SettlementMode.SET, SettlementMode.ROW])
+def test_settlement_plans(settings, seeded_data, mode):
+    settings.PAYMENTS_SETTLEMENT_MODE = mode
+    settings.PAYMENTS_SETTLEMENT_SLOTS = 2
+
+    with CaptureQueriesContext(connection) as context:
+        settle_payables_shard(0, 1)
+        settle_payables_shard(0, 2, slot=1)
+
+    assert_indexed_plans(context.captured_queries)
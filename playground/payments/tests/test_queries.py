@@ -0,0 +1,141 @@
+import logging
+
+import pytest
+from django.test import Client
+
+from payments.exceptions import QueryBudgetExceededError
+from payments.middleware import QuerySampler
+from payments.models import Payable
+from payments.queries import QueryCollector, assert_query_budget, normalize_sql, query_budget
+
+
+@query_budget(1, "payables-transactions")
+def payables_transactions():
+    return [payable.transaction.value for payable in Payable.objects.all()]
+
+
+def test_normalize_sql():
+    first = normalize_sql(
+        'SELECT * FROM "payments_payable" WHERE "id" IN (\'a\'::uuid, \'b\'::uuid) '
+        "AND amount > 10.50  LIMIT 21"
+    )
+    second = normalize_sql(
+        'SELECT * FROM "payments_payable" WHERE "id" IN (%s, %s, %s) AND amount > %s LIMIT 1'
+    )
+
+    assert first == second
+    assert first == 'SELECT * FROM "payments_payable" WHERE "id" IN (...) AND amount > ? LIMIT ?'
+
+
+@pytest.mark.django_db
+def test_query_collector_reports_duplicated_shapes(waiting_funds_payables):
+    with QueryCollector() as collector:
+        payables_transactions.__wrapped__()
+
+    duplicates = collector.duplicates()
+
+    assert collector.count == len(waiting_funds_payables) + 1
+    assert list(duplicates.values()) == [len(waiting_funds_payables)]
+    assert '"payments_transaction"' in next(iter(duplicates))
+
+
+@pytest.mark.django_db
+def test_query_budget_raises(waiting_funds_payables):
+    with pytest.raises(QueryBudgetExceededError, match="payables-transactions executed 6"):
+        payables_transactions()
+
+
+@pytest.mark.django_db
+def test_query_budget_logs(settings, caplog, waiting_funds_payables):
+    settings.PAYMENTS_QUERY_BUDGET_MODE = "log"
+
+    with caplog.at_level(logging.WARNING):
+        payables_transactions()
+
+    assert "query budget exceeded: payables-transactions executed 6" in caplog.text
+    assert f"{len(waiting_funds_payables)}x SELECT" in caplog.text
+
+
+@pytest.mark.django_db
+def test_query_budget_off(settings, waiting_funds_payables):
+    settings.PAYMENTS_QUERY_BUDGET_MODE = "off"
+
+    assert len(payables_transactions()) == len(waiting_funds_payables)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("model", ["payable", "balance", "balanceentry"])
+def test_admin_changelist_has_no_n_plus_one(admin_client, waiting_funds_payables, model):
+    with assert_query_budget(budget=10, allow_duplicates=False):
+        response = admin_client.get(f"/admin/payments/{model}/")
+
+    assert response.status_code == 200  # noqa: PLR2004
+
+
+@pytest.fixture
+def query_sampler(settings):
+    settings.PAYMENTS_QUERY_SAMPLER_ENABLED = True
+    settings.PAYMENTS_QUERY_SAMPLER_LATENCY_MS = 10_000
+    settings.PAYMENTS_QUERY_SAMPLER_MAX_QUERIES = 1
+    QuerySampler.clear()
+    yield settings
+    QuerySampler.clear()
+
+
+@pytest.mark.django_db
+def test_query_sampler_samples_requests_over_max_queries(caplog, query_sampler, customer):
+    with caplog.at_level(logging.WARNING):
+        response = Client().delete(f"/api/v1/payments/customers/{customer.id}/")
+
+    [sample] = QuerySampler.samples()
+
+    assert sample["view"].endswith("customer-details")
+    assert sample["method"] == "DELETE"
+    assert sample["status"] == response.status_code
+    assert sample["queries"] > query_sampler.PAYMENTS_QUERY_SAMPLER_MAX_QUERIES
+    assert sample["slowest"]
+    assert "sampled request: view - " in caplog.text
+    assert "customer-details" in caplog.text
+
+
+@pytest.mark.django_db
+def test_query_sampler_samples_slow_requests(query_sampler):
+    query_sampler.PAYMENTS_QUERY_SAMPLER_LATENCY_MS = 0
+    query_sampler.PAYMENTS_QUERY_SAMPLER_MAX_QUERIES = 1_000
+
+    Client().get("/ping/")
+
+    [sample] = QuerySampler.samples()
+
+    assert sample["queries"] == 0
+    assert sample["path"] == "/ping/"
+
+
+@pytest.mark.django_db
+def test_query_sampler_skips_requests_under_thresholds(query_sampler):
+    query_sampler.PAYMENTS_QUERY_SAMPLER_MAX_QUERIES = 1_000
+
+    Client().get("/api/v1/payments/transactions/")
+
+    assert QuerySampler.samples() == []
+
+
+@pytest.mark.django_db
+def test_query_sampler_disabled(query_sampler):
+    query_sampler.PAYMENTS_QUERY_SAMPLER_ENABLED = False
+    query_sampler.PAYMENTS_QUERY_SAMPLER_LATENCY_MS = 0
+
+    Client().get("/ping/")
+
+    assert QuerySampler.samples() == []
+
+
+@pytest.mark.django_db
+def test_query_sampler_keeps_the_last_samples(query_sampler):
+    query_sampler.PAYMENTS_QUERY_SAMPLER_LATENCY_MS = 0
+    query_sampler.PAYMENTS_QUERY_SAMPLER_SIZE = 2
+
+    for path in ["/ping/", "/ping/?n=1", "/ping/?n=2"]:
+        Client().get(path)
+
+    assert len(QuerySampler.samples()) == query_sampler.PAYMENTS_QUERY_SAMPLER_SIZE
@@ -1,13 +1,29 @@
+from datetime import timedelta
 from decimal import Decimal
+from threading import Thread
 from unittest.mock import patch
 
 import pytest
+from django.db import InternalError, connection
+from django.db.transaction import atomic
+from django.utils import timezone
 
 from payments.enums import ExpectedFees, PayableStatus, TransactionStatus
-from payments.exceptions import TransactionFailedError
+from payments.exceptions import BalanceEntryImmutableError, TransactionFailedError
 from payments.factory import CreditCardTransaction, DebitCardTransaction
-from payments.models import Balance, Payable, Transaction, TransactionMethod
-from payments.services import PayableService, TransactionService
+from payments.models import (
+    Balance,
+    BalanceEntry,
+    BalanceHistory,
+    Payable,
+    Transaction,
+    TransactionMethod,
+)
+from payments.posting import BalancePosting, BalancePostingService
+from payments.services import PayableService, SettlementRunService, TransactionService
+from payments.striping import BalanceStripingService, get_customer_balance
+
+from .factories import BalanceFactory, PayableFactory
 
 
 @pytest.mark.django_db
@@ -145,13 +161,344 @@ def test_apply_waiting_funds_payable_customer_balance(
     balance = Balance.objects.get(customer=customer)
 
     expected_available = 1050.00
-    expected_balance_history_count = 5
+    expected_balance_history_count = 1
+    expected_balance_entries_count = 10
 
     assert balance.available == pytest.approx(expected_available)
     assert balance.waiting_funds == pytest.approx(0)
+    assert balance.version == waiting_funds_payables_quantity
     assert balance.balance_historic.count() == expected_balance_history_count
+    assert balance.entries.count() == expected_balance_entries_count
 
     for payable in payables:
         assert payable.status == PayableStatus.PAID
 
 
+
+
+@pytest.mark.django_db
+def test_process_many_transactions(customer_with_balance):
+    unknown_customer_id = "d9d7729b-dd03-46fe-ae79-bf1c49428efe"
+    items = [
+        {
+            "customer_id": customer_id,
+            "value": 10.0,
+            "description": "Mengão do meu coração!",
+            "method": method,
+            "card_number": "Gerson",
+            "card_owner": "Pedro",
+            "card_expiration_year": "2028",
+            "card_verification_code": "123",
+        }
+        for customer_id, method in [
+            (str(customer_with_balance.id), TransactionMethod.CREDIT),
+            (unknown_customer_id, TransactionMethod.CREDIT),
+            (str(customer_with_balance.id), TransactionMethod.DEBIT),
+            ("not-an-uuid", TransactionMethod.DEBIT),
+        ]
+    ]
+
+    service = TransactionService()
+    result = service.process_many(items)
+
+    balance = Balance.objects.get(customer=customer_with_balance)
+    payables = customer_with_balance.payable_set.all()
+    expected_processed_count = 2
+
+    assert [r["status"] for r in result] == [
+        TransactionStatus.PROCESSED,
+        TransactionStatus.FAILED,
+        TransactionStatus.PROCESSED,
+        TransactionStatus.FAILED,
+    ]
+    assert [r["customer_id"] for r in result] == [item["customer_id"] for item in items]
+    assert payables.count() == expected_processed_count
+    assert Transaction.objects.filter(
+        status=TransactionStatus.PROCESSED
+    ).count() == expected_processed_count
+    assert float(balance.waiting_funds) == pytest.approx(9.50)
+    assert float(balance.available) == pytest.approx(1009.70)
+    assert balance.balance_historic.count() == 1
+    assert balance.entries.count() == expected_processed_count
+    assert set(balance.entries.values_list("payable_id", flat=True)) == set(
+        payables.values_list("id", flat=True)
+    )
+
+
+@pytest.mark.django_db
+def test_process_many_transactions_failure(customer_with_balance):
+    service = TransactionService()
+    with patch.object(
+        TransactionService,
+        "_apply_payables_on_balances",
+        side_effect=Exception("Cheirinho")
+    ):
+        result = service.process_many([{
+            "customer_id": str(customer_with_balance.id),
+            "value": 10.0,
+            "description": "Cheirinho de hepta",
+            "method": TransactionMethod.CREDIT,
+            "card_number": "Everton Ribeiro",
+            "card_owner": "Diego Alves",
+            "card_expiration_year": "2028",
+            "card_verification_code": "123",
+        }])
+
+    balance = Balance.objects.get(customer=customer_with_balance)
+
+    assert result[0]["status"] == TransactionStatus.FAILED
+    assert Transaction.objects.get().status == TransactionStatus.FAILED
+    assert not Payable.objects.exists()
+    assert float(balance.waiting_funds) == pytest.approx(0.00)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_postings_on_same_balance(balance):
+    workers = 8
+    postings_per_worker = 10
+
+    def post_many():
+        try:
+            for _ in range(postings_per_worker):
+                BalancePostingService().post([
+                    BalancePosting(balance_id=balance.id, available=Decimal("1.00"))
+                ])
+        finally:
+            connection.close()
+
+    threads = [Thread(target=post_many) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    balance.refresh_from_db()
+    expected_available = 1000.00 + workers * postings_per_worker
+
+    assert float(balance.available) == pytest.approx(expected_available)
+    assert balance.version == workers * postings_per_worker
+    assert balance.entries.count() == workers * postings_per_worker
+    assert BalancePostingService().replay(balance.id)["available"] == balance.available
+
+
+@pytest.mark.django_db
+def test_postings_on_many_balances_return_new_values():
+    first, second = BalanceFactory.create_batch(2)
+
+    result = BalancePostingService().post([
+        BalancePosting(balance_id=first.id, waiting_funds=Decimal("10.00")),
+        BalancePosting(balance_id=second.id, available=Decimal("-5.50")),
+        BalancePosting(balance_id=first.id, available=Decimal("2.25")),
+    ])
+
+    first.refresh_from_db()
+    second.refresh_from_db()
+
+    assert result[first.id]["available"] == first.available
+    assert result[first.id]["waiting_funds"] == first.waiting_funds
+    assert result[second.id]["available"] == second.available
+    assert float(first.available) == pytest.approx(1002.25)
+    assert float(first.waiting_funds) == pytest.approx(10.00)
+    assert float(second.available) == pytest.approx(994.50)
+
+
+@pytest.mark.django_db
+def test_postings_write_checkpoints_on_snapshot_interval(balance):
+    snapshot_interval = 3
+    postings = 7
+    service = BalancePostingService(snapshot_interval=snapshot_interval)
+
+    for _ in range(postings):
+        service.post([BalancePosting(balance_id=balance.id, available=Decimal("10.00"))])
+
+    balance.refresh_from_db()
+
+    assert list(balance.balance_historic.order_by("version").values_list(
+        "version", flat=True
+    )) == [0, 3, 6]
+    assert service.replay(balance.id) == {
+        "available": balance.available, "waiting_funds": balance.waiting_funds
+    }
+    assert service.replay(balance.id, version=4)["available"] == Decimal("1040.00")
+    assert service.replay(balance.id, version=0)["available"] == Decimal("1000.00")
+
+
+@pytest.mark.django_db
+def test_balance_entries_are_append_only(balance):
+    BalancePostingService().post([BalancePosting(balance_id=balance.id, available=Decimal("1"))])
+    entry = BalanceEntry.objects.get(balance=balance)
+
+    entry.amount = Decimal("1000000")
+    with pytest.raises(BalanceEntryImmutableError):
+        entry.save()
+    with pytest.raises(BalanceEntryImmutableError):
+        entry.delete()
+    with pytest.raises(InternalError), atomic():
+        BalanceEntry.objects.filter(id=entry.id).update(amount=Decimal("1000000"))
+    with pytest.raises(InternalError), atomic():
+        BalanceEntry.objects.filter(id=entry.id).update(balance=BalanceFactory.create())
+    with pytest.raises(InternalError), atomic():
+        BalanceEntry.objects.filter(id=entry.id).delete()
+    assert BalanceEntry.objects.get(id=entry.id).amount == Decimal("1")
+    assert BalanceEntry.objects.get(id=entry.id).balance_id == balance.id
+
+
+@pytest.mark.django_db
+def test_balance_entries_are_read_only_on_admin(admin_client):
+    response = admin_client.get("/admin/payments/balanceentry/add/")
+
+    assert response.status_code == 403  # noqa: PLR2004
+
+
+@pytest.mark.django_db
+def test_replay_picks_latest_checkpoint_of_a_version(balance):
+    service = BalancePostingService()
+    service.post([BalancePosting(balance_id=balance.id, available=Decimal("10"))])
+    # A history row from before the ledger, also migrated as version 0
+    legacy = BalanceHistory.objects.create(balance=balance, version=0, available=Decimal("1"))
+    BalanceHistory.objects.filter(id=legacy.id).update(
+        created_at=timezone.now() - timedelta(days=1)
+    )
+
+    balance.refresh_from_db()
+
+    assert service.replay(balance.id)["available"] == balance.available
+
+
+@pytest.mark.django_db
+def test_process_transactions_on_striped_balance(customer_with_balance):
+    slots = 4
+    transactions_quantity = 12
+    BalanceStripingService().promote(customer_with_balance.id, slots)
+
+    service = TransactionService()
+    for _ in range(transactions_quantity):
+        service.process({
+            "customer_id": customer_with_balance.id,
+            "value": 10.0,
+            "description": "Vamos Flamengo! Vamos ser campeão!",
+            "method": TransactionMethod.DEBIT,
+            "card_number": "Juan",
+            "card_owner": "Adriano",
+            "card_expiration_year": "2028",
+            "card_verification_code": "123",
+        })
+
+    balance = get_customer_balance(customer_with_balance.id)
+    slot_postings = Balance.objects.filter(customer=customer_with_balance, version__gt=0)
+
+    assert Balance.objects.filter(customer=customer_with_balance).count() == slots
+    assert slot_postings.count() > 1
+    assert float(balance.available) == pytest.approx(1000.00 + 9.70 * transactions_quantity)
+
+
+@pytest.mark.django_db
+def test_demote_striped_balance(customer_with_balance):
+    service = BalanceStripingService()
+    service.promote(customer_with_balance.id, 3)
+    slot = Balance.objects.get(customer=customer_with_balance, slot=2)
+    BalancePostingService().post([
+        BalancePosting(balance_id=slot.id, available=Decimal("15.00"), waiting_funds=Decimal("5"))
+    ])
+
+    customer = service.demote(customer_with_balance.id)
+    primary = Balance.objects.get(customer=customer_with_balance, slot=0)
+    slot.refresh_from_db()
+
+    assert customer.balance_slots == 1
+    assert primary.available == Decimal("1015.00")
+    assert primary.waiting_funds == Decimal("5.00")
+    assert slot.available == Decimal("0.00")
+    assert get_customer_balance(customer_with_balance.id).available == Decimal("1015.00")
+
+
+@pytest.mark.django_db
+def test_settle_payables(
+    waiting_funds_payables_quantity, waiting_funds_payables, paid_payables
+):
+    other_customer_payables = PayableFactory.create_batch(
+        3, customer=BalanceFactory.create(waiting_funds=30.00).customer
+    )
+    service = PayableService()
+    run_service = SettlementRunService()
+    run = run_service.start(0, 1, service.get_settlement_window(catch_up=False))
+
+    for payable_ids, last_key in service.iter_payable_chunks(service.get_today_payables(), 2):
+        run_service.settle_chunk(run, payable_ids, last_key)
+
+    balance = Balance.objects.get(customer=waiting_funds_payables[0].customer)
+    other_balance = Balance.objects.get(customer=other_customer_payables[0].customer)
+
+    assert run.settled_count == waiting_funds_payables_quantity + len(other_customer_payables)
+    assert run.failed_count == 0
+    assert not Payable.objects.filter(status=PayableStatus.WAITING_FUNDS).exists()
+    assert balance.available == pytest.approx(1050.00)
+    assert balance.waiting_funds == pytest.approx(0)
+    assert other_balance.available == pytest.approx(1030.00)
+    assert other_balance.waiting_funds == pytest.approx(0)
+    assert BalancePostingService().replay(balance.id)["available"] == balance.available
+
+
+@pytest.mark.django_db
+def test_settle_chunk_posts_ledger_entries_per_payable(waiting_funds_payables):
+    PayableService().settle_chunk([payable.id for payable in waiting_funds_payables])
+
+    entries = {
+        (entry.payable_id, entry.transaction_id, entry.bucket): entry.amount
+        for entry in BalanceEntry.objects.all()
+    }
+
+    assert len(entries) == len(waiting_funds_payables) * 2
+    for payable in Payable.objects.filter(id__in=[p.id for p in waiting_funds_payables]):
+        assert entries[(payable.id, payable.transaction_id, "available")] == payable.amount
+        assert entries[(payable.id, payable.transaction_id, "waiting_funds")] == -payable.amount
+
+
+@pytest.mark.django_db
+def test_settle_chunk_fails_without_customer_balance(waiting_funds_payables, customer):
+    unposted = PayableFactory.create(customer=customer)
+    service = PayableService()
+    run_service = SettlementRunService()
+    run = run_service.start(0, 1, service.get_settlement_window(catch_up=False))
+
+    for payable_ids, last_key in service.iter_payable_chunks(service.get_today_payables(), 10):
+        run_service.settle_chunk(run, payable_ids, last_key)
+
+    unposted.refresh_from_db()
+
+    assert run.settled_count == 0
+    assert run.failed_count == len(waiting_funds_payables) + 1
+    assert unposted.status == PayableStatus.WAITING_FUNDS
+    assert not BalanceEntry.objects.filter(payable=unposted).exists()
+    assert str(unposted.id) in run.errors.get().message
+
+
+@pytest.mark.django_db
+def test_iter_payable_chunks(waiting_funds_payables_quantity, waiting_funds_payables):
+    service = PayableService()
+    payables = service.get_today_payables()
+
+    chunks = list(service.iter_payable_chunks(payables, chunk_size=2))
+    resumed = list(service.iter_payable_chunks(payables, chunk_size=2, after=chunks[0][1]))
+
+    streamed_ids = [payable_id for ids, _ in chunks for payable_id in ids]
+    expected_chunks = 3
+
+    assert len(chunks) == expected_chunks
+    assert sorted(streamed_ids) == sorted(p.id for p in waiting_funds_payables)
+    assert len(set(streamed_ids)) == waiting_funds_payables_quantity
+    assert [ids for ids, _ in resumed] == [ids for ids, _ in chunks[1:]]
+
+
+@pytest.mark.django_db
+def test_get_due_payables(customer_with_balance):
+    now = timezone.now()
+    overdue = PayableFactory.create(
+        customer=customer_with_balance, payment_date=now - timedelta(days=3)
+    )
+    due_today = PayableFactory.create(customer=customer_with_balance, payment_date=now)
+    PayableFactory.create(customer=customer_with_balance, payment_date=now + timedelta(days=30))
+    service = PayableService()
+
+    assert set(service.get_due_payables()) == {overdue, due_today}
+    assert set(service.get_today_payables()) == {due_today}
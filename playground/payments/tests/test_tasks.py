@@ -0,0 +1,331 @@
+from datetime import time, timedelta
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+from django.db import OperationalError
+from django.utils import timezone
+
+from payments.enums import PayableStatus, SettlementMode, SettlementRunStatus
+from payments.exceptions import LeaseLostError
+from payments.locks import DatabaseLeaseLock
+from payments.models import (
+    Balance,
+    Customer,
+    Payable,
+    SettlementLease,
+    SettlementRun,
+    SettlementRunError,
+)
+from payments.scheduling import SettlementSchedule
+from payments.services import PayableService, SettlementRunService
+from payments.tasks import (
+    SETTLEMENT_LOCK,
+    pay_daily_payables,
+    settle_payables_shard,
+    summarize_settlement,
+)
+
+from .factories import BalanceFactory, PayableFactory
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("mode", [SettlementMode.SET, SettlementMode.ROW])
+def test_pay_daily_payables(
+    celery_eager,
+    settings,
+    mode,
+    waiting_funds_payables,
+    inactive_customer_waiting_funds_payables
+):
+    settings.PAYMENTS_SETTLEMENT_MODE = mode
+
+    pay_daily_payables.delay()
+
+    balance = Balance.objects.get(customer=waiting_funds_payables[0].customer)
+
+    assert not Payable.objects.filter(
+        customer=waiting_funds_payables[0].customer, status=PayableStatus.WAITING_FUNDS
+    ).exists()
+    assert Payable.objects.filter(
+        customer=inactive_customer_waiting_funds_payables[0].customer,
+        status=PayableStatus.WAITING_FUNDS
+    ).count() == len(inactive_customer_waiting_funds_payables)
+    assert balance.available == pytest.approx(1050.00)
+    assert balance.waiting_funds == pytest.approx(0)
+
+
+@pytest.mark.django_db
+def test_settle_payables_shards_own_their_customers(individual_customers):
+    shards = 3
+    for customer in individual_customers:
+        BalanceFactory.create(customer=customer)
+        PayableFactory.create_batch(2, customer=customer)
+
+    service = PayableService()
+    customers_by_shard = [
+        set(service.filter_shard(
+            service.get_today_payables(), shard, shards
+        ).values_list("customer_id", flat=True))
+        for shard in range(shards)
+    ]
+    results = [settle_payables_shard(shard, shards) for shard in range(shards)]
+
+    assert sum(len(customers) for customers in customers_by_shard) == len(individual_customers)
+    assert set().union(*customers_by_shard) == {c.id for c in individual_customers}
+    assert sum(result["settled"] for result in results) == len(individual_customers) * 2
+    assert not Payable.objects.filter(status=PayableStatus.WAITING_FUNDS).exists()
+
+
+def test_summarize_settlement():
+    summary = summarize_settlement([
+        {
+            "shard": 0,
+            "total": 10,
+            "settled": 10,
+            "failed": 0,
+            "duration": 2.0,
+            "latency": 0.2,
+            "throttled": 0.5,
+            "errors": [],
+        },
+        {
+            "shard": 1,
+            "total": 6,
+            "settled": 5,
+            "failed": 1,
+            "duration": 3.0,
+            "latency": 0.4,
+            "throttled": 1.0,
+            "errors": ["payable: Vasco"],
+        },
+    ])
+
+    assert summary == {
+        "slot": None,
+        "shards": 2,
+        "total": 16,
+        "settled": 15,
+        "failed": 1,
+        "duration": 3.0,
+        "latency": 0.4,
+        "throttled": 1.5,
+        "throughput": 5.0,
+        "errors": ["payable: Vasco"],
+    }
+
+
+@pytest.mark.django_db
+def test_settle_payables_shard_keeps_going_after_failed_chunk(
+    fixed_chunk_size, waiting_funds_payables
+):
+    settle_chunk = PayableService.settle_chunk
+    calls = []
+
+    def fail_first_chunk(self, payable_ids):
+        calls.append(payable_ids)
+        if len(calls) == 1:
+            raise Exception("Fluminense")
+        return settle_chunk(self, payable_ids)
+
+    with patch.object(PayableService, "settle_chunk", fail_first_chunk):
+        result = settle_payables_shard(0, 1)
+
+    assert result["total"] == len(waiting_funds_payables)
+    assert result["failed"] == fixed_chunk_size
+    assert result["settled"] == len(waiting_funds_payables) - result["failed"]
+    assert result["errors"] == ["Fluminense"]
+    assert SettlementRunError.objects.get().message == "Fluminense"
+
+
+@pytest.mark.django_db
+def test_settle_payables_shard_resumes_unfinished_run(fixed_chunk_size, waiting_funds_payables):
+    settle_chunk = PayableService.settle_chunk
+    calls = []
+
+    def crash_on_second_chunk(self, payable_ids):
+        calls.append(payable_ids)
+        if len(calls) == 2:  # noqa: PLR2004
+            raise SystemExit("worker lost")
+        return settle_chunk(self, payable_ids)
+
+    with (
+        patch.object(PayableService, "settle_chunk", crash_on_second_chunk),
+        pytest.raises(SystemExit),
+    ):
+        settle_payables_shard(0, 1)
+
+    crashed_run = SettlementRun.objects.get()
+
+    assert crashed_run.status == SettlementRunStatus.RUNNING
+    assert crashed_run.settled_count == fixed_chunk_size
+    assert crashed_run.last_payable_id == calls[0][-1]
+
+    result = settle_payables_shard(0, 1)
+    run = SettlementRun.objects.get()
+
+    assert result["run_id"] == str(crashed_run.id)
+    assert run.status == SettlementRunStatus.FINISHED
+    assert run.total_count == len(waiting_funds_payables)
+    assert run.settled_count == len(waiting_funds_payables)
+    assert run.throughput > 0
+    assert not Payable.objects.filter(status=PayableStatus.WAITING_FUNDS).exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(("catch_up", "expected_settled"), [(True, 2), (False, 1)])
+def test_settle_payables_shard_due_date(
+    settings, customer_with_balance, catch_up, expected_settled
+):
+    settings.PAYMENTS_SETTLEMENT_CATCH_UP = catch_up
+    now = timezone.now()
+    PayableFactory.create(customer=customer_with_balance, payment_date=now - timedelta(days=3))
+    PayableFactory.create(customer=customer_with_balance, payment_date=now)
+    not_due = PayableFactory.create(
+        customer=customer_with_balance, payment_date=now + timedelta(days=30)
+    )
+
+    result = settle_payables_shard(0, 1)
+    not_due.refresh_from_db()
+
+    assert result["settled"] == expected_settled
+    assert not_due.status == PayableStatus.WAITING_FUNDS
+
+
+@pytest.mark.django_db
+def test_settle_payables_shard_drains_backlog_in_bounded_runs(
+    settings, fixed_chunk_size, waiting_funds_payables
+):
+    settings.PAYMENTS_SETTLEMENT_MAX_CHUNKS = 1
+
+    results = [settle_payables_shard(0, 1) for _ in range(3)]
+    run = SettlementRun.objects.get()
+
+    assert [result["settled"] for result in results] == [2, 4, 5]
+    assert run.status == SettlementRunStatus.FINISHED
+    assert not Payable.objects.filter(status=PayableStatus.WAITING_FUNDS).exists()
+
+
+@pytest.mark.django_db
+def test_pay_daily_payables_skips_while_lease_is_held(celery_eager, waiting_funds_payables):
+    DatabaseLeaseLock(SETTLEMENT_LOCK).acquire()
+
+    assert pay_daily_payables.delay().get() is None
+    assert not SettlementRun.objects.exists()
+    assert Payable.objects.filter(status=PayableStatus.WAITING_FUNDS).count() == len(
+        waiting_funds_payables
+    )
+
+
+@pytest.mark.django_db
+def test_pay_daily_payables_releases_lease(celery_eager, waiting_funds_payables):
+    pay_daily_payables.delay()
+
+    assert SettlementLease.objects.get(name=SETTLEMENT_LOCK).expires_at <= timezone.now()
+    assert DatabaseLeaseLock(SETTLEMENT_LOCK).acquire()
+
+
+@pytest.mark.django_db
+def test_settle_payables_shard_stops_when_lease_is_lost(fixed_chunk_size, waiting_funds_payables):
+    DatabaseLeaseLock(SETTLEMENT_LOCK).acquire()
+
+    with pytest.raises(LeaseLostError):
+        settle_payables_shard(0, 1, "lost-owner")
+
+    run = SettlementRun.objects.get()
+    assert run.status == SettlementRunStatus.RUNNING
+    assert run.settled_count == fixed_chunk_size
+
+
+@pytest.mark.django_db
+def test_apply_waiting_funds_payable_skips_paid_payable(waiting_funds_payables):
+    payable = waiting_funds_payables[0]
+    Payable.objects.filter(id=payable.id).update(status=PayableStatus.PAID)
+
+    assert not PayableService().apply_waiting_funds_payable(payable)
+    assert not payable.entries.exists()
+
+
+def test_settlement_schedule_spreads_slots_over_window():
+    schedule = SettlementSchedule("02:00", "07:00", 10)
+    beat = schedule.beat_schedule()
+
+    assert schedule.slot_length == timedelta(minutes=30)
+    assert [schedule.slot_start(slot) for slot in (0, 1, 9)] == [
+        time(2, 0), time(2, 30), time(6, 30)
+    ]
+    assert len(beat) == schedule.slots
+    assert beat["pay_daily_payables_slot_3"]["args"] == (3,)
+    assert SettlementSchedule("22:00", "02:00", 4).slot_start(3) == time(1, 0)
+
+
+@pytest.mark.django_db
+def test_settle_payables_by_settlement_slot(settings, individual_customers):
+    settings.PAYMENTS_SETTLEMENT_SLOTS = 3
+    for customer in individual_customers:
+        BalanceFactory.create(customer=customer)
+        PayableFactory.create_batch(2, customer=customer)
+    pinned = individual_customers[0]
+    Customer.objects.filter(id=pinned.id).update(settlement_slot=2)
+
+    schedule = SettlementSchedule.from_settings()
+    service = PayableService()
+    customers_by_slot = [
+        set(schedule.filter_slot(
+            service.get_due_payables(), slot
+        ).values_list("customer_id", flat=True))
+        for slot in range(schedule.slots)
+    ]
+    first = settle_payables_shard(0, 1, slot=0)
+
+    assert pinned.id in customers_by_slot[2]
+    assert set().union(*customers_by_slot) == {c.id for c in individual_customers}
+    assert sum(len(customers) for customers in customers_by_slot) == len(individual_customers)
+    assert first["slot"] == 0
+    assert first["settled"] == len(customers_by_slot[0]) * 2
+    assert set(Payable.objects.filter(
+        status=PayableStatus.WAITING_FUNDS
+    ).values_list("customer_id", flat=True)) == customers_by_slot[1] | customers_by_slot[2]
+
+
+@pytest.mark.django_db
+def test_settlement_schedule_command(settings, capsys, waiting_funds_payables):
+    settings.PAYMENTS_SETTLEMENT_SLOTS = 5
+    customer = waiting_funds_payables[0].customer
+    Customer.objects.filter(id=customer.id).update(settlement_slot=3)
+
+    call_command("settlement_schedule")
+    output = capsys.readouterr().out
+
+    assert "Settlement window 02:00-07:00 in 5 slots of 1:00:00" in output
+    assert (
+        f"slot 3 | starts at 05:00 | customers - 1 | due payables - {len(waiting_funds_payables)}"
+        in output
+    )
+
+
+@pytest.mark.django_db
+def test_pay_daily_payables_releases_lease_when_a_shard_fails(
+    celery_eager, settings, fixed_chunk_size, waiting_funds_payables
+):
+    settings.PAYMENTS_SETTLEMENT_SHARDS = 1
+    # Errbacks only run when failures are not propagated, as on a worker
+    celery_eager.conf.task_eager_propagates = False
+
+    with patch.object(
+        SettlementRunService, "save_throttle", side_effect=OperationalError("Botafogo")
+    ):
+        assert pay_daily_payables.delay().failed()
+
+    failed_run = SettlementRun.objects.get()
+
+    assert failed_run.status == SettlementRunStatus.FAILED
+    assert failed_run.settled_count == fixed_chunk_size
+    assert SettlementRunError.objects.get(run=failed_run).message == "OperationalError: Botafogo"
+    assert DatabaseLeaseLock(SETTLEMENT_LOCK).acquire()
+
+    result = settle_payables_shard(0, 1)
+
+    assert result["run_id"] == str(failed_run.id)
+    assert result["settled"] == len(waiting_funds_payables)
+    assert SettlementRun.objects.get().status == SettlementRunStatus.FINISHED
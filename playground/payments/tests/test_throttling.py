@@ -0,0 +1,101 @@
+import pytest
+from prometheus_client import REGISTRY
+
+from payments.enums import SettlementRunStatus
+from payments.services import SettlementRunService
+from payments.tasks import settle_payables_shard
+from payments.tests.factories import PayableFactory
+from payments.throttling import AdaptiveThrottle, pick_concurrency
+
+FAST = 0.1
+SLOW = 2.0
+
+
+@pytest.fixture
+def throttle_settings(settings):
+    settings.PAYMENTS_SETTLEMENT_CHUNK_SIZE = 400
+    settings.PAYMENTS_SETTLEMENT_MIN_CHUNK_SIZE = 100
+    settings.PAYMENTS_SETTLEMENT_MAX_CHUNK_SIZE = 600
+    settings.PAYMENTS_SETTLEMENT_TARGET_LATENCY = 0.5
+    return settings
+
+
+def test_adaptive_throttle_aimd(throttle_settings):
+    step = throttle_settings.PAYMENTS_SETTLEMENT_MIN_CHUNK_SIZE
+    max_chunk_size = throttle_settings.PAYMENTS_SETTLEMENT_MAX_CHUNK_SIZE
+    throttle = AdaptiveThrottle()
+
+    throttle.observe(throttle.chunk_size, FAST)
+    assert throttle.chunk_size == throttle_settings.PAYMENTS_SETTLEMENT_CHUNK_SIZE + step
+    throttle.observe(throttle.chunk_size, FAST)
+    throttle.observe(throttle.chunk_size, FAST)
+    assert throttle.chunk_size == max_chunk_size
+    throttle.observe(throttle.chunk_size, SLOW)
+    assert throttle.chunk_size == max_chunk_size // 2
+    throttle.observe(throttle.chunk_size, SLOW)
+    throttle.observe(throttle.chunk_size, SLOW)
+    assert throttle.chunk_size == throttle_settings.PAYMENTS_SETTLEMENT_MIN_CHUNK_SIZE
+    assert FAST < throttle.latency < SLOW
+
+
+def test_adaptive_throttle_paces_under_max_rate(throttle_settings):
+    waits = []
+    max_rate = 1000
+    throttle = AdaptiveThrottle(max_rate=max_rate, sleep=waits.append)
+
+    throttle.observe(throttle_settings.PAYMENTS_SETTLEMENT_CHUNK_SIZE, FAST)
+    throttle.observe(throttle_settings.PAYMENTS_SETTLEMENT_MIN_CHUNK_SIZE, FAST)
+
+    expected_wait = throttle_settings.PAYMENTS_SETTLEMENT_CHUNK_SIZE / max_rate - FAST
+    assert waits == [pytest.approx(expected_wait)]
+    assert throttle.throttled == pytest.approx(expected_wait)
+
+
+def test_adaptive_throttle_exports_metrics(throttle_settings):
+    throttled = REGISTRY.get_sample_value("payments_settlement_throttled_seconds_total")
+    throttle = AdaptiveThrottle(max_rate=1000, sleep=lambda wait: None)
+
+    throttle.observe(throttle_settings.PAYMENTS_SETTLEMENT_CHUNK_SIZE, FAST)
+
+    assert REGISTRY.get_sample_value("payments_settlement_chunk_size") == throttle.chunk_size
+    assert REGISTRY.get_sample_value("payments_settlement_latency_seconds") == FAST
+    assert REGISTRY.get_sample_value(
+        "payments_settlement_throttled_seconds_total"
+    ) == pytest.approx(throttled + throttle.throttled)
+
+
+@pytest.mark.parametrize(
+    "shards, latency, expected",
+    [(4, None, 8), (4, FAST, 5), (8, FAST, 8), (4, SLOW, 2), (1, SLOW, 1)],
+)
+def test_pick_concurrency(shards, latency, expected):
+    assert pick_concurrency(shards, latency, max_shards=8, target=0.5) == expected
+
+
+@pytest.mark.django_db
+def test_settle_payables_shard_keeps_throttle_state(throttle_settings, waiting_funds_payables):
+    extra_payables = 10
+    throttle_settings.PAYMENTS_SETTLEMENT_SHARDS = 1
+    PayableFactory.create_batch(extra_payables, customer=waiting_funds_payables[0].customer)
+
+    result = settle_payables_shard(0, 1)
+
+    assert result["settled"] == len(waiting_funds_payables) + extra_payables
+    assert result["chunk_size"] == (
+        throttle_settings.PAYMENTS_SETTLEMENT_CHUNK_SIZE
+        + throttle_settings.PAYMENTS_SETTLEMENT_MIN_CHUNK_SIZE
+    )
+    assert 0 < result["latency"] < throttle_settings.PAYMENTS_SETTLEMENT_TARGET_LATENCY
+    assert SettlementRunService().pick_shards() == 1
+
+
+@pytest.mark.django_db
+def test_pick_shards_keeps_unfinished_split(settings, waiting_funds_payables):
+    settings.PAYMENTS_SETTLEMENT_SHARDS = 8
+    shards = 3
+    service = SettlementRunService()
+    run = service.start(1, shards, (None, waiting_funds_payables[0].payment_date))
+
+    assert run.status == SettlementRunStatus.RUNNING
+    assert service.pick_shards() == shards
+    assert service.pick_shards(slot=1) == settings.PAYMENTS_SETTLEMENT_SHARDS
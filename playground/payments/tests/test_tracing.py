@@ -0,0 +1,205 @@
+import json
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from celery.contrib.testing.app import TestApp, setup_default_app
+from celery.contrib.testing.worker import start_worker
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+
+from payments.enums import TransactionMethod
+from payments.tasks import summarize_settlement
+from payments.tracing import (
+    TRACEPARENT,
+    OTLPSpanExporter,
+    SpanExporter,
+    TraceQueue,
+    get_trace_queue,
+    span,
+)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def traces(settings, tmp_path):
+    settings.PAYMENTS_TRACING_SAMPLE_RATE = 1.0
+    settings.PAYMENTS_TRACING_EXPORTER = "file"
+    settings.PAYMENTS_TRACING_FILE = str(tmp_path / "traces.jsonl")
+
+    def read() -> list[dict]:
+        get_trace_queue().flush(timeout=5)
+        path = tmp_path / "traces.jsonl"
+        return [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+
+    return read
+
+
+def process(customer, **headers):
+    return APIClient().post(
+        "/api/v1/payments/transactions/process/",
+        data={
+            "customer_id": customer.id,
+            "value": 10.0,
+            "description": "Em dezembro de 81, botou os ingleses na roda!",
+            "method": TransactionMethod.CREDIT,
+            "card_number": "Zico",
+            "card_owner": "Adílio",
+            "card_expiration_year": "2028",
+            "card_verification_code": "123",
+        },
+        headers=headers,
+    )
+
+
+@pytest.mark.django_db
+def test_process_request_is_traced_by_stage(traces, customer_with_balance):
+    response = process(customer_with_balance)
+
+    spans = {span["name"]: span for span in traces()}
+    root = spans["http POST transactions-process"]
+    process_span = spans["transaction.process"]
+
+    assert response[TRACEPARENT] == f"00-{root['trace_id']}-{root['span_id']}-01"
+    assert root["parent_id"] is None
+    assert root["attributes"]["status"] == response.status_code
+    assert {span["trace_id"] for span in spans.values()} == {root["trace_id"]}
+    assert process_span["parent_id"] == root["span_id"]
+    for stage in [
+        "transaction.customer_lookup",
+        "transaction.pending_insert",
+        "CreditCardTransaction.create_payable",
+        "CreditCardTransaction.apply_payable_on_balance",
+        "CreditCardTransaction.finish_transaction",
+    ]:
+        assert spans[stage]["parent_id"] == process_span["span_id"]
+        assert spans[stage]["duration_ms"] >= 0
+    pending_insert = spans["transaction.pending_insert"]["span_id"]
+    assert any(
+        span["name"] == "db.query" and span["parent_id"] == pending_insert for span in traces()
+    )
+
+
+@pytest.mark.django_db
+def test_unsampled_request_is_not_traced(settings, traces, customer_with_balance):
+    settings.PAYMENTS_TRACING_SAMPLE_RATE = 0.0
+
+    response = process(customer_with_balance)
+
+    assert TRACEPARENT not in response
+    assert traces() == []
+
+
+@pytest.mark.django_db
+def test_request_continues_propagated_trace(settings, traces, customer_with_balance):
+    settings.PAYMENTS_TRACING_SAMPLE_RATE = 0.0
+
+    process(customer_with_balance, traceparent=f"00-{TRACE_ID}-{PARENT_ID}-01")
+
+    spans = traces()
+    [root] = [span for span in spans if span["name"].startswith("http")]
+
+    assert root["parent_id"] == PARENT_ID
+    assert {span["trace_id"] for span in spans} == {TRACE_ID}
+
+
+def test_failed_span_records_error(traces):
+    with pytest.raises(ValueError, match="Vasco"), span("root"), span("child"):
+        raise ValueError("Vasco")
+
+    child, root = traces()
+
+    assert child["error"] == "ValueError: Vasco"
+    assert child["parent_id"] == root["span_id"]
+
+
+@contextmanager
+def celery_worker():
+    """Celery test app (in-memory broker) and worker thread, so tasks are really published."""
+    app = TestApp()
+    with setup_default_app(app), start_worker(app, pool="solo", perform_ping_check=False):
+        yield
+
+
+def test_trace_is_propagated_to_celery_tasks(traces):
+    # The task span ends on task_postrun, after the result is stored: read once the worker stops
+    with celery_worker():
+        with span("publisher") as publisher:
+            result = summarize_settlement.delay([])
+        result.get(timeout=10)
+
+    spans = {span["name"]: span for span in traces()}
+    task_span = spans["celery.payments.tasks.summarize_settlement"]
+
+    assert task_span["trace_id"] == publisher.trace_id
+    assert task_span["parent_id"] == publisher.span_id
+    assert task_span["attributes"] == {"task_id": result.id, "state": "SUCCESS"}
+
+
+def test_otlp_exporter_posts_to_collector(settings):
+    settings.PAYMENTS_TRACING_SAMPLE_RATE = 1.0
+    received = []
+
+    class Collector(BaseHTTPRequestHandler):
+        def do_POST(self):  # noqa: N802
+            received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Collector)
+    thread = threading.Thread(target=server.handle_request)
+    thread.start()
+    settings.PAYMENTS_TRACING_EXPORTER = "otlp"
+    settings.PAYMENTS_TRACING_OTLP_ENDPOINT = f"http://127.0.0.1:{server.server_port}/v1/traces"
+
+    with span("root", customer="Flamengo") as root:
+        pass
+    thread.join(timeout=5)
+    server.server_close()
+
+    [payload] = received
+    [exported] = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+
+    assert exported["traceId"] == root.trace_id
+    assert exported["name"] == "root"
+    assert exported["status"] == {"code": 1}
+    assert exported["attributes"] == [{"key": "customer", "value": {"stringValue": "Flamengo"}}]
+
+
+def test_otlp_exporter_logs_unreachable_collector(caplog):
+    with span("root") as root:
+        pass
+
+    OTLPSpanExporter("http://127.0.0.1:9/v1/traces", timeout=0.1).export([root])
+
+    assert "spans not exported" in caplog.text
+
+
+def test_trace_queue_drops_traces_when_full():
+    release = threading.Event()
+
+    class BlockedExporter(SpanExporter):
+        def export(self, spans):
+            release.wait(timeout=5)
+
+    trace_queue = TraceQueue(maxsize=1)
+    dropped = REGISTRY.get_sample_value("payments_traces_dropped_total") or 0.0
+    with span("root") as root:
+        pass
+
+    for _ in range(4):
+        trace_queue.put(BlockedExporter(), [root])
+    release.set()
+
+    assert trace_queue.flush(timeout=5)
+    # The exporter thread may take the first trace before the queue fills
+    assert trace_queue.dropped in {2, 3}
+    assert REGISTRY.get_sample_value(
+        "payments_traces_dropped_total"
+    ) == dropped + trace_queue.dropped
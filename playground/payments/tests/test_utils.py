@@ -1,6 +1,14 @@
+from datetime import UTC, datetime, timedelta
+
 import pytest
 
-from payments.utils import clean_document_number, is_valid_cnpj, is_valid_cpf
+from payments.utils import (
+    clean_document_number,
+    is_valid_cnpj,
+    is_valid_cpf,
+    uuid7,
+    uuid7_datetime,
+)
 
 
 @pytest.mark.parametrize(
@@ -55,3 +63,20 @@ def test_is_valid_cpf(cpf, expected):
 )
 def test_is_valid_cnpj(cnpj, expected):
     assert is_valid_cnpj(cnpj) == expected
+
+
+def test_uuid7_is_time_ordered():
+    before = datetime.now(tz=UTC)
+    ids = [uuid7() for _ in range(5000)]
+
+    assert all(value.version == 7 for value in ids)  # noqa: PLR2004
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    assert uuid7_datetime(ids[0]) >= before - timedelta(milliseconds=1)
+
+
+def test_uuid7_at_datetime():
+    moment = datetime(2026, 1, 2, 3, 4, 5, 678000, tzinfo=UTC)
+
+    assert uuid7_datetime(uuid7(moment)) == moment
+    assert uuid7(moment) < uuid7(moment + timedelta(milliseconds=1))
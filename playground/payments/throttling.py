@@ -0,0 +1,74 @@
+import logging
+import time
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Weight of the last chunk on the latency moving average
+LATENCY_SMOOTHING = 0.3
+
+
+class AdaptiveThrottle:
+    """
+    Adapts settlement to what the database sustains, with AIMD (additive increase,
+    multiplicative decrease) on the chunk size:
+    a chunk committed under the target latency grows the next chunk by min_chunk_size,
+    a slower one halves it. With max_rate, chunks are also paced so a shard never
+    settles more than max_rate payables per second.
+    Chunk size, latency and throttled time are exported as settlement metrics.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int | None = None,
+        target_latency: float | None = None,
+        max_rate: float | None = None,
+        sleep=time.sleep,
+    ):
+        self.min_chunk_size = settings.PAYMENTS_SETTLEMENT_MIN_CHUNK_SIZE
+        self.max_chunk_size = settings.PAYMENTS_SETTLEMENT_MAX_CHUNK_SIZE
+        self.chunk_size = self._clamp(chunk_size or settings.PAYMENTS_SETTLEMENT_CHUNK_SIZE)
+        self.target_latency = target_latency or settings.PAYMENTS_SETTLEMENT_TARGET_LATENCY
+        self.max_rate = max_rate
+        self.latency: float | None = None
+        self.throttled = 0.0
+        self.sleep = sleep
+
+    def observe(self, rows: int, elapsed: float) -> None:
+        """Adapts the next chunk size to the latency of a committed chunk and paces it."""
+        self.latency = elapsed if self.latency is None else (
+            LATENCY_SMOOTHING * elapsed + (1 - LATENCY_SMOOTHING) * self.latency
+        )
+        if elapsed > self.target_latency:
+            self.chunk_size = self._clamp(self.chunk_size // 2)
+            logger.info(
+                "[payments.throttling] chunk took %.3fs, over the target of "
+                "%ss | chunk size reduced to %s",
+                elapsed, self.target_latency, self.chunk_size,
+            )
+        else:
+            self.chunk_size = self._clamp(self.chunk_size + self.min_chunk_size)
+
+        wait = rows / self.max_rate - elapsed if self.max_rate else 0.0
+        if wait > 0:
+            self.throttled += wait
+            self.sleep(wait)
+        metrics.record_settlement_throttle(self.chunk_size, self.latency, max(wait, 0.0))
+
+    def _clamp(self, chunk_size: int) -> int:
+        return max(self.min_chunk_size, min(self.max_chunk_size, chunk_size))
+
+
+def pick_concurrency(shards: int, latency: float | None, max_shards: int, target: float) -> int:
+    """
+    AIMD on the number of shards settled in parallel, from the latency of the last run:
+    one more shard while under the target latency, half of them when over it.
+    """
+    if latency is None:
+        return max_shards
+    if latency > target:
+        return max(1, shards // 2)
+    return min(max_shards, shards + 1)
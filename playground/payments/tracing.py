@@ -0,0 +1,345 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from functools import wraps
+from secrets import token_hex
+
+from celery.signals import before_task_publish, task_postrun, task_prerun
+from django.conf import settings
+
+from . import metrics
+from .queries import install_execute_wrapper, normalize_sql
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT = "traceparent"
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+# Seconds the exporter thread gets to export the queued traces on exit
+EXIT_FLUSH_TIMEOUT = 5.0
+
+
+@dataclass
+class Span:
+    """
+    A timed operation of a trace. Spans of the same process and trace share the `trace`
+    list, queued to be exported at once when the local root span (request or task) ends.
+    """
+    name: str
+    trace_id: str
+    parent_id: str | None
+    sampled: bool
+    attributes: dict = field(default_factory=dict)
+    span_id: str = field(default_factory=lambda: token_hex(8))
+    start: int = field(default_factory=time.time_ns)
+    end: int | None = None
+    error: str | None = None
+    root: bool = False
+    trace: list["Span"] = field(default_factory=list, repr=False)
+
+    @property
+    def traceparent(self) -> str:
+        """W3C trace context header, propagating the trace to HTTP calls and Celery tasks."""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "end": self.end,
+            "duration_ms": (self.end - self.start) / 1e6 if self.end else None,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+_current: ContextVar[Span | None] = ContextVar("payments_span", default=None)
+
+
+def current_span() -> Span | None:
+    return _current.get()
+
+
+def start_span(
+    name: str, traceparent: str | None = None, **attributes
+) -> tuple[Span, Token | None]:
+    """
+    Starts a span as child of the current one, of a propagated traceparent or as a new
+    trace sampled at PAYMENTS_TRACING_SAMPLE_RATE. Inside an unsampled trace nothing is
+    created, the current span is returned and end_span is a no-op.
+    """
+    parent = _current.get()
+    if parent and not parent.sampled:
+        return parent, None
+
+    if parent:
+        span = Span(name, parent.trace_id, parent.span_id, True, attributes, trace=parent.trace)
+    elif traceparent and (match := _TRACEPARENT.match(traceparent)):
+        trace_id, parent_id, flags = match.groups()
+        span = Span(name, trace_id, parent_id, flags == "01", attributes, root=True)
+    else:
+        sampled = random.random() < settings.PAYMENTS_TRACING_SAMPLE_RATE  # noqa: S311
+        span = Span(name, token_hex(16), None, sampled, attributes, root=True)
+
+    return span, _current.set(span)
+
+
+def end_span(span: Span, token: Token | None, error: BaseException | None = None) -> None:
+    if token is None:
+        return
+
+    _current.reset(token)
+    if not span.sampled:
+        return
+
+    span.end = time.time_ns()
+    if error:
+        span.error = f"{type(error).__name__}: {error}"
+    span.trace.append(span)
+    if span.root:
+        export(span.trace)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    current, token = start_span(name, **attributes)
+    try:
+        yield current
+    except BaseException as err:
+        end_span(current, token, err)
+        raise
+    else:
+        end_span(current, token)
+
+
+def traced(name: str | None = None):
+    """Runs the decorated function inside a span, named after it by default."""
+    def decorator(function):
+        label = name or function.__qualname__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(label):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def trace_query(execute, sql, params, many, context):
+    """Connection execute wrapper: a span per query, only inside sampled traces."""
+    current = _current.get()
+    if not current or not current.sampled:
+        return execute(sql, params, many, context)
+
+    with span("db.query", sql=normalize_sql(sql), many=many):
+        return execute(sql, params, many, context)
+
+
+class SpanExporter(ABC):
+    @abstractmethod
+    def export(self, spans: list[Span]) -> None:
+        pass
+
+
+class FileSpanExporter(SpanExporter):
+    """Appends spans as JSON lines to a local file."""
+
+    _lock = threading.Lock()
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: list[Span]) -> None:
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+        with self._lock, open(self.path, "a") as file:
+            file.write(lines)
+
+
+class OTLPSpanExporter(SpanExporter):
+    """Posts spans to an OpenTelemetry collector using OTLP/HTTP with a JSON body."""
+
+    def __init__(self, endpoint: str, timeout: float = 1.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def export(self, spans: list[Span]) -> None:
+        request = urllib.request.Request(  # noqa: S310
+            self.endpoint,
+            data=json.dumps(self.payload(spans)).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout):  # noqa: S310
+                pass
+        except OSError as err:
+            logger.warning("[payments.tracing] spans not exported to %s: %s", self.endpoint, err)
+
+    def payload(self, spans: list[Span]) -> dict:
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_attribute("service.name", "playground")]},
+                "scopeSpans": [{
+                    "scope": {"name": "payments.tracing"},
+                    "spans": [self._span(span) for span in spans],
+                }],
+            }],
+        }
+
+    def _span(self, span: Span) -> dict:
+        return {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "parentSpanId": span.parent_id or "",
+            "name": span.name,
+            "startTimeUnixNano": str(span.start),
+            "endTimeUnixNano": str(span.end),
+            "attributes": [_attribute(key, value) for key, value in span.attributes.items()],
+            # OTLP status codes: 1 is ok and 2 is error
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+
+
+def _attribute(key: str, value) -> dict:
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def get_exporter() -> SpanExporter | None:
+    """Exporter picked by PAYMENTS_TRACING_EXPORTER: "file", "otlp" or "none"."""
+    if settings.PAYMENTS_TRACING_EXPORTER == "file":
+        return FileSpanExporter(settings.PAYMENTS_TRACING_FILE)
+    if settings.PAYMENTS_TRACING_EXPORTER == "otlp":
+        return OTLPSpanExporter(settings.PAYMENTS_TRACING_OTLP_ENDPOINT)
+    return None
+
+
+class TraceQueue:
+    """
+    Bounded queue of finished traces drained by an exporter thread, so file writes and
+    OTLP posts leave the request and task threads. When the queue is full traces are
+    dropped and counted. The thread starts on the first trace, also in forked processes
+    (Celery prefork workers), and the queued traces are exported on exit.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.queue = queue.Queue(maxsize)
+        self.dropped = 0
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+        os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self.flush, EXIT_FLUSH_TIMEOUT)
+
+    def put(self, exporter: SpanExporter, spans: list[Span]) -> None:
+        self._start()
+        try:
+            self.queue.put_nowait((exporter, spans))
+        except queue.Full:
+            self.dropped += 1
+            metrics.TRACES_DROPPED.inc()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Waits until every queued trace is exported. Returns False on timeout."""
+        with self.queue.all_tasks_done:
+            return self.queue.all_tasks_done.wait_for(
+                lambda: not self.queue.unfinished_tasks, timeout
+            )
+
+    def _start(self) -> None:
+        if self._thread:
+            return
+        with self._lock:
+            if not self._thread:
+                self._thread = threading.Thread(
+                    target=self._export, name="payments-trace-exporter", daemon=True
+                )
+                self._thread.start()
+
+    def _export(self) -> None:
+        while True:
+            exporter, spans = self.queue.get()
+            try:
+                exporter.export(spans)
+            except Exception:
+                logger.exception("[payments.tracing] spans not exported")
+            finally:
+                self.queue.task_done()
+
+    def _reset(self) -> None:
+        # The traces queued before the fork are left to the parent to export
+        self.queue = queue.Queue(self.maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+
+
+_trace_queues: dict[int, TraceQueue] = {}
+_trace_queues_lock = threading.Lock()
+
+
+def get_trace_queue() -> TraceQueue:
+    """Returns the trace queue of the process, of PAYMENTS_TRACING_QUEUE_SIZE traces."""
+    maxsize = settings.PAYMENTS_TRACING_QUEUE_SIZE
+    with _trace_queues_lock:
+        if maxsize not in _trace_queues:
+            _trace_queues[maxsize] = TraceQueue(maxsize)
+        return _trace_queues[maxsize]
+
+
+def export(spans: list[Span]) -> None:
+    """Queues a finished trace for the exporter picked when it ends."""
+    exporter = get_exporter()
+    if exporter:
+        get_trace_queue().put(exporter, spans)
+
+
+_task_spans: dict[str, tuple[Span, Token | None]] = {}
+
+
+def inject_task_headers(headers=None, **kwargs) -> None:
+    """before_task_publish handler: propagates the current trace to the published task."""
+    current = _current.get()
+    if current and headers is not None:
+        headers[TRACEPARENT] = current.traceparent
+
+
+def start_task_span(task_id=None, task=None, **kwargs) -> None:
+    """task_prerun handler: task span, child of the trace that published the task."""
+    traceparent = getattr(task.request, TRACEPARENT, None)
+    _task_spans[task_id] = start_span(f"celery.{task.name}", traceparent, task_id=task_id)
+
+
+def end_task_span(task_id=None, state=None, **kwargs) -> None:
+    """task_postrun handler."""
+    if task_id not in _task_spans:
+        return
+
+    task_span, token = _task_spans.pop(task_id)
+    if token:
+        task_span.attributes["state"] = state
+        task_span.error = state if state == "FAILURE" else None
+    end_span(task_span, token)
+
+
+def install() -> None:
+    """Traces the queries of every database connection and propagates traces to Celery tasks."""
+    install_execute_wrapper(trace_query, "payments.tracing")
+
+    before_task_publish.connect(inject_task_headers, dispatch_uid="payments.tracing")
+    task_prerun.connect(start_task_span, dispatch_uid="payments.tracing")
+    task_postrun.connect(end_task_span, dispatch_uid="payments.tracing")
@@ -4,6 +4,9 @@ from .views import (
     CustomerBalanceAPIView,
     CustomerDetailAPIView,
     CustomerListCreateAPIView,
+    PayableExportAPIView,
+    TransactionBatchProcessAPIView,
+    TransactionExportAPIView,
     TransactionListAPIView,
     TransactionProcessAPIView,
 )
@@ -13,7 +16,16 @@ urlpatterns = [
     path("customers/<uuid:id>/", CustomerDetailAPIView.as_view(), name="customer-details"),
     path("customers/<uuid:id>/balance/", CustomerBalanceAPIView.as_view(), name="customer-balance"),
     path("transactions/", TransactionListAPIView.as_view(), name="transactions"),
-    path("transactions/process/", TransactionProcessAPIView.as_view(), name="transactions-process")
+    path(
+        "transactions/export/", TransactionExportAPIView.as_view(), name="transactions-export"
+    ),
+    path("payables/export/", PayableExportAPIView.as_view(), name="payables-export"),
+    path("transactions/process/", TransactionProcessAPIView.as_view(), name="transactions-process"),
+    path(
+        "transactions/process/batch/",
+        TransactionBatchProcessAPIView.as_view(),
+        name="transactions-process-batch"
+    ),
 ]
 
 
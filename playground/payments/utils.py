@@ -1,5 +1,10 @@
 # ruff: noqa: PLR2004
 import re
+import secrets
+import threading
+import time
+import uuid
+from datetime import UTC, datetime
 
 
 def clean_document_number(value: str) -> str:
@@ -31,3 +36,42 @@ def is_valid_cnpj(cnpj: str) -> bool:
         if int(cnpj[12 + i]) != d:
             return False
     return True
+
+
+_uuid7_lock = threading.Lock()
+_uuid7_last = (0, 0)
+
+
+def uuid7(at: datetime | None = None) -> uuid.UUID:
+    """
+    Time-ordered UUID (RFC 9562 version 7): 48 bits of unix time in milliseconds,
+    12 bits of counter and 62 random bits. Ids generated later sort after earlier ones,
+    so inserts append to the right of primary key indexes instead of random pages.
+    Within the same millisecond the counter keeps ids of a process increasing.
+    With `at`, the id is built for that moment (used to rekey existing rows).
+    """
+    global _uuid7_last  # noqa: PLW0603
+
+    if at is not None:
+        timestamp, counter = int(at.timestamp() * 1000), secrets.randbits(12)
+    else:
+        with _uuid7_lock:
+            timestamp, counter = time.time_ns() // 1_000_000, 0
+            last_timestamp, last_counter = _uuid7_last
+            if timestamp <= last_timestamp:
+                timestamp, counter = last_timestamp, last_counter + 1
+                if counter > 0xFFF:
+                    timestamp, counter = last_timestamp + 1, 0
+            _uuid7_last = (timestamp, counter)
+
+    value = (timestamp & 0xFFFFFFFFFFFF) << 80
+    value |= 0x7 << 76
+    value |= counter << 64
+    value |= 0b10 << 62
+    value |= secrets.randbits(62)
+    return uuid.UUID(int=value)
+
+
+def uuid7_datetime(value: uuid.UUID) -> datetime:
+    """Creation moment of a version 7 UUID, with milliseconds precision."""
+    return datetime.fromtimestamp((value.int >> 80) / 1000, tz=UTC)
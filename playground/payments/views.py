@@ -1,10 +1,13 @@
 import logging
 
 from django.db.transaction import atomic
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import OrderingFilter, SearchFilter
-from rest_framework.generics import ListAPIView, ListCreateAPIView
+from rest_framework.generics import GenericAPIView, ListAPIView, ListCreateAPIView
 from rest_framework.response import Response
 from rest_framework.status import (
     HTTP_200_OK,
@@ -15,26 +18,50 @@ from rest_framework.status import (
 )
 from rest_framework.views import APIView
 
+from .cache import get_balance_cache
+from .conditional import (
+    ConditionalListMixin,
+    is_conditional,
+    not_modified,
+    object_validators,
+    set_validators,
+)
 from .enums import TransactionStatus
 from .exceptions import TransactionRelatedEntityNotFoundError
-from .models import Balance, Customer, Transaction
+from .export import ExportContentNegotiation, ExportService
+from .fastpath import FastListMixin
+from .filters import PayableExportFilter, TransactionExportFilter
+from .models import Balance, Customer, Payable, Transaction
+from .pagination import KeysetPaginationMixin
+from .queries import query_budget
 from .serializers import (
     BalanceSerializer,
     CustomerSerializer,
+    PayableSerializer,
+    TransactionBatchProcessRequestSerializer,
     TransactionProcessRequestSerializer,
     TransactionProcessResponseSerializer,
     TransactionSerializer,
 )
 from .services import TransactionService
+from .striping import get_customer_balance
+
+logger = logging.getLogger(__name__)
 
 
-class CustomerListCreateAPIView(ListCreateAPIView):
+@method_decorator(query_budget(3, "customers-list"), name="get")
+@method_decorator(query_budget(4, "customers-create"), name="post")
+class CustomerListCreateAPIView(
+    ConditionalListMixin, FastListMixin, KeysetPaginationMixin, ListCreateAPIView
+):
     """
     Return a list of all customers in payments service and
     creates a new customer and balance related.
     Can be filtered by type and active.
     Can be search name.
     Can be ordered by created date.
+    Paginated by cursor, or by page number with the page param.
+    Cursor pages answer conditional requests with ETag.
     """
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
@@ -54,7 +81,10 @@ class CustomerListCreateAPIView(ListCreateAPIView):
         balance_serializer.is_valid(raise_exception=True)
         balance = balance_serializer.save()
 
-        logging.info(f"[payments] customer created: {customer.id} | balance created: {balance.id}")
+        logger.info(
+            "[payments] customer created: %s | balance created: %s",
+            customer.id, balance.id,
+        )
         return Response(
             data={"id": customer.id},
             status=HTTP_201_CREATED
@@ -62,42 +92,94 @@ class CustomerListCreateAPIView(ListCreateAPIView):
 
 
 class CustomerDetailAPIView(APIView):
+    """
+    Return the customer, with ETag and Last-Modified from its updated_at.
+    Conditional requests read only updated_at and answer 304 while it is the same.
+    """
+    @query_budget(2)
     def get(self, request, id):
+        if is_conditional(request):
+            updated_at = Customer.objects.filter(id=id).values_list("updated_at", flat=True).first()
+            validators = updated_at and object_validators("customer", id, updated_at)
+            response = validators and not_modified(request, *validators)
+            if response:
+                return response
+
         customer = get_object_or_404(Customer, id=id)
         serializer = CustomerSerializer(customer)
 
-        return Response(serializer.data)
+        return set_validators(
+            Response(serializer.data), *object_validators("customer", id, customer.updated_at)
+        )
 
+    @query_budget(8)
     @atomic
     def delete(self, request, id):
         customer = get_object_or_404(Customer, id=id)
-        balance = get_object_or_404(Balance, customer=customer)
+        balances = list(Balance.objects.filter(customer=customer).order_by("slot"))
+        if not balances:
+            raise Http404("No Balance matches the given query.")
 
-        logging.info(f"[payments] customer deleted: {customer.id} | balance deleted: {balance.id}")
-        balance.delete()
+        logger.info(
+            "[payments] customer deleted: %s | balance deleted: %s",
+            customer.id, ", ".join(str(balance.id) for balance in balances),
+        )
+        for balance in balances:
+            balance.delete()
         customer.delete()
 
         return Response(status=HTTP_204_NO_CONTENT)
 
 
 class CustomerBalanceAPIView(APIView):
+    """
+    Return the customer balance.
+    For striped balances, values are the sum of all slots.
+    Served from the balance cache, invalidated whenever the balance is posted to.
+    ETag and Last-Modified come from the balance and customer updated_at and are cached
+    with the balance, so a 304 on a cache hit costs no query and no serialization.
+    """
+    @query_budget(1)
     def get(self, request, id):
-        balance = Balance.objects.filter(customer__id=id).first()
-        if not balance:
+        cached = get_balance_cache().get_or_load(
+            id, lambda: balance_cache_entry(id, get_customer_balance(id))
+        )
+        if cached is None:
             return Response(
                 {"detail": "Balance not found for this customer."},
                 status=HTTP_404_NOT_FOUND
             )
-        serializer = BalanceSerializer(balance)
 
-        return Response(serializer.data)
+        if response := not_modified(request, cached["etag"], cached["last_modified"]):
+            return response
+        return set_validators(Response(cached["data"]), cached["etag"], cached["last_modified"])
+
 
+def balance_cache_entry(id, balance: Balance | None) -> dict | None:
+    """Serialized balance with its validators, as kept on the balance cache."""
+    if balance is None:
+        return None
 
-class TransactionListAPIView(ListAPIView):
+    etag, last_modified = object_validators(
+        "balance", id, balance.updated_at, balance.customer.updated_at
+    )
+    return {
+        "data": dict(BalanceSerializer(balance).data),
+        "etag": etag,
+        "last_modified": last_modified,
+    }
+
+
+@method_decorator(query_budget(3, "transactions-list"), name="get")
+class TransactionListAPIView(
+    ConditionalListMixin, FastListMixin, KeysetPaginationMixin, ListAPIView
+):
     """
     Return a list of all transactions made in payments service.
     Can be filtered by status, method and expected fee.
     Can be ordered by value and created date.
+    Paginated by cursor, or by page number with the page param.
+    Cursor pages answer conditional requests with ETag.
     """
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
@@ -106,48 +188,133 @@ class TransactionListAPIView(ListAPIView):
     ordering_fields = ["value", "created_at"]
 
 
+class ExportAPIView(GenericAPIView):
+    """
+    Streams the filtered rows as NDJSON (default) or CSV with ?output=csv,
+    gzipped on the fly for clients sending Accept-Encoding: gzip.
+    """
+    filter_backends = [DjangoFilterBackend]
+    content_negotiation_class = ExportContentNegotiation
+    export_name: str
+
+    def get(self, request):
+        output = request.query_params.get("output", "ndjson")
+        if output not in ExportService.content_types:
+            raise ValidationError({"output": f"Invalid export output: {output}"})
+
+        queryset = self.filter_queryset(self.get_queryset())
+        service = ExportService(self.get_serializer_class(), output)
+        return service.response(request, queryset, self.export_name)
+
+
+class TransactionExportAPIView(ExportAPIView):
+    """
+    Export of transactions ordered by created date.
+    Can be filtered by status, method and created date (created_after, created_before).
+    """
+    queryset = Transaction.objects.order_by("created_at", "id")
+    serializer_class = TransactionSerializer
+    filterset_class = TransactionExportFilter
+    export_name = "transactions"
+
+
+class PayableExportAPIView(ExportAPIView):
+    """
+    Export of payables ordered by creation.
+    Can be filtered by status, transaction method, created date (created_after,
+    created_before) and payment date (payment_after, payment_before).
+    """
+    queryset = Payable.objects.order_by("id")
+    serializer_class = PayableSerializer
+    filterset_class = PayableExportFilter
+    export_name = "payables"
+
+
 class TransactionProcessAPIView(APIView):
+    @query_budget(9)
     def post(self, request):
         serializer = TransactionProcessRequestSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        logging.info(
-            f"[payments] process transaction started: customer {request.data.get('customer_id')}"
+        data, status = process_transaction(
+            request.data.get("customer_id"), serializer.validated_data
         )
+        return Response(status=status, data=data)
 
-        try:
-            service = TransactionService()
-            result = service.process(data=serializer.validated_data)
-            response = TransactionProcessResponseSerializer(result)
 
-            logging.info(
-                "[payments] process transaction finished: "
-                f"customer_id - {response.data.get('customer_id')} | "
-                f"status - {response.data.get('status')}"
-            )
-        except TransactionRelatedEntityNotFoundError as e:
-            logging.error(
-                "[payments] not found on process transaction: "
-                f"customer_id - {request.data.get('customer_id')} | "
-                f"error - {str(e)}"
-            )
-            return Response(
-                {"detail": str(e)},
-                status=HTTP_404_NOT_FOUND
-            )
-        except Exception as e:
-            logging.error(
-                "[payments] process transaction error: "
-                f"customer_id - {request.data.get('customer_id')} | "
-                f"error - {str(e)}"
-            )
-            response = TransactionProcessResponseSerializer(data={
-                "customer_id": request.data.get("customer_id"), "status": TransactionStatus.FAILED
-            })
-            response.is_valid(raise_exception=True)
-            return Response(status=HTTP_500_INTERNAL_SERVER_ERROR, data=response.data)
+def process_transaction(customer_id, data: dict) -> tuple[dict, int]:
+    """
+    Processes a validated transaction request.
+    Returns the response data and status, shared by the sync and async views.
+    """
+    logger.info("[payments] process transaction started: customer %s", customer_id)
 
-        return Response(status=HTTP_200_OK, data=response.data)
+    try:
+        service = TransactionService()
+        result = service.process(data=data)
+        response = TransactionProcessResponseSerializer(result)
+
+        logger.info(
+            "[payments] process transaction finished: customer_id - %s | status - %s",
+            response.data.get("customer_id"), response.data.get("status"),
+        )
+    except TransactionRelatedEntityNotFoundError as e:
+        logger.error(
+            "[payments] not found on process transaction: customer_id - %s | error - %s",
+            customer_id, e,
+        )
+        return {"detail": str(e)}, HTTP_404_NOT_FOUND
+    except Exception as e:
+        logger.error(
+            "[payments] process transaction error: customer_id - %s | error - %s",
+            customer_id, e,
+        )
+        response = TransactionProcessResponseSerializer(data={
+            "customer_id": customer_id, "status": TransactionStatus.FAILED
+        })
+        response.is_valid(raise_exception=True)
+        return response.data, HTTP_500_INTERNAL_SERVER_ERROR
+
+    return response.data, HTTP_200_OK
+
+
+class TransactionBatchProcessAPIView(APIView):
+    """
+    Process a batch of transactions with bulk writes.
+    Returns customer_id and status for each transaction, in the same order.
+    Invalid items and items for unknown customers are returned as failed.
+    """
+    @query_budget(7)
+    def post(self, request):
+        serializer = TransactionBatchProcessRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data["transactions"]
+
+        logger.info("[payments] batch process transaction started: %s transactions", len(items))
 
+        results = []
+        valid_items = []
+        valid_indexes = []
+        for index, item in enumerate(items):
+            results.append({
+                "customer_id": item.get("customer_id"), "status": TransactionStatus.FAILED
+            })
+            item_serializer = TransactionProcessRequestSerializer(data=item)
+            if item_serializer.is_valid():
+                valid_items.append(item_serializer.validated_data)
+                valid_indexes.append(index)
 
+        if valid_items:
+            service = TransactionService()
+            processed = service.process_many(valid_items)
+            for index, result in zip(valid_indexes, processed, strict=True):
+                results[index] = result
 
+        response = TransactionProcessResponseSerializer(results, many=True)
+        processed_count = sum(r["status"] == TransactionStatus.PROCESSED for r in results)
+        logger.info(
+            "[payments] batch process transaction finished: processed - %s | failed - %s",
+            processed_count, len(results) - processed_count,
+        )
+
+        return Response(status=HTTP_200_OK, data=response.data)
@@ -11,5 +11,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "playground.settings")
+# Payments endpoints are served by their async views, see payments/async_views.py
+os.environ.setdefault("PAYMENTS_ASYNC_VIEWS", "True")
 
 application = get_asgi_application()
@@ -52,6 +52,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "payments.middleware.TracingMiddleware",
+    "payments.middleware.MetricsMiddleware",
+    "payments.middleware.QuerySamplerMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -138,32 +141,107 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
 REST_FRAMEWORK = {
-    "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"]
+    "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
+    "PAGE_SIZE": int(os.getenv("API_PAGE_SIZE", "50")),
 }
-
-
+# PAGE_SIZE is used by the pagination classes set on each list view
+SILENCED_SYSTEM_CHECKS = ["rest_framework.W001"]
+
+
+# Payments
+
+# A BalanceHistory checkpoint is written on every N postings of a balance
+PAYMENTS_BALANCE_SNAPSHOT_INTERVAL = int(os.getenv("PAYMENTS_BALANCE_SNAPSHOT_INTERVAL", "100"))
+
+# "set" settles payables in chunks with set-based queries, "row" applies them one by one
+PAYMENTS_SETTLEMENT_MODE = os.getenv("PAYMENTS_SETTLEMENT_MODE", "set")
+PAYMENTS_SETTLEMENT_CHUNK_SIZE = int(os.getenv("PAYMENTS_SETTLEMENT_CHUNK_SIZE", "1000"))
+# Settlement is split in shards by customer and run in parallel by Celery workers
+PAYMENTS_SETTLEMENT_SHARDS = int(os.getenv("PAYMENTS_SETTLEMENT_SHARDS", "4"))
+# Catch-up settles every overdue payable, otherwise only payables due today
+PAYMENTS_SETTLEMENT_CATCH_UP = os.getenv("PAYMENTS_SETTLEMENT_CATCH_UP", "True") == "True"
+# Max chunks settled by a shard run, the remaining backlog goes to the next runs (0 = no limit)
+PAYMENTS_SETTLEMENT_MAX_CHUNKS = int(os.getenv("PAYMENTS_SETTLEMENT_MAX_CHUNKS", "0"))
+# Chunk sizes adapt (AIMD) to keep each chunk commit under the target latency, in seconds.
+# The number of parallel shards adapts the same way, up to PAYMENTS_SETTLEMENT_SHARDS.
+PAYMENTS_SETTLEMENT_TARGET_LATENCY = float(os.getenv("PAYMENTS_SETTLEMENT_TARGET_LATENCY", "0.5"))
+PAYMENTS_SETTLEMENT_MIN_CHUNK_SIZE = int(os.getenv("PAYMENTS_SETTLEMENT_MIN_CHUNK_SIZE", "100"))
+PAYMENTS_SETTLEMENT_MAX_CHUNK_SIZE = int(os.getenv("PAYMENTS_SETTLEMENT_MAX_CHUNK_SIZE", "5000"))
+# Max payables settled per second over all shards (0 = no limit)
+PAYMENTS_SETTLEMENT_MAX_RATE = float(os.getenv("PAYMENTS_SETTLEMENT_MAX_RATE", "0"))
+# Lease lock that keeps settlement runs from overlapping: "database" or "redis"
+PAYMENTS_LOCK_BACKEND = os.getenv("PAYMENTS_LOCK_BACKEND", "database")
+# Seconds a lease is held without a renewal before another owner can take it over
+PAYMENTS_LOCK_TTL = int(os.getenv("PAYMENTS_LOCK_TTL", "300"))
+PAYMENTS_LOCK_REDIS_URL = f"redis://{os.getenv('REDIS_HOST')}:{os.getenv('REDIS_PORT')}/2"
+# Serialized balances cache: "redis" (shared, default with Redis), "local" (per process LRU,
+# only invalidated by postings of the same process) or "off"
+PAYMENTS_BALANCE_CACHE_BACKEND = os.getenv(
+    "PAYMENTS_BALANCE_CACHE_BACKEND", "redis" if os.getenv("REDIS_HOST") else "local"
+)
+PAYMENTS_BALANCE_CACHE_TTL = int(os.getenv("PAYMENTS_BALANCE_CACHE_TTL", "10"))
+# Seconds a miss waits for the concurrent load of the same balance before loading it itself
+PAYMENTS_BALANCE_CACHE_WAIT_TIMEOUT = float(os.getenv("PAYMENTS_BALANCE_CACHE_WAIT_TIMEOUT", "2.0"))
+PAYMENTS_BALANCE_CACHE_SIZE = int(os.getenv("PAYMENTS_BALANCE_CACHE_SIZE", "10000"))
+PAYMENTS_BALANCE_CACHE_REDIS_URL = f"redis://{os.getenv('REDIS_HOST')}:{os.getenv('REDIS_PORT')}/3"
+# Settlement runs on a daily window split in slots, each customer settles on its own slot
+PAYMENTS_SETTLEMENT_WINDOW_START = os.getenv("PAYMENTS_SETTLEMENT_WINDOW_START", "02:00")
+PAYMENTS_SETTLEMENT_WINDOW_END = os.getenv("PAYMENTS_SETTLEMENT_WINDOW_END", "07:00")
+PAYMENTS_SETTLEMENT_SLOTS = int(os.getenv("PAYMENTS_SETTLEMENT_SLOTS", "10"))
+# Offset pagination uses the planner row estimate instead of COUNT(*) above this many rows
+PAYMENTS_PAGINATION_COUNT_THRESHOLD = int(
+    os.getenv("PAYMENTS_PAGINATION_COUNT_THRESHOLD", "10000")
+)
+# Lists are serialized from values_list() rows with precompiled converters and orjson
+PAYMENTS_FAST_SERIALIZERS = os.getenv("PAYMENTS_FAST_SERIALIZERS", "True") == "True"
+# Async views for the read endpoints and transaction processing, on by default under ASGI
+PAYMENTS_ASYNC_VIEWS = os.getenv("PAYMENTS_ASYNC_VIEWS", "False") == "True"
+# Exports read rows from a server-side cursor and stream them this many at a time
+PAYMENTS_EXPORT_CHUNK_SIZE = int(os.getenv("PAYMENTS_EXPORT_CHUNK_SIZE", "2000"))
+# Query budgets of views and services: "log" when exceeded, "raise" (tests) or "off"
+PAYMENTS_QUERY_BUDGET_MODE = os.getenv("PAYMENTS_QUERY_BUDGET_MODE", "log")
+# Requests slower or running more queries than this are sampled with their query shapes
+PAYMENTS_QUERY_SAMPLER_ENABLED = os.getenv("PAYMENTS_QUERY_SAMPLER_ENABLED", "True") == "True"
+PAYMENTS_QUERY_SAMPLER_LATENCY_MS = int(os.getenv("PAYMENTS_QUERY_SAMPLER_LATENCY_MS", "500"))
+PAYMENTS_QUERY_SAMPLER_MAX_QUERIES = int(os.getenv("PAYMENTS_QUERY_SAMPLER_MAX_QUERIES", "20"))
+PAYMENTS_QUERY_SAMPLER_SIZE = int(os.getenv("PAYMENTS_QUERY_SAMPLER_SIZE", "100"))
+# Request, transaction and settlement metrics exported on /metrics. Set PROMETHEUS_MULTIPROC_DIR
+# (an empty directory shared by gunicorn workers and Celery processes) to aggregate processes
+PAYMENTS_METRICS_ENABLED = os.getenv("PAYMENTS_METRICS_ENABLED", "True") == "True"
+# Share of new traces (requests and tasks) recorded with spans, propagated traces keep their flag
+PAYMENTS_TRACING_SAMPLE_RATE = float(os.getenv("PAYMENTS_TRACING_SAMPLE_RATE", "0.0"))
+# "file" (JSON lines on PAYMENTS_TRACING_FILE), "otlp" (OTLP/HTTP JSON collector) or "none"
+PAYMENTS_TRACING_EXPORTER = os.getenv("PAYMENTS_TRACING_EXPORTER", "file")
+PAYMENTS_TRACING_FILE = os.getenv("PAYMENTS_TRACING_FILE", "traces.jsonl")
+PAYMENTS_TRACING_OTLP_ENDPOINT = os.getenv(
+    "PAYMENTS_TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"
+)
+# Finished traces wait on a queue for the exporter thread, over that they are dropped and counted
+PAYMENTS_TRACING_QUEUE_SIZE = int(os.getenv("PAYMENTS_TRACING_QUEUE_SIZE", "1000"))
+
+
+# Records are queued and written as JSON lines by a listener thread, off the request thread.
+# Up to PAYMENTS_LOG_QUEUE_SIZE records wait on the queue, over that they are dropped and counted
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
     "handlers": {
-        "console": {"class": "logging.StreamHandler"},
-        "file": {
-            "class": "logging.FileHandler",
+        "queued": {
+            "()": "payments.log.QueuedHandler",
             "filename": "general.log",
-            "formatter": "verbose",
+            "console": True,
+            "maxsize": int(os.getenv("PAYMENTS_LOG_QUEUE_SIZE", "10000")),
+            "formatter": "json",
         },
     },
     "loggers": {
         "": {
-            "handlers": ["console", "file"],
+            "handlers": ["queued"],
             "level": os.environ.get("DJANGO_LOG_LEVEL", "INFO"),
         }
     },
     "formatters": {
-        "verbose": {
-            "format": "{asctime} ({levelname})- {name}- {message}",
-            "style": "{",
-        }
+        "json": {"()": "payments.log.JsonFormatter"},
     },
 }
 
@@ -171,12 +249,14 @@ CELERY_BROKER_URL = f"redis://{os.getenv('REDIS_HOST')}:{os.getenv('REDIS_PORT')
 CELERY_RESULT_BACKEND = f"redis://{os.getenv('REDIS_HOST')}:{os.getenv('REDIS_PORT')}/1"
 CELERY_TIMEZONE = "America/Sao_Paulo"
 
-from celery.schedules import crontab  # noqa: E402
+from payments.scheduling import SettlementSchedule  # noqa: E402
 
-CELERY_BEAT_SCHEDULE = {
+CELERY_BEAT_SCHEDULE = SettlementSchedule(
+    PAYMENTS_SETTLEMENT_WINDOW_START, PAYMENTS_SETTLEMENT_WINDOW_END, PAYMENTS_SETTLEMENT_SLOTS
+).beat_schedule() if os.getenv("TEST_CELERY") else {
     "pay_daily_payables_and_make_people_happy_at_morning": {
         "task": "payments.tasks.pay_daily_payables",
-        "schedule": crontab(hour=8, minute=0) if os.getenv("TEST_CELERY") else 5.0,
+        "schedule": 5.0,
         "args": (),
     },
 }
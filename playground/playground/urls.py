@@ -16,12 +16,13 @@ Including another URLconf
 
 """
 
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 
-from .views import are_you_ok
+from .views import are_you_ok, metrics
 
 # TODO: change Swagger generation to use drf-spectacular instead of drf-yasg
 schema_view = get_schema_view(
@@ -38,11 +39,15 @@ schema_view = get_schema_view(
 
 urlpatterns = [
     path("ping/", are_you_ok),
+    path("metrics", metrics, name="metrics"),
     path("admin/", admin.site.urls),
 
     path("swagger/", schema_view.with_ui("swagger", cache_timeout=0), name="schema-swagger-ui"),
     path("redoc/", schema_view.with_ui("redoc", cache_timeout=0), name="schema-redoc"),
     path("swagger.json", schema_view.without_ui(cache_timeout=0), name="schema-json"),
 
-    path("api/v1/payments/", include("payments.urls")),
+    path(
+        "api/v1/payments/",
+        include("payments.async_urls" if settings.PAYMENTS_ASYNC_VIEWS else "payments.urls"),
+    ),
 ]
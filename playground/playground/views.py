@@ -1,4 +1,5 @@
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from payments.metrics import render
 
 
 def are_you_ok(request):
@@ -21,3 +22,8 @@ def are_you_ok(request):
         ["Ele vibra, ele é fibra muita libra já pesou", "Flamengo até morrer eu sou!"]
     ]
     return JsonResponse(yes, safe=False)
+
+
+def metrics(request):
+    content, content_type = render()
+    return HttpResponse(content, content_type=content_type)